@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class BookingConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "booking"
+
+    def ready(self):
+        from . import instrumentation, metrics, signals  # noqa: F401
+
+        instrumentation.install()
+        metrics.install()
@@ -3,13 +3,12 @@ Test cases for Hotel Room Booking Platform Assignment 3 & 4
 These are the exact test cases provided in the assignment.
 """
 
-from django.test import TestCase
 from datetime import date
 from .models import Hotel, Room
-from .test_functions import book_room, search_hotels
+from .test_functions import BookingTestCase, book_room, search_hotels
 
 
-class AssignmentTestCases(TestCase):
+class AssignmentTestCases(BookingTestCase):
     """Test cases for the hotel booking platform assignment"""
     
     def test_simultaneous_booking(self):
@@ -0,0 +1,14 @@
+"""
+URL configuration for ASGI mode: the read endpoints with async views are
+matched first, everything else falls through to booking.urls.
+"""
+
+from django.urls import path
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/hotels/', async_views.hotel_list, name='hotel-list'),
+    path('api/hotels/<uuid:pk>/availability/', async_views.hotel_availability, name='hotel-availability'),
+    path('api/rooms/', async_views.room_list, name='room-list'),
+] + sync_urlpatterns
@@ -0,0 +1,177 @@
+"""
+Async versions of the read-heavy API endpoints, served in ASGI mode.
+
+Search, room listing and availability requests spend most of their time
+waiting on the database. These views run those queries through Django's
+async ORM so a single ASGI worker can keep many slow requests in flight.
+They answer GET requests on the same URLs and with the same payloads as the
+DRF viewsets; every other method is handed to the viewset unchanged.
+
+The views are routed by booking.async_urls, which hotel_booking.urls uses
+when BOOKING_ASYNC_VIEWS is enabled (hotel_booking.asgi enables it).
+"""
+
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import filters
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .availability import ahotel_room_availability
+from .models import Hotel, Room
+from .pagination import KeysetPagination
+from .search import search_hotels_optimized
+from .serializers import HotelSerializer, RoomSerializer, RoomAvailabilitySerializer
+from .text_search import afilter_hotels
+from .throttling import SearchAnonRateThrottle, SearchUserRateThrottle
+from .views import HotelViewSet, RoomViewSet, parse_stay_dates
+
+SEARCH_THROTTLES = (SearchUserRateThrottle, SearchAnonRateThrottle)
+
+
+def _drf_request(request):
+    return Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+
+
+def read_async(sync_view):
+    """
+    Serve GET/HEAD from the decorated async view and everything else
+    (creates, OPTIONS, ...) from `sync_view`.
+    """
+    def decorator(async_view):
+        @csrf_exempt
+        @wraps(async_view)
+        async def view(request, *args, **kwargs):
+            if request.method in ('GET', 'HEAD'):
+                return await async_view(request, *args, **kwargs)
+            return await sync_to_async(sync_view)(request, *args, **kwargs)
+        return view
+    return decorator
+
+
+async def _throttled(request):
+    """
+    Apply the search throttles of the sync viewsets.
+
+    Returns:
+        JsonResponse: A 429 response if the request is throttled, else None
+    """
+    drf_request = _drf_request(request)
+    for throttle_class in SEARCH_THROTTLES:
+        throttle = throttle_class()
+        # Resolving the user may read the session, so run the check in a thread
+        if not await sync_to_async(throttle.allow_request)(drf_request, None):
+            wait = throttle.wait()
+            headers = {'Retry-After': str(int(wait))} if wait is not None else None
+            return JsonResponse({'detail': 'Request was throttled.'}, status=429, headers=headers)
+    return None
+
+
+async def _paginated(queryset, request, serializer_class):
+    paginator = KeysetPagination()
+    try:
+        payload = await paginator.apaginate(
+            queryset, request, lambda rows: serializer_class(rows, many=True).data
+        )
+    except NotFound as exc:
+        return JsonResponse({'detail': str(exc.detail)}, status=404)
+    return JsonResponse(payload)
+
+
+@read_async(HotelViewSet.as_view({'get': 'list', 'post': 'create'}))
+async def hotel_list(request):
+    """
+    GET /api/hotels/ with the city, name, unfilled_only and date filters.
+    """
+    throttled = await _throttled(request)
+    if throttled is not None:
+        return throttled
+
+    params = request.GET
+    city = params.get('city', None)
+    name = params.get('name', None)
+    unfilled_only = params.get('unfilled_only', 'false').lower() == 'true'
+    check_in_date = params.get('check_in_date', None)
+    check_out_date = params.get('check_out_date', None)
+
+    if unfilled_only and check_in_date and check_out_date:
+        # The cached search keeps its single-flight locking, so it runs in a thread
+        paginator = KeysetPagination()
+        drf_request = Request(request)
+        try:
+            after, before = paginator.get_keyset_bounds(drf_request)
+        except NotFound as exc:
+            return JsonResponse({'detail': str(exc.detail)}, status=404)
+        rows = await sync_to_async(search_hotels_optimized)(
+            city=city,
+            name=name,
+            unfilled_only=True,
+            check_in_date=check_in_date,
+            check_out_date=check_out_date,
+            limit=paginator.get_page_size(drf_request) + 1,
+            after=after,
+            before=before
+        )
+        queryset = Hotel.objects.filter(id__in=[row.id for row in rows])
+    else:
+        queryset = await afilter_hotels(Hotel.objects.all(), city=city, name=name)
+
+    queryset = filters.SearchFilter().filter_queryset(_drf_request(request), queryset, HotelViewSet)
+    return await _paginated(queryset, request, HotelSerializer)
+
+
+@read_async(RoomViewSet.as_view({'get': 'list', 'post': 'create'}))
+async def room_list(request):
+    """
+    GET /api/rooms/ with the hotel_id, room_type and is_available filters.
+    """
+    throttled = await _throttled(request)
+    if throttled is not None:
+        return throttled
+
+    queryset = Room.objects.all()
+    hotel_id = request.GET.get('hotel_id', None)
+    room_type = request.GET.get('room_type', None)
+    is_available = request.GET.get('is_available', None)
+
+    if hotel_id:
+        queryset = queryset.filter(hotel_id=hotel_id)
+    if room_type:
+        queryset = queryset.filter(room_type=room_type)
+    if is_available:
+        # __in keeps the flag seekable in room_hotel_type_open_idx; SQLite tests a bare `= True` per row
+        queryset = queryset.filter(is_available__in=[is_available.lower() == 'true'])
+
+    queryset = filters.SearchFilter().filter_queryset(_drf_request(request), queryset, RoomViewSet)
+    return await _paginated(RoomSerializer.setup_eager_loading(queryset), request, RoomSerializer)
+
+
+@read_async(HotelViewSet.as_view({'get': 'availability'}))
+async def hotel_availability(request, pk):
+    """
+    GET /api/hotels/<id>/availability/?check_in=&check_out=
+    """
+    throttled = await _throttled(request)
+    if throttled is not None:
+        return throttled
+
+    try:
+        check_in_date, check_out_date = parse_stay_dates(request.GET)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    if not await Hotel.objects.filter(id=pk).aexists():
+        return JsonResponse({'detail': 'No Hotel matches the given query.'}, status=404)
+
+    rooms = await ahotel_room_availability(
+        pk, check_in_date, check_out_date,
+        queryset=RoomAvailabilitySerializer.setup_eager_loading(Room.objects.all())
+    )
+    return JsonResponse({
+        'hotel': pk,
+        'check_in': check_in_date,
+        'check_out': check_out_date,
+        'rooms': RoomAvailabilitySerializer(rooms, many=True).data,
+    })
@@ -0,0 +1,211 @@
+"""
+Availability engine for rooms and hotels.
+
+All availability questions ("which rooms / hotels have a free room for
+[check_in, check_out)") are answered with set-based correlated queries so
+the number of SQL statements does not depend on the number of hotels.
+Occupancy is read from the RoomNight inventory, so every probe is an
+indexed (room, night) range lookup instead of a booking overlap scan.
+
+A room can only be free if it is open for the stay: is_available is set
+and the stay lies inside its open window, i.e. check-in is on or after
+available_from and check-out on or before available_to (a missing bound
+leaves that side open). The (hotel, is_available, available_from,
+available_to) index answers that part before any inventory probe.
+"""
+
+from datetime import timedelta
+from django.db.models import Case, DateField, Exists, ExpressionWrapper, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
+from .models import Room, RoomNight
+
+# How far past check-in to look for a booked room's next free night
+NEXT_FREE_HORIZON_DAYS = 365
+
+
+def booked_nights(check_in_date, check_out_date):
+    """
+    Occupied room-nights inside the half-open range [check_in, check_out).
+
+    Args:
+        check_in_date (date): Check-in date
+        check_out_date (date): Check-out date
+
+    Returns:
+        QuerySet: RoomNight rows held by active bookings in the range
+    """
+    return RoomNight.objects.filter(night__gte=check_in_date, night__lt=check_out_date)
+
+
+def room_is_free(room_id, check_in_date, check_out_date, exclude_booking_id=None):
+    """
+    Check whether a single room is free for the whole range.
+
+    Args:
+        room_id (UUID): Room to check
+        check_in_date (date): Check-in date
+        check_out_date (date): Check-out date
+        exclude_booking_id (UUID): Booking to ignore (when updating it)
+
+    Returns:
+        bool: True if no active booking holds any night of the range
+    """
+    nights = booked_nights(check_in_date, check_out_date).filter(room_id=room_id)
+    if exclude_booking_id:
+        nights = nights.exclude(booking_id=exclude_booking_id)
+    return not nights.exists()
+
+
+def room_is_open(room, check_in_date, check_out_date):
+    """
+    Check whether a room is in service for the whole range.
+
+    Args:
+        room (Room): Room with is_available, available_from and available_to loaded
+        check_in_date (date): Check-in date
+        check_out_date (date): Check-out date
+
+    Returns:
+        bool: True if the room is available and the stay lies inside its window
+    """
+    return (
+        room.is_available
+        and (room.available_from is None or room.available_from <= check_in_date)
+        and (room.available_to is None or check_out_date <= room.available_to)
+    )
+
+
+def open_rooms(check_in_date, check_out_date, queryset=None):
+    """
+    Restrict a room queryset to rooms in service for the whole range.
+
+    Args:
+        check_in_date (date): Check-in date
+        check_out_date (date): Check-out date
+        queryset (QuerySet): Room queryset to restrict (defaults to all rooms)
+
+    Returns:
+        QuerySet: Available rooms whose open window covers the stay
+    """
+    if queryset is None:
+        queryset = Room.objects.all()
+
+    # is_available=True compiles to a bare column test on SQLite, which cannot
+    # seek the index; the IN form is an equality on (hotel, is_available)
+    return queryset.filter(
+        Q(available_from__isnull=True) | Q(available_from__lte=check_in_date),
+        Q(available_to__isnull=True) | Q(available_to__gte=check_out_date),
+        is_available__in=[True],
+    )
+
+
+def free_rooms(check_in_date, check_out_date, queryset=None):
+    """
+    Restrict a room queryset to rooms that are open for the range and
+    have no overlapping booking.
+
+    Args:
+        check_in_date (date): Check-in date
+        check_out_date (date): Check-out date
+        queryset (QuerySet): Room queryset to restrict (defaults to all rooms)
+
+    Returns:
+        QuerySet: Rooms that are free for the whole range
+    """
+    booked = booked_nights(check_in_date, check_out_date).filter(room=OuterRef('pk'))
+    return open_rooms(check_in_date, check_out_date, queryset).filter(~Exists(booked))
+
+
+def hotels_with_free_rooms(queryset, check_in_date, check_out_date):
+    """
+    Restrict a hotel queryset to hotels with at least one free room.
+
+    The result is a single correlated EXISTS / NOT EXISTS query, so slicing
+    the returned queryset pushes pagination down into the SQL.
+
+    Args:
+        queryset (QuerySet): Hotel queryset to restrict
+        check_in_date (date): Check-in date
+        check_out_date (date): Check-out date
+
+    Returns:
+        QuerySet: Hotels with a free room for the whole range
+    """
+    rooms = free_rooms(check_in_date, check_out_date).filter(hotel=OuterRef('pk'))
+    return queryset.filter(Exists(rooms))
+
+
+def hotel_room_availability(hotel_id, check_in_date, check_out_date, queryset=None):
+    """
+    Free/booked status of every room of a hotel for [check_in, check_out).
+
+    Runs one statement however many rooms the hotel has: the rooms annotated
+    with correlated EXISTS probes on the (room, night) inventory index.
+
+    Args:
+        hotel_id (UUID): Hotel whose rooms to report
+        check_in_date (date): Check-in date
+        check_out_date (date): Check-out date
+        queryset (QuerySet): Room queryset to report on (defaults to the hotel's rooms)
+
+    Returns:
+        list: Room instances ordered by room number, each annotated with
+            `is_free` (bool) and `next_free_date` (first unoccupied night on or
+            after check-in inside the room's open window, or None if the room
+            is out of service or booked for the whole horizon)
+    """
+    rooms = _availability_queryset(hotel_id, check_in_date, check_out_date, queryset)
+    return _annotate_rooms(list(rooms), check_in_date, check_out_date)
+
+
+async def ahotel_room_availability(hotel_id, check_in_date, check_out_date, queryset=None):
+    """
+    Async version of hotel_room_availability() for async views.
+    """
+    rooms = _availability_queryset(hotel_id, check_in_date, check_out_date, queryset)
+    return _annotate_rooms([room async for room in rooms], check_in_date, check_out_date)
+
+
+def _availability_queryset(hotel_id, check_in_date, check_out_date, queryset):
+    if queryset is None:
+        queryset = Room.objects.all()
+    horizon_end = max(check_out_date, check_in_date + timedelta(days=NEXT_FREE_HORIZON_DAYS))
+    check_in, horizon = Value(check_in_date, DateField()), Value(horizon_end, DateField())
+
+    def held(night):
+        return Exists(RoomNight.objects.filter(room=OuterRef('pk'), night=night))
+
+    # The last night of a held run starting at or after `free_from`: the first
+    # held night whose next night is not held
+    run_ends = (
+        RoomNight.objects
+        .filter(room=OuterRef('pk'), night__gte=OuterRef('free_from'))
+        .exclude(Exists(RoomNight.objects.filter(room=OuterRef('room'), night=_day_after(OuterRef('night')))))
+        .order_by('night')
+        .values_list(_day_after(F('night')))[:1]
+    )
+    # The window's last night is the one before available_to
+    return (
+        queryset.filter(hotel_id=hotel_id)
+        .annotate(
+            booked=Exists(booked_nights(check_in_date, check_out_date).filter(room=OuterRef('pk'))),
+            free_from=Greatest(check_in, Coalesce('available_from', check_in)),
+            free_until=Least(horizon, Coalesce('available_to', horizon)),
+        )
+        .annotate(first_free=Case(When(held(OuterRef('free_from')), then=Subquery(run_ends)),
+                                  default=F('free_from')))
+        .order_by('room_number')
+    )
+
+
+def _day_after(night):
+    return ExpressionWrapper(night + timedelta(days=1), output_field=DateField())
+
+
+def _annotate_rooms(rooms, check_in_date, check_out_date):
+    for room in rooms:
+        room.is_free = room_is_open(room, check_in_date, check_out_date) and not room.booked
+        room.next_free_date = None
+        if room.is_available and room.first_free is not None and room.first_free < room.free_until:
+            room.next_free_date = room.first_free
+    return rooms
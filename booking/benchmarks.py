@@ -0,0 +1,193 @@
+"""
+Helpers shared by the benchmark management commands.
+"""
+
+import contextlib
+import io
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Caches that never hit or throttle, so benchmarks time the database work
+DUMMY_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+# Metrics compared against a baseline, mapped to True where higher is better
+COMPARED_METRICS = {
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+    'throughput_per_s': True,
+    'queries_per_call': False,
+}
+
+
+def percentile(samples, pct):
+    """
+    Nearest-rank percentile of a list of samples.
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples, queries=None, elapsed=None):
+    """
+    Summarize latency samples (in seconds) as milliseconds.
+
+    Args:
+        samples (list): Per-call latencies in seconds
+        queries (int): Total SQL statements issued by all calls
+        elapsed (float): Wall-clock time of the whole run (defaults to the sum
+            of the samples, i.e. a sequential run)
+
+    Returns:
+        dict: calls, p50/p95/p99/mean latency, throughput and queries per call
+    """
+    calls = len(samples)
+    elapsed = sum(samples) if elapsed is None else elapsed
+    return {
+        'calls': calls,
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'mean_ms': round(sum(samples) / calls * 1000, 3),
+        'throughput_per_s': round(calls / elapsed, 2) if elapsed else None,
+        'queries_per_call': round(queries / calls, 2) if queries is not None else None,
+    }
+
+
+def measure(func, repeat=10, warmup=1):
+    """
+    Call `func` sequentially and summarize its latency and query count.
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+        queries += len(ctx.captured_queries)
+    return summarize(samples, queries)
+
+
+def measure_concurrent(func, items, workers):
+    """
+    Call func(item) for every item from a pool of threads, each on its own
+    database connection, and summarize latency, throughput and queries.
+
+    Returns:
+        tuple: (list of func results, summary dict)
+    """
+    def call(item):
+        try:
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                result = func(item)
+                latency = time.perf_counter() - started
+            return result, latency, len(ctx.captured_queries)
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        calls = list(executor.map(call, items))
+    elapsed = time.perf_counter() - started
+    summary = summarize([latency for _, latency, _ in calls], sum(queries for _, _, queries in calls), elapsed)
+    summary['concurrency'] = workers
+    return [result for result, _, _ in calls], summary
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compare benchmark summaries with a baseline run.
+
+    Latency and throughput regress when they are worse than the baseline by
+    more than `tolerance`. Query counts of sequential cases are
+    deterministic, so any increase is a regression; concurrent cases retry
+    on lock errors and conflicts, so their counts get the same tolerance.
+
+    Args:
+        results (dict): Case name to summary, as produced by summarize()
+        baseline (dict): The same mapping from an earlier run
+        tolerance (float): Allowed relative slowdown, e.g. 0.2 for 20%
+
+    Returns:
+        dict: Case name to metric to baseline, current, change_pct and regressed
+    """
+    comparison = {}
+    for case, summary in results.items():
+        previous = baseline.get(case)
+        if previous is None:
+            continue
+        metrics = {}
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(metric), summary.get(metric)
+            if old is None or new is None:
+                continue
+            if metric == 'queries_per_call' and 'concurrency' not in summary:
+                regressed = new > old
+            elif higher_is_better:
+                regressed = new < old * (1 - tolerance)
+            else:
+                regressed = new > old * (1 + tolerance)
+            metrics[metric] = {
+                'baseline': old,
+                'current': new,
+                'change_pct': round((new - old) / old * 100, 1) if old else None,
+                'regressed': regressed,
+            }
+        comparison[case] = metrics
+    return comparison
+
+
+class CountingCache:
+    """
+    Cache proxy that counts the operations made through it, for benchmarks
+    and tests of code that talks to the cache directly (e.g. the throttles).
+    """
+
+    def __init__(self, cache):
+        self._cache = cache
+        self.operations = 0
+
+    def __getattr__(self, name):
+        attribute = getattr(self._cache, name)
+        if not callable(attribute):
+            return attribute
+
+        def counted(*args, **kwargs):
+            self.operations += 1
+            return attribute(*args, **kwargs)
+        return counted
+
+
+@contextlib.contextmanager
+def benchmark_database(keepdb=False):
+    """
+    Run the block against a throwaway, fully migrated copy of the default
+    database so benchmark datasets never touch development data.
+    """
+    creation = connection.creation
+    old_name = connection.settings_dict['NAME']
+    creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Silence the progress output of the data generators.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
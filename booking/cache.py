@@ -1,11 +1,168 @@
 from django.core.cache import cache
 from django.conf import settings
+from django.db import connection
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import hashlib
+import inspect
 import json
+import logging
+import threading
+import time
+import uuid
+from .instrumentation import record_cache
+from .metrics import search_cache_lookups, search_duration
+
+logger = logging.getLogger(__name__)
 
 # Cache timeout in seconds (15 minutes)
 CACHE_TIMEOUT = getattr(settings, 'HOTEL_SEARCH_CACHE_TIMEOUT', 60 * 15)
 
+# Stampede protection defaults, overridable in settings:
+# - SOFT_TIMEOUT: age after which an entry is refreshed while still being served
+# - LOCK_TIMEOUT: how long a recompute lock is held at most
+# - LOCK_WAIT: how long a request waits for another worker's recompute
+# - BACKGROUND_REFRESH: refresh soft-expired entries on a background thread
+# - L1_SIZE: entries kept in this process's LRU in front of the shared cache
+CACHE_DEFAULTS = {
+    'HOTEL_SEARCH_CACHE_SOFT_TIMEOUT': 60 * 10,
+    'HOTEL_SEARCH_CACHE_LOCK_TIMEOUT': 30,
+    'HOTEL_SEARCH_CACHE_LOCK_WAIT': 2.0,
+    'HOTEL_SEARCH_CACHE_BACKGROUND_REFRESH': True,
+    'HOTEL_SEARCH_CACHE_L1_SIZE': 256,
+}
+
+# Polling interval while waiting for another worker's recompute
+LOCK_POLL_INTERVAL = 0.05
+
+# Small pool for background refreshes so a burst cannot spawn unbounded threads
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='search-cache-refresh')
+
+# Generation counters. Every cached entry records the generations it was
+# computed under; bumping a generation makes those entries stale without
+# having to enumerate keys (which the LocMem backend cannot do).
+GLOBAL_GENERATION_KEY = 'search:gen:global'
+ANY_CITY_GENERATION_KEY = 'search:gen:any'
+CITY_GENERATION_PREFIX = 'search:gen:city'
+
+# Registry of the (normalized) city queries that have cached entries, so a
+# write in "Navi Mumbai" can bump the "mumbai" and "navi" searches too.
+CITY_REGISTRY_KEY = 'search:cities'
+CITY_REGISTRY_LIMIT = getattr(settings, 'HOTEL_SEARCH_CACHE_CITY_LIMIT', 1000)
+
+# The registry is one value updated by read-modify-write; this lock keeps
+# concurrent registrations from overwriting each other
+CITY_REGISTRY_LOCK_KEY = 'search:cities:lock'
+CITY_REGISTRY_LOCK_POLL = 0.005
+
+
+def _get_setting(name):
+    if name == 'HOTEL_SEARCH_CACHE_TIMEOUT':
+        return getattr(settings, name, CACHE_TIMEOUT)
+    return getattr(settings, name, CACHE_DEFAULTS[name])
+
+
+class CacheStats:
+    """
+    Thread-safe counters for the search cache:
+    - hits / misses: lookups answered from / not answered from the cache
+    - l1_hits / l2_hits: hits answered by this process's LRU / the shared cache
+    - evictions: cached entries discarded because their generation is stale
+    - stale_hits: soft-expired entries served while a refresh runs
+    - coalesced: misses answered by waiting for another worker's recompute
+    - refreshes: recomputes of soft-expired entries
+    """
+    FIELDS = ('hits', 'misses', 'l1_hits', 'l2_hits', 'evictions', 'stale_hits', 'coalesced', 'refreshes')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def record(self, **counts):
+        with self._lock:
+            for field, value in counts.items():
+                self._counts[field] += value
+        # Per-request figures for the instrumentation middleware
+        record_cache(counts)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+cache_stats = CacheStats()
+
+
+def get_cache_stats():
+    """
+    Return the search cache counters of this process, with the hit rate of
+    each tier: the L1 rate over all lookups, the L2 rate over the lookups
+    the L1 could not answer.
+    """
+    stats = cache_stats.snapshot()
+    lookups = stats['hits'] + stats['misses']
+    l1_misses = lookups - stats['l1_hits']
+    stats['l1_hit_rate'] = round(stats['l1_hits'] / lookups, 4) if lookups else None
+    stats['l2_hit_rate'] = round(stats['l2_hits'] / l1_misses, 4) if l1_misses else None
+    return stats
+
+
+class LocalLRUCache:
+    """
+    Bounded in-process LRU of search cache entries (the L1 tier).
+
+    It holds the same (generations, results, soft expiry) entries as the
+    shared cache, so a lookup still reads the generations from the shared
+    cache and an entry retired by a write in any worker is never served.
+    What the L1 saves is fetching and unpickling the rows.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, timeout):
+        max_entries = _get_setting('HOTEL_SEARCH_CACHE_L1_SIZE')
+        if max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + timeout, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+local_cache = LocalLRUCache()
+
+
 def get_cache_key(prefix, **kwargs):
     """
     Generate a cache key based on the search parameters.
@@ -13,49 +170,280 @@ def get_cache_key(prefix, **kwargs):
     """
     # Sort the kwargs to ensure consistent key generation
     sorted_kwargs = sorted(kwargs.items())
-    # Convert to JSON string for hashing
-    kwargs_str = json.dumps(sorted_kwargs)
+    # Convert to JSON string for hashing (dates and UUIDs are stringified)
+    kwargs_str = json.dumps(sorted_kwargs, default=str)
     # Create an MD5 hash of the parameters
     hash_obj = hashlib.md5(kwargs_str.encode())
     # Return a cache key with prefix
     return f"{prefix}:{hash_obj.hexdigest()}"
 
+
+def normalize_city(city):
+    return (city or '').strip().lower()
+
+
+def city_generation_key(city):
+    return f"{CITY_GENERATION_PREFIX}:{hashlib.md5(normalize_city(city).encode()).hexdigest()}"
+
+
+def _new_generation():
+    # Time-based seed so a counter evicted from the cache never restarts at a
+    # value an older entry was stored under
+    return time.time_ns()
+
+
+def _get_generations(keys):
+    """
+    Read generation counters, initializing any that are missing.
+    """
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            generation = _new_generation()
+            cache.add(key, generation, None)
+            # Backends that store nothing (DummyCache) read back None
+            generations[key] = cache.get(key, generation)
+    return tuple(generations[key] for key in keys)
+
+
+def bump_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_generation(), None)
+
+
+def _get_city_registry():
+    """
+    Return (epoch, cities). A fresh epoch is started if the registry is gone,
+    which also retires every entry stored under the previous registry.
+    """
+    registry = cache.get(CITY_REGISTRY_KEY)
+    if registry is None:
+        registry = (_new_generation(), frozenset())
+        cache.add(CITY_REGISTRY_KEY, registry, None)
+        registry = cache.get(CITY_REGISTRY_KEY, registry)
+    return registry
+
+
+def _scope_generation_keys(city):
+    """
+    Return (registry epoch, generation keys) a search depends on.
+    City searches depend on their own city generation; everything else on
+    the generation bumped by any write.
+    """
+    query = normalize_city(city)
+    epoch, cities = _get_city_registry()
+    if query and query not in cities and len(cities) < CITY_REGISTRY_LIMIT:
+        # Register before computing so a concurrent write cannot be missed
+        epoch, cities = _register_city(query)
+    if query and query in cities:
+        return epoch, (GLOBAL_GENERATION_KEY, city_generation_key(query))
+    return epoch, (GLOBAL_GENERATION_KEY, ANY_CITY_GENERATION_KEY)
+
+
+def _register_city(query):
+    """
+    Add a city query to the registry under CITY_REGISTRY_LOCK_KEY.
+
+    Returns:
+        tuple: (epoch, cities) afterwards. If the lock could not be taken
+            within HOTEL_SEARCH_CACHE_LOCK_WAIT the query is not in it, and
+            the search falls back to the generation every city write bumps.
+    """
+    deadline = time.monotonic() + _get_setting('HOTEL_SEARCH_CACHE_LOCK_WAIT')
+    while True:
+        token = _acquire_lock(CITY_REGISTRY_LOCK_KEY)
+        if token is not None:
+            try:
+                epoch, cities = _get_city_registry()
+                if query not in cities and len(cities) < CITY_REGISTRY_LIMIT:
+                    cities = cities | {query}
+                    cache.set(CITY_REGISTRY_KEY, (epoch, cities), None)
+                return epoch, cities
+            finally:
+                _release_lock(CITY_REGISTRY_LOCK_KEY, token)
+        if time.monotonic() >= deadline:
+            return _get_city_registry()
+        time.sleep(CITY_REGISTRY_LOCK_POLL)
+
+
+def _acquire_lock(lock_key):
+    """
+    Try to become the single worker recomputing a key.
+    Returns a token to release the lock with, or None if someone else holds it.
+    """
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, _get_setting('HOTEL_SEARCH_CACHE_LOCK_TIMEOUT')):
+        return token
+    return None
+
+
+def _release_lock(lock_key, token):
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def _store(cache_key, generations, results):
+    soft_expires_at = time.time() + _get_setting('HOTEL_SEARCH_CACHE_SOFT_TIMEOUT')
+    entry = (generations, results, soft_expires_at)
+    timeout = _get_setting('HOTEL_SEARCH_CACHE_TIMEOUT')
+    cache.set(cache_key, entry, timeout)
+    local_cache.set(cache_key, entry, timeout)
+
+
+def _compute_and_store(func, args, kwargs, cache_key, generations, lock_key, token):
+    try:
+        results = list(func(*args, **kwargs))
+        _store(cache_key, generations, results)
+        return results
+    finally:
+        _release_lock(lock_key, token)
+
+
+def _background_refresh(func, args, kwargs, cache_key, generations, lock_key, token):
+    try:
+        _compute_and_store(func, args, kwargs, cache_key, generations, lock_key, token)
+        cache_stats.record(refreshes=1)
+    except Exception:
+        logger.exception("Background refresh of %s failed", cache_key)
+    finally:
+        # Refresh threads own their database connection
+        connection.close()
+
+
+def _wait_for_fresh(cache_key, generations):
+    """
+    Poll for an entry recomputed by the worker holding the lock.
+    """
+    deadline = time.monotonic() + _get_setting('HOTEL_SEARCH_CACHE_LOCK_WAIT')
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        cached = cache.get(cache_key)
+        if cached is not None and cached[0] == generations:
+            local_cache.set(cache_key, cached, _get_setting('HOTEL_SEARCH_CACHE_TIMEOUT'))
+            return cached[1]
+    return None
+
+
 def cache_search_results(func):
     """
     Decorator to cache search results.
+    The wrapped function must return materialized rows (e.g. a list of tuples),
+    never a lazy QuerySet.
+
+    Entries have a soft and a hard TTL. Past the soft TTL the entry is still
+    served while a single worker refreshes it; on a miss a single worker
+    recomputes while the others wait briefly for its result.
+
+    Fresh entries are served from this process's LRU (L1) when it has them,
+    otherwise from the shared cache (L2), which then fills the L1.
     """
+    signature = inspect.signature(func)
+
+    def lookup(*args, **kwargs):
+        # Generate a cache key based on the function name and all arguments
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        cache_key = get_cache_key(func.__name__, **bound.arguments)
+        lock_key = f"{cache_key}:lock"
+        epoch, generation_keys = _scope_generation_keys(bound.arguments.get('city'))
+        generations = (epoch,) + _get_generations(generation_keys)
+
+        # Try this process's LRU, then the shared cache
+        cached = local_cache.get(cache_key)
+        if cached is not None and cached[0] == generations and time.time() < cached[2]:
+            cache_stats.record(hits=1, l1_hits=1)
+            search_cache_lookups.inc(tier='l1', result='hit')
+            return cached[1], True
+        search_cache_lookups.inc(tier='l1', result='miss')
+
+        cached = cache.get(cache_key)
+        if cached is not None:
+            cached_generations, cached_results, soft_expires_at = cached
+            if cached_generations == generations:
+                search_cache_lookups.inc(tier='l2', result='hit')
+                if time.time() < soft_expires_at:
+                    cache_stats.record(hits=1, l2_hits=1)
+                    local_cache.set(cache_key, cached, _get_setting('HOTEL_SEARCH_CACHE_TIMEOUT'))
+                    return cached_results, True
+
+                # Soft-expired: serve the stale rows and let one worker refresh them
+                cache_stats.record(hits=1, l2_hits=1, stale_hits=1)
+                token = _acquire_lock(lock_key)
+                if token is not None:
+                    refresh_args = (func, args, kwargs, cache_key, generations, lock_key, token)
+                    if _get_setting('HOTEL_SEARCH_CACHE_BACKGROUND_REFRESH'):
+                        _refresh_executor.submit(_background_refresh, *refresh_args)
+                    else:
+                        _compute_and_store(*refresh_args)
+                        cache_stats.record(refreshes=1)
+                return cached_results, True
+            cache_stats.record(evictions=1)
+        search_cache_lookups.inc(tier='l2', result='miss')
+        cache_stats.record(misses=1)
+
+        # Single flight: only the lock holder recomputes, others wait for it
+        token = _acquire_lock(lock_key)
+        if token is None:
+            results = _wait_for_fresh(cache_key, generations)
+            if results is not None:
+                cache_stats.record(coalesced=1)
+                return results, False
+            # The holder is slow or died; compute without the lock
+            results = list(func(*args, **kwargs))
+            _store(cache_key, generations, results)
+            return results, False
+
+        # Store results in cache together with the generations they belong to
+        return _compute_and_store(func, args, kwargs, cache_key, generations, lock_key, token), False
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # Generate a cache key based on the function name and arguments
-        cache_key = get_cache_key(func.__name__, **kwargs)
-        
-        # Try to get results from cache
-        cached_results = cache.get(cache_key)
-        if cached_results is not None:
-            return cached_results
-        
-        # If not in cache, call the original function
-        results = func(*args, **kwargs)
-        
-        # Store results in cache
-        cache.set(cache_key, results, CACHE_TIMEOUT)
-        
+        started = time.perf_counter()
+        results, hit = lookup(*args, **kwargs)
+        search_duration.observe(time.perf_counter() - started, function=func.__name__,
+                                cache='hit' if hit else 'miss')
         return results
     return wrapper
 
+
+def invalidate_city(city, aliases=()):
+    """
+    Invalidate cached searches whose results may include hotels in `city`.
+    Searches made through one of the city's `aliases` are invalidated too.
+    """
+    bump_generation(ANY_CITY_GENERATION_KEY)
+
+    registry = cache.get(CITY_REGISTRY_KEY)
+    if registry is None:
+        # Without the registry we cannot tell which city searches are affected
+        bump_generation(GLOBAL_GENERATION_KEY)
+        return
+
+    city_name = normalize_city(city)
+    alias_names = {normalize_city(alias) for alias in aliases}
+    # Exact-name searches are bumped even if their registration was lost
+    affected = {city_name} | alias_names
+    affected.update(query for query in registry[1] if query in city_name or query in alias_names)
+    for query in affected:
+        bump_generation(city_generation_key(query))
+
+
 def invalidate_hotel_cache(hotel_id=None):
     """
     Invalidate cache for a specific hotel or all hotels.
     Call this when hotels or rooms are updated.
     """
     if hotel_id:
-        # Create a pattern that matches all keys related to this hotel
-        cache_pattern = f"*:{hotel_id}:*"
-        keys = cache.keys(cache_pattern)
-        for key in keys:
-            cache.delete(key)
-    else:
-        # Clear all hotel-related cache
-        cache_pattern = "search_hotels_*"
-        keys = cache.keys(cache_pattern)
-        for key in keys:
-            cache.delete(key)
\ No newline at end of file
+        from .models import Hotel
+
+        rows = list(
+            Hotel.objects.filter(id=hotel_id).values_list('city', 'city_ref__aliases__alias')[:50]
+        )
+        if rows:
+            invalidate_city(rows[0][0], [alias for _, alias in rows if alias])
+            return
+
+    # Clear all hotel-related cache
+    bump_generation(GLOBAL_GENERATION_KEY)
@@ -0,0 +1,268 @@
+"""
+Seeded, reproducible rows for benchmark datasets.
+
+Hotels are generated in fixed-size chunks and every chunk draws from its
+own random stream seeded with (seed, chunk number), so hotel N gets the
+same rows whether chunks are built serially or across a process pool, and
+a larger dataset with the same seed and shape extends a smaller one.
+
+This module builds plain row tuples in the column order of the *_COLUMNS
+constants and never touches the database, so pool workers need no Django
+setup; booking.utils writes the rows with raw multi-row inserts. Values are
+already in a form every backend accepts for its column type (UUIDs as hex,
+dates as ISO strings), so rows go to the driver without per-value adapters.
+"""
+
+import random
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+from itertools import accumulate
+
+# Hotels per chunk, i.e. per random stream, worker task and transaction
+CHUNK_SIZE = 1000
+
+# Room numbers are <floor><two digits>, e.g. 101..120, 201..220, ...
+ROOMS_PER_FLOOR = 20
+
+US_CITIES = [
+    "New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia",
+    "San Antonio", "San Diego", "Dallas", "San Jose", "Austin", "Jacksonville",
+    "Fort Worth", "Columbus", "San Francisco", "Charlotte", "Indianapolis",
+    "Seattle", "Denver", "Washington", "Boston", "El Paso", "Nashville",
+    "Detroit", "Portland", "Memphis", "Oklahoma City", "Las Vegas", "Louisville",
+    "Baltimore", "Milwaukee", "Albuquerque", "Tucson", "Fresno", "Sacramento",
+    "Mesa", "Kansas City", "Atlanta", "Long Beach", "Colorado Springs", "Raleigh",
+    "Miami", "Omaha", "Minneapolis", "Tulsa", "Cleveland", "Wichita", "Arlington",
+    "New Orleans", "Bakersfield", "Tampa", "Honolulu", "Aurora", "Anaheim",
+    "Santa Ana", "St. Louis", "Riverside", "Corpus Christi", "Lexington",
+    "Pittsburgh", "Anchorage", "Stockton", "Cincinnati", "St. Paul", "Toledo",
+    "Greensboro", "Newark", "Plano", "Henderson", "Lincoln", "Buffalo", "Jersey City",
+    "Chula Vista", "Fort Wayne", "Orlando", "St. Petersburg", "Chandler", "Laredo",
+    "Norfolk", "Durham", "Madison", "Lubbock", "Irvine", "Winston-Salem", "Glendale",
+    "Garland", "Hialeah", "Reno", "Chesapeake", "Gilbert", "Baton Rouge", "Irving",
+    "Scottsdale", "North Las Vegas", "Fremont", "Boise City", "Richmond", "San Bernardino"
+]
+
+INDIAN_CITIES = [
+    "Mumbai", "Delhi", "Bangalore", "Hyderabad", "Chennai", "Kolkata",
+    "Ahmedabad", "Pune", "Jaipur", "Lucknow", "Kanpur", "Nagpur",
+    "Indore", "Thane", "Bhopal", "Visakhapatnam", "Patna", "Vadodara",
+    "Ghaziabad", "Ludhiana", "Agra", "Nashik", "Faridabad", "Meerut",
+    "Rajkot", "Varanasi", "Srinagar", "Aurangabad", "Dhanbad", "Amritsar",
+    "Navi Mumbai", "Allahabad", "Ranchi", "Howrah", "Coimbatore", "Jabalpur",
+    "Gwalior", "Vijayawada", "Jodhpur", "Madurai", "Raipur", "Kota",
+    "Chandigarh", "Guwahati", "Solapur", "Hubli-Dharwad", "Mysore"
+]
+
+CITIES = US_CITIES + INDIAN_CITIES
+
+HOTEL_PREFIXES = [
+    "Grand", "Royal", "Imperial", "Luxury", "Elite", "Premium", "Comfort", "Cozy",
+    "Pleasant", "Tranquil", "Serene", "Majestic", "Regal", "Elegant", "Exquisite",
+    "Splendid", "Deluxe", "Superior", "Prime", "Select", "Choice", "Quality",
+    "Prestige", "Exclusive", "Distinguished", "Eminent", "Prominent", "Renowned",
+    "Famous", "Celebrated", "Esteemed", "Respected", "Admired", "Valued", "Treasured"
+]
+
+HOTEL_SUFFIXES = [
+    "Hotel", "Inn", "Suites", "Lodge", "Resort", "Retreat", "Hideaway", "Haven",
+    "Sanctuary", "Oasis", "Paradise", "Palace", "Mansion", "Castle", "Tower",
+    "Plaza", "Court", "Pavilion", "Residency", "Quarters", "Accommodations",
+    "Lodging", "Dwelling", "Abode", "Habitat", "Domicile", "Establishment",
+    "Complex", "Compound", "Enclave", "Estate", "Manor", "Villa", "Chateau", "Cottage"
+]
+
+ROOM_TYPE_CODES = ('SINGLE', 'DOUBLE', 'SUITE')
+PRICES = tuple(Decimal(price) for price in range(50, 501))
+CAPACITIES = (1, 2, 3, 4)
+# 75% of rooms are available
+AVAILABILITY = (True, True, True, False)
+
+HOTEL_COLUMNS = ('id', 'name', 'city', 'city_ref_id', 'address', 'description', 'created_at', 'updated_at')
+ROOM_COLUMNS = ('id', 'hotel_id', 'room_number', 'room_type', 'price', 'is_available', 'capacity',
+                'created_at', 'updated_at')
+BOOKING_COLUMNS = ('id', 'room_id', 'guest_name', 'guest_email', 'check_in_date', 'check_out_date',
+                   'booking_date', 'is_cancelled')
+NIGHT_COLUMNS = ('room_id', 'booking_id', 'night')
+
+# How busy the generated rooms are over the booking horizon:
+# occupancy is the expected share of booked nights per room, stays are
+# drawn from stay_lengths with stay_weights, and cancelled bookings hold
+# no nights
+DensityProfile = namedtuple(
+    'DensityProfile', ['occupancy', 'horizon_days', 'stay_lengths', 'stay_weights', 'cancel_rate']
+)
+
+DENSITY_PROFILES = {
+    'quiet': DensityProfile(0.2, 90, (1, 2, 3), (5, 3, 2), 0.05),
+    'typical': DensityProfile(0.65, 90, (1, 2, 3, 4, 5, 6, 7), (30, 25, 15, 10, 8, 6, 6), 0.1),
+    'peak': DensityProfile(0.9, 60, (1, 2, 3, 4), (40, 30, 20, 10), 0.05),
+    'extended': DensityProfile(0.7, 180, (7, 14, 21, 28), (4, 3, 2, 1), 0.15),
+}
+
+# UUID version 4 / RFC 4122 variant bits, applied to 128 random bits
+_UUID_CLEAR = ~((0xf000 << 64) | (0xc000 << 48))
+_UUID_SET = (0x4000 << 64) | (0x8000 << 48)
+
+
+def _uuid_hex(rng):
+    return '%032x' % (rng.getrandbits(128) & _UUID_CLEAR | _UUID_SET)
+
+
+def room_number(index):
+    """
+    Room number of the index-th (0-based) room of a hotel; unique per hotel.
+    """
+    floor, number = divmod(index, ROOMS_PER_FLOOR)
+    return f"{floor + 1}{number + 1:02d}"
+
+
+def _stays(rng, profile, cum_weights, mean_gap):
+    """
+    Yield (first night offset, nights, cancelled) for one room.
+    Active stays never overlap; gaps between them are exponential so the
+    room ends up booked for about profile.occupancy of the horizon.
+    """
+    day = int(rng.expovariate(1 / mean_gap)) if mean_gap else 0
+    while True:
+        nights = rng.choices(profile.stay_lengths, cum_weights=cum_weights)[0]
+        if day + nights > profile.horizon_days:
+            return
+        cancelled = rng.random() < profile.cancel_rate
+        yield day, nights, cancelled
+        if not cancelled:
+            day += nights
+        if mean_gap:
+            day += int(rng.expovariate(1 / mean_gap))
+
+
+def build_chunk(chunk, seed, rooms_per_hotel, profile, city_ids, start_date, timestamp, skip=0, count=CHUNK_SIZE):
+    """
+    Build the rows of one chunk of hotels.
+
+    Args:
+        chunk (int): Chunk number; hotels chunk * CHUNK_SIZE onwards
+        seed (int): Dataset seed
+        rooms_per_hotel (int): Rooms generated per hotel
+        profile (DensityProfile): Booking density, or None for no bookings
+        city_ids (dict): City name to City primary key
+        start_date (date): First night of the booking horizon
+        timestamp: Database value written to created_at / updated_at /
+            booking_date
+        skip (int): Leading hotels of the chunk that are generated but not
+            returned, so a dataset can be extended from any hotel count
+        count (int): Hotels of the chunk to generate, including skipped ones
+
+    Returns:
+        dict: 'hotels', 'rooms', 'bookings' and 'nights' lists of row tuples
+    """
+    rng = random.Random(f"{seed}:{chunk}")
+    rows = {'hotels': [], 'rooms': [], 'bookings': [], 'nights': []}
+
+    # Per-field draws always cover the whole chunk so a partial chunk is a
+    # prefix of the full one
+    cities = rng.choices(CITIES, k=CHUNK_SIZE)
+    prefixes = rng.choices(HOTEL_PREFIXES, k=CHUNK_SIZE)
+    suffixes = rng.choices(HOTEL_SUFFIXES, k=CHUNK_SIZE)
+    street_numbers = rng.choices(range(100, 10000), k=CHUNK_SIZE)
+    room_total = CHUNK_SIZE * rooms_per_hotel
+    room_types = rng.choices(ROOM_TYPE_CODES, k=room_total)
+    prices = rng.choices(PRICES, k=room_total)
+    availability = rng.choices(AVAILABILITY, k=room_total)
+    capacities = rng.choices(CAPACITIES, k=room_total)
+    numbers = [room_number(index) for index in range(rooms_per_hotel)]
+
+    if profile is not None:
+        cum_weights = list(accumulate(profile.stay_weights))
+        mean_stay = sum(length * weight for length, weight in zip(profile.stay_lengths, profile.stay_weights))
+        mean_stay /= sum(profile.stay_weights)
+        mean_gap = mean_stay * (1 - profile.occupancy) / profile.occupancy
+        nights = [(start_date + timedelta(days=offset)).isoformat() for offset in range(profile.horizon_days + 1)]
+
+    hotels, rooms, bookings, room_nights = rows['hotels'], rows['rooms'], rows['bookings'], rows['nights']
+    guest = 0
+    for position in range(count):
+        keep = position >= skip
+        hotel_id = _uuid_hex(rng)
+        city, prefix = cities[position], prefixes[position]
+        if keep:
+            hotels.append((
+                hotel_id, f"{prefix} {city} {suffixes[position]}", city, city_ids[city],
+                f"{street_numbers[position]} Main St, {city}", f"A {prefix.lower()} hotel in {city}",
+                timestamp, timestamp
+            ))
+
+        for index in range(rooms_per_hotel):
+            room = position * rooms_per_hotel + index
+            room_id = _uuid_hex(rng)
+            if keep:
+                rooms.append((
+                    room_id, hotel_id, numbers[index], room_types[room], prices[room],
+                    availability[room], capacities[room], timestamp, timestamp
+                ))
+            if profile is None:
+                continue
+
+            for offset, length, cancelled in _stays(rng, profile, cum_weights, mean_gap):
+                booking_id = _uuid_hex(rng)
+                guest += 1
+                if not keep:
+                    continue
+                bookings.append((
+                    booking_id, room_id, f"Guest {chunk}-{guest}", f"guest{chunk}.{guest}@example.com",
+                    nights[offset], nights[offset + length], timestamp, cancelled
+                ))
+                if not cancelled:
+                    room_nights.extend((room_id, booking_id, night) for night in nights[offset:offset + length])
+    return rows
+
+
+def generate_rows(num_hotels, seed, rooms_per_hotel=3, profile=None, city_ids=None, start_date=None,
+                  timestamp=None, start=0, workers=1):
+    """
+    Yield the row dicts of hotels start .. start + num_hotels, chunk by chunk
+    and in order.
+
+    With workers > 1 chunks are built in a process pool; at most two chunks
+    per worker are in flight so memory stays bounded when the consumer
+    (the database) is the slower side.
+
+    Args:
+        num_hotels (int): Hotels to generate
+        seed (int): Dataset seed
+        rooms_per_hotel (int): Rooms per hotel
+        profile (DensityProfile): Booking density, or None for no bookings
+        city_ids (dict): City name to City primary key
+        start_date (date): First night of the booking horizon
+        timestamp: Database value for the timestamp columns
+        start (int): Number of hotels generated by earlier runs with the
+            same seed; generation continues from there
+        workers (int): Worker processes; 1 builds chunks in this process
+
+    Yields:
+        dict: Rows of one chunk, see build_chunk()
+    """
+    build = partial(build_chunk, seed=seed, rooms_per_hotel=rooms_per_hotel, profile=profile,
+                    city_ids=city_ids, start_date=start_date, timestamp=timestamp)
+    end = start + num_hotels
+    tasks = []
+    for chunk in range(start // CHUNK_SIZE, -(-end // CHUNK_SIZE)):
+        first = chunk * CHUNK_SIZE
+        tasks.append((chunk, max(start - first, 0), min(end - first, CHUNK_SIZE)))
+
+    if workers <= 1:
+        for chunk, skip, count in tasks:
+            yield build(chunk, skip=skip, count=count)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk, skip, count in tasks:
+            pending.append(pool.submit(build, chunk, skip=skip, count=count))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,173 @@
+"""
+Streaming exports of hotels, rooms and bookings as NDJSON or CSV.
+
+Rows are read with values_list() through QuerySet.iterator(chunk_size=...),
+so no model instances are built and at most one chunk of rows is held in
+memory however large the table is. Encoded lines are grouped into blocks of
+about BLOCK_SIZE bytes before they are handed to the response or file.
+Under ASGI the blocks are pulled one at a time through astream_export(), as
+Django would otherwise read a synchronous iterator to the end before sending.
+"""
+
+import csv
+import json
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import Booking, Hotel, Room
+from .text_search import filter_hotels
+
+# Rows fetched from the database per round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# Approximate size of the blocks yielded to the response
+BLOCK_SIZE = 64 * 1024
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+HOTEL_COLUMNS = ('id', 'name', 'city', 'address', 'description', 'created_at', 'updated_at')
+ROOM_COLUMNS = ('id', 'hotel_id', 'room_number', 'room_type', 'price', 'is_available', 'capacity',
+                'available_from', 'available_to', 'created_at', 'updated_at')
+BOOKING_COLUMNS = ('id', 'room_id', 'guest_name', 'guest_email', 'check_in_date', 'check_out_date',
+                   'booking_date', 'is_cancelled')
+
+
+def _hotels_in(city):
+    return filter_hotels(Hotel.objects.all(), city=city).values('id')
+
+
+def hotel_rows(city=None, date_from=None, date_to=None):
+    """
+    Hotels in `city`, created in [date_from, date_to).
+    """
+    queryset = filter_hotels(Hotel.objects.all(), city=city)
+    if date_from:
+        queryset = queryset.filter(created_at__date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(created_at__date__lt=date_to)
+    return queryset
+
+
+def room_rows(city=None, date_from=None, date_to=None):
+    """
+    Rooms of hotels in `city`, created in [date_from, date_to).
+    """
+    queryset = Room.objects.all()
+    if city:
+        queryset = queryset.filter(hotel__in=_hotels_in(city))
+    if date_from:
+        queryset = queryset.filter(created_at__date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(created_at__date__lt=date_to)
+    return queryset
+
+
+def booking_rows(city=None, date_from=None, date_to=None):
+    """
+    Bookings at hotels in `city` whose stay overlaps [date_from, date_to).
+    """
+    queryset = Booking.objects.all()
+    if city:
+        queryset = queryset.filter(room__hotel__in=_hotels_in(city))
+    if date_from:
+        queryset = queryset.filter(check_out_date__gt=date_from)
+    if date_to:
+        queryset = queryset.filter(check_in_date__lt=date_to)
+    return queryset
+
+
+# resource name -> (columns, queryset builder)
+RESOURCES = {
+    'hotels': (HOTEL_COLUMNS, hotel_rows),
+    'rooms': (ROOM_COLUMNS, room_rows),
+    'bookings': (BOOKING_COLUMNS, booking_rows),
+}
+
+
+def _ndjson_lines(columns, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+
+class _Echo:
+    """
+    File-like object that hands back what csv.writer writes to it.
+    """
+    def write(self, value):
+        return value
+
+
+def _csv_lines(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _blocks(lines, block_size=BLOCK_SIZE):
+    block = []
+    size = 0
+    for line in lines:
+        block.append(line)
+        size += len(line)
+        if size >= block_size:
+            yield ''.join(block)
+            block = []
+            size = 0
+    if block:
+        yield ''.join(block)
+
+
+def stream_export(resource, output='ndjson', city=None, date_from=None, date_to=None,
+                  chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Generate an export as blocks of encoded text.
+
+    Args:
+        resource (str): 'hotels', 'rooms' or 'bookings'
+        output (str): 'ndjson' or 'csv'
+        city (str): City name, alias or substring (see filter_hotels)
+        date_from (date): Start of the date range (inclusive)
+        date_to (date): End of the date range (exclusive)
+        chunk_size (int): Rows fetched per database round trip
+
+    Returns:
+        generator: str blocks of complete lines
+
+    Raises:
+        ValueError: For an unknown resource or output format
+    """
+    if resource not in RESOURCES:
+        raise ValueError(f"Unknown export '{resource}', expected one of {', '.join(RESOURCES)}")
+    if output not in FORMATS:
+        raise ValueError(f"Unknown format '{output}', expected one of {', '.join(FORMATS)}")
+
+    columns, build = RESOURCES[resource]
+    rows = (
+        build(city=city, date_from=date_from, date_to=date_to)
+        .order_by()
+        .values_list(*columns)
+        .iterator(chunk_size=chunk_size)
+    )
+    lines = _csv_lines(columns, rows) if output == 'csv' else _ndjson_lines(columns, rows)
+    return _blocks(lines)
+
+
+async def astream_export(*args, **kwargs):
+    """
+    Async version of stream_export() for ASGI responses.
+
+    Each block is read in the sync thread that owns the database connection,
+    so at most one chunk of rows is in memory, as with the sync generator.
+    """
+    blocks = await sync_to_async(stream_export)(*args, **kwargs)
+    pull = sync_to_async(next)
+    try:
+        while (block := await pull(blocks, None)) is not None:
+            yield block
+    finally:
+        # Closes the server-side cursor if the client goes away mid-export
+        await sync_to_async(blocks.close)()
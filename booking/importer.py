@@ -0,0 +1,234 @@
+"""
+Bulk import of hotels and rooms from CSV or NDJSON files.
+
+Files are parsed as streams and written in batches with bulk_create, one
+transaction per batch, so a file of any size is imported in constant
+memory. Rows are upserted on their natural key (hotels on id, rooms on
+(hotel, room_number)) or, with on_conflict='ignore', existing rows are left
+untouched. Invalid rows are skipped and counted; the first MAX_ERRORS are
+kept with their line number for the report.
+"""
+
+import csv
+import json
+import time
+import uuid
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from .cache import invalidate_hotel_cache
+from .models import City, Hotel, Room
+from .text_search import hotels_changed
+
+# Rows written per bulk_create / transaction
+IMPORT_BATCH_SIZE = 5000
+
+ON_CONFLICT = ('update', 'ignore')
+
+# Skipped rows kept with their message; the rest are only counted
+MAX_ERRORS = 100
+
+HOTEL_FIELDS = ('name', 'city', 'address', 'description')
+ROOM_FIELDS = ('room_number', 'room_type', 'price', 'is_available', 'capacity', 'available_from', 'available_to')
+
+
+class ImportStats:
+    """
+    Running totals of an import, passed to the progress callback after
+    every batch.
+    """
+
+    def __init__(self):
+        # Rows parsed, and valid rows sent to the database (including
+        # existing rows left untouched by on_conflict='ignore')
+        self.read = 0
+        self.written = 0
+        self.skipped = 0
+        # (line number, message) of the first MAX_ERRORS skipped rows
+        self.errors = []
+        self.batches = 0
+        self.started = time.perf_counter()
+
+    def skip(self, line_number, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line_number, message))
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+
+def read_records(stream, file_format):
+    """
+    Yield (line number, record) for every record of a CSV or NDJSON stream.
+    CSV records are dicts; NDJSON lines are decoded by import_records() so a
+    malformed line is reported and skipped like any other invalid row.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif file_format == 'ndjson':
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                yield line_number, line
+    else:
+        raise ValueError(f"Unknown format '{file_format}', expected csv or ndjson")
+
+
+def detect_format(path):
+    return 'csv' if str(path).lower().endswith('.csv') else 'ndjson'
+
+
+def _clean(model, record, field_names):
+    """
+    Convert and validate the raw values of `field_names` with the model
+    fields. Missing or empty values fall back to the field default, then to
+    None for nullable fields.
+    """
+    values = {}
+    for name in field_names:
+        field = model._meta.get_field(name)
+        raw = record.get(name)
+        if raw is None or raw == '':
+            if field.has_default():
+                values[name] = field.get_default()
+            elif field.null:
+                values[name] = None
+            else:
+                raise ValidationError(f"{name} is required")
+            continue
+        if isinstance(raw, str) and field.get_internal_type() == 'BooleanField':
+            raw = raw.strip().lower() in ('1', 'true', 'yes', 't', 'y')
+        values[name] = field.clean(raw, None)
+    return values
+
+
+class _HotelLoader:
+    model = Hotel
+    unique_fields = ['id']
+    update_fields = ['name', 'city', 'city_ref', 'address', 'description', 'updated_at']
+
+    def __init__(self):
+        # bulk_create bypasses Hotel.save, so resolve cities here (once per name)
+        self.cities = {}
+
+    def build(self, record):
+        values = _clean(Hotel, record, HOTEL_FIELDS)
+        city = values['city']
+        if city not in self.cities:
+            self.cities[city] = City.objects.for_name(city)
+        hotel_id = record.get('id')
+        return Hotel(id=uuid.UUID(str(hotel_id)) if hotel_id else uuid.uuid4(), city_ref=self.cities[city], **values)
+
+    def key(self, hotel):
+        return hotel.id
+
+    def check(self, objects):
+        return objects, []
+
+
+class _RoomLoader:
+    model = Room
+    unique_fields = ['hotel', 'room_number']
+    update_fields = ['room_type', 'price', 'is_available', 'capacity', 'available_from', 'available_to', 'updated_at']
+
+    def build(self, record):
+        hotel_id = record.get('hotel_id') or record.get('hotel')
+        if not hotel_id:
+            raise ValidationError("hotel_id is required")
+        values = _clean(Room, record, ROOM_FIELDS)
+        return Room(hotel_id=uuid.UUID(str(hotel_id)), **values)
+
+    def key(self, room):
+        return room.hotel_id, room.room_number
+
+    def check(self, objects):
+        """
+        Drop rooms of unknown hotels with a single query per batch.
+        """
+        known = set(
+            Hotel.objects.filter(id__in={room.hotel_id for _, room in objects}).values_list('id', flat=True)
+        )
+        valid = [(line, room) for line, room in objects if room.hotel_id in known]
+        errors = [(line, f"Unknown hotel {room.hotel_id}") for line, room in objects if room.hotel_id not in known]
+        return valid, errors
+
+
+LOADERS = {
+    'hotels': _HotelLoader,
+    'rooms': _RoomLoader,
+}
+
+
+def import_records(kind, records, batch_size=IMPORT_BATCH_SIZE, on_conflict='update', progress=None):
+    """
+    Import hotels or rooms from an iterable of (line number, dict) records.
+
+    Args:
+        kind (str): 'hotels' or 'rooms'
+        records (iterable): (line number, dict or NDJSON line) pairs, e.g.
+            from read_records()
+        batch_size (int): Rows per bulk_create and transaction
+        on_conflict (str): 'update' to upsert on the natural key, 'ignore'
+            to keep existing rows
+        progress (callable): Called with the ImportStats after every batch
+
+    Returns:
+        ImportStats: Totals, including (line number, message) for the first
+            MAX_ERRORS skipped rows
+    """
+    if on_conflict not in ON_CONFLICT:
+        raise ValueError(f"on_conflict must be one of {', '.join(ON_CONFLICT)}")
+    loader = LOADERS[kind]()
+    stats = ImportStats()
+
+    def flush(batch):
+        # Later rows for the same key win, as a row-by-row upsert would
+        unique = list({loader.key(obj): (line, obj) for line, obj in batch}.values())
+        valid, errors = loader.check(unique)
+        for line_number, message in errors:
+            stats.skip(line_number, message)
+        objects = [obj for _, obj in valid]
+        if objects:
+            with transaction.atomic():
+                if on_conflict == 'update':
+                    loader.model.objects.bulk_create(
+                        objects,
+                        update_conflicts=True,
+                        unique_fields=loader.unique_fields,
+                        update_fields=loader.update_fields
+                    )
+                else:
+                    loader.model.objects.bulk_create(objects, ignore_conflicts=True)
+        stats.written += len(objects)
+        stats.batches += 1
+        if progress is not None:
+            progress(stats)
+
+    batch = []
+    for line_number, record in records:
+        stats.read += 1
+        try:
+            if isinstance(record, str):
+                record = json.loads(record)
+            batch.append((line_number, loader.build(record)))
+        except (ValidationError, ValueError, TypeError, AttributeError) as exc:
+            message = '; '.join(exc.messages) if isinstance(exc, ValidationError) else str(exc)
+            stats.skip(line_number, message)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    # bulk_create sends no signals: retire cached searches and every process's n-gram index once
+    if stats.written:
+        invalidate_hotel_cache()
+        if kind == 'hotels':
+            transaction.on_commit(hotels_changed)
+    return stats
@@ -0,0 +1,234 @@
+"""
+Per-request database and cache instrumentation.
+
+QueryInstrumentationMiddleware, and instrument() for management commands
+and other non-HTTP code, record for one unit of work:
+- the number of SQL statements and the time spent in the database
+- search cache hits and misses (booking.cache)
+- the slowest statements
+
+The figures go out as a Server-Timing header and as one structured log
+line on the 'booking.instrumentation' logger. Work slower than
+BOOKING_SLOW_REQUEST_MS is logged as a warning with every statement it ran.
+
+The unit of work being recorded is held in a context variable, which
+sync_to_async carries into the thread that runs an async view's queries,
+so the middleware serves sync and async requests natively.
+
+With BOOKING_INSTRUMENTATION_ENABLED off the middleware removes itself at
+startup (MiddlewareNotUsed); what remains is one context variable lookup
+per SQL statement and per search cache counter update.
+"""
+
+import contextlib
+import contextvars
+import heapq
+import json
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Slowest statements included in every log line
+TOP_STATEMENTS = 5
+
+# Statements kept for the slow-request log; later ones are only counted
+MAX_CAPTURED_STATEMENTS = 1000
+
+DEFAULT_SLOW_REQUEST_MS = 500
+
+_current = contextvars.ContextVar('booking_instrumentation', default=None)
+
+
+class WorkProfile:
+    """
+    Query, database time and cache counters of one unit of work. Every
+    connection's execute wrapper hands it the statements the ORM and raw
+    cursors run while it is current; see instrument().
+    """
+
+    def __init__(self, label, parent=None):
+        self.label = label
+        # Enclosing unit of work, which counts the statements too
+        self.parent = parent
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache = {}
+        self.statements = []
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            if self.parent is not None:
+                return self.parent(execute, sql, params, many, context)
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += duration
+            if len(self.statements) < MAX_CAPTURED_STATEMENTS:
+                self.statements.append((duration, sql))
+
+    def record_cache(self, counts):
+        for field, value in counts.items():
+            self.cache[field] = self.cache.get(field, 0) + value
+
+    @property
+    def elapsed_ms(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return (end - self.started) * 1000
+
+    def slowest(self, count=TOP_STATEMENTS):
+        return heapq.nlargest(count, self.statements, key=lambda statement: statement[0])
+
+    def server_timing(self):
+        """
+        Server-Timing header value: database time and statement count, cache
+        hits and misses, and the total time of the unit of work.
+        """
+        metrics = [f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"']
+        if self.cache:
+            hits, misses = self.cache.get('hits', 0), self.cache.get('misses', 0)
+            metrics.append(f'cache;desc="{hits} hits, {misses} misses"')
+        metrics.append(f'total;dur={self.elapsed_ms:.2f}')
+        return ', '.join(metrics)
+
+    def as_dict(self, all_statements=False):
+        payload = {
+            'label': self.label,
+            'duration_ms': round(self.elapsed_ms, 2),
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'cache': dict(self.cache),
+            'slowest': [{'ms': round(duration * 1000, 3), 'sql': sql} for duration, sql in self.slowest()],
+        }
+        if all_statements:
+            payload['statements'] = [
+                {'ms': round(duration * 1000, 3), 'sql': sql} for duration, sql in self.statements
+            ]
+        return payload
+
+
+def record_cache(counts):
+    """
+    Attribute search cache counters to the unit of work being instrumented,
+    if any. Called by booking.cache.CacheStats.
+    """
+    profile = _current.get()
+    if profile is not None:
+        profile.record_cache(counts)
+
+
+def _record_statement(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def record_statements(sender, connection, **kwargs):
+    """
+    connection_created receiver: report the statements of every new
+    connection to the current unit of work.
+    """
+    if _record_statement not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_statement)
+
+
+def install():
+    """
+    Hook the instrumentation into the database layer.
+    Called once from BookingConfig.ready().
+    """
+    connection_created.connect(record_statements, dispatch_uid='booking_instrumentation_record_statements')
+
+
+def slow_request_ms():
+    return getattr(settings, 'BOOKING_SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)
+
+
+def log_profile(profile, **fields):
+    """
+    Emit the structured log line of a finished unit of work. The JSON payload
+    is the message and is also attached to the record as `instrumentation`.
+    """
+    slow = profile.elapsed_ms >= slow_request_ms()
+    payload = profile.as_dict(all_statements=slow)
+    payload.update(fields)
+    payload['slow'] = slow
+    logger.log(logging.WARNING if slow else logging.INFO, json.dumps(payload, default=str),
+               extra={'instrumentation': payload})
+
+
+@contextlib.contextmanager
+def instrument(label, log=True):
+    """
+    Record queries, database time and cache activity of the enclosed block
+    in this context (including what it runs through sync_to_async).
+
+    Usage:
+        with instrument('rebuild_inventory') as profile:
+            rebuild()
+        print(profile.queries, profile.db_time)
+
+    Args:
+        label (str): Name of the unit of work in the log line
+        log (bool): Emit the log line when the block exits
+
+    Yields:
+        WorkProfile: The counters, final once the block has exited
+    """
+    profile = WorkProfile(label, parent=_current.get())
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+        profile.finished = time.perf_counter()
+        if log:
+            log_profile(profile)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Instrument every request; enabled by BOOKING_INSTRUMENTATION_ENABLED.
+    Should be the first middleware so the total covers the whole stack.
+
+    Streaming response bodies are produced after the middleware returns, so
+    their queries are not part of the request's figures.
+
+    Sync and async capable, so under ASGI async views are not adapted to a
+    thread for its sake.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'BOOKING_INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with instrument(f'{request.method} {request.path}', log=False) as profile:
+            response = self.get_response(request)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        with instrument(f'{request.method} {request.path}', log=False) as profile:
+            response = await self.get_response(request)
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        response['Server-Timing'] = profile.server_timing()
+        log_profile(profile, method=request.method, path=request.path, status=response.status_code)
+        return response
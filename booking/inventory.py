@@ -0,0 +1,107 @@
+"""
+Room-night inventory maintenance.
+
+Every active booking is materialized as one RoomNight row per night it
+holds. The rows are written in the same transaction as the booking, and
+the unique (room, night) constraint keeps the table consistent.
+"""
+
+from datetime import timedelta
+from .models import Booking, RoomNight
+
+# Number of bookings processed per batch when rebuilding the inventory
+REBUILD_BATCH_SIZE = 2000
+
+
+def stay_nights(check_in_date, check_out_date):
+    """
+    Yield every night of the half-open stay [check_in, check_out).
+    """
+    night = check_in_date
+    while night < check_out_date:
+        yield night
+        night += timedelta(days=1)
+
+
+def build_nights(bookings):
+    """
+    Build (unsaved) RoomNight rows for a list of bookings.
+    """
+    return [
+        RoomNight(room_id=booking.room_id, booking_id=booking.id, night=night)
+        for booking in bookings
+        for night in stay_nights(booking.check_in_date, booking.check_out_date)
+    ]
+
+
+def occupy(booking):
+    """
+    Insert the nights held by a booking.
+    Raises IntegrityError if any of the nights is already taken.
+    """
+    RoomNight.objects.bulk_create(build_nights([booking]))
+
+
+def occupy_many(bookings, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Insert the nights of many bookings at once.
+    Nights that are already taken are skipped rather than raising.
+    """
+    active = [booking for booking in bookings if not booking.is_cancelled]
+    RoomNight.objects.bulk_create(build_nights(active), batch_size=batch_size, ignore_conflicts=True)
+
+
+def release(booking):
+    """
+    Remove the nights held by a booking.
+    """
+    RoomNight.objects.filter(booking_id=booking.id).delete()
+
+
+def sync_booking(booking, created=False):
+    """
+    Bring the inventory in line with a booking that was just saved.
+    Must run inside the transaction that saved the booking.
+
+    Args:
+        booking (Booking): The saved booking
+        created (bool): True if the booking was just inserted
+    """
+    if not created:
+        release(booking)
+    if not booking.is_cancelled:
+        occupy(booking)
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """
+    Rebuild the whole inventory from the Booking table in bulk.
+    Overlapping legacy bookings keep the night of whichever is inserted first.
+
+    Args:
+        batch_size (int): Number of bookings read and materialized per batch
+
+    Returns:
+        tuple: (bookings processed, nights written)
+    """
+    RoomNight.objects.all().delete()
+
+    bookings = (
+        Booking.objects.filter(is_cancelled=False)
+        .only('id', 'room_id', 'check_in_date', 'check_out_date', 'is_cancelled')
+        .order_by('check_in_date')
+    )
+
+    processed = 0
+    batch = []
+    for booking in bookings.iterator(chunk_size=batch_size):
+        batch.append(booking)
+        if len(batch) >= batch_size:
+            occupy_many(batch, batch_size)
+            processed += len(batch)
+            batch = []
+    if batch:
+        occupy_many(batch, batch_size)
+        processed += len(batch)
+
+    return processed, RoomNight.objects.count()
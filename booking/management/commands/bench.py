@@ -0,0 +1,161 @@
+"""
+Django management command to time the search, availability and booking hot
+paths on a generated dataset and compare them with a saved baseline.
+Usage: python manage.py bench [--hotels 10000] [--profile typical] [--save baseline.json]
+                              [--baseline baseline.json] [--tolerance 0.2] [--fail-on-regression]
+"""
+
+import itertools
+import json
+import logging
+import random
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from booking.benchmarks import DUMMY_CACHES, benchmark_database, compare, measure, measure_concurrent, quiet
+from booking.datagen import DENSITY_PROFILES
+from booking.models import Booking, Hotel, Room
+from booking.search import HotelSearch, search_hotels_optimized, search_hotels_ranked
+from booking.utils import generate_mock_data
+
+# Dataset options recorded with the results; comparing runs of different
+# datasets says nothing about the code
+DATASET_OPTIONS = ('hotels', 'rooms_per_hotel', 'profile', 'seed')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark search, availability, booking and list endpoints and compare with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hotels', type=int, default=10000, help='Hotels in the benchmark dataset')
+        parser.add_argument('--rooms-per-hotel', type=int, default=3, help='Rooms per hotel')
+        parser.add_argument('--profile', choices=sorted(DENSITY_PROFILES), default='typical',
+                            help='Booking density of the dataset')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for the dataset and the request mix')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed calls per sequential case')
+        parser.add_argument('--bookings', type=int, default=200, help='Booking requests in the concurrent case')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent threads creating bookings')
+        parser.add_argument('--save', help='Write the results to this file, e.g. as the next baseline')
+        parser.add_argument('--baseline', help='Results file of an earlier run to compare with')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Relative slowdown tolerated before a case counts as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error if any case regressed against the baseline')
+
+    def sequential_cases(self, hotel_ids, options):
+        check_in = date.today() + timedelta(days=14)
+        check_out = check_in + timedelta(days=3)
+        hotels = itertools.cycle(hotel_ids)
+        booked_room = Booking.objects.values_list('room_id', flat=True).first()
+        client = Client()
+
+        def get(url, params=None):
+            response = client.get(url, params)
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code}')
+            return response
+
+        return {
+            'search_city': lambda: search_hotels_optimized(city='Mumbai'),
+            'search_name_partial': lambda: search_hotels_optimized(name='Grand'),
+            'search_unfilled': lambda: search_hotels_optimized(
+                city='Mumbai', unfilled_only=True, check_in_date=check_in, check_out_date=check_out
+            ),
+            'search_unfilled_all_cities': lambda: search_hotels_optimized(
+                unfilled_only=True, check_in_date=check_in, check_out_date=check_out
+            ),
+            'search_ranked_city': lambda: search_hotels_ranked(
+                check_in, check_out, city='Mumbai', sort='availability', limit=20
+            ),
+            'search_ranked_type_price': lambda: search_hotels_ranked(
+                check_in, check_out, room_type='DOUBLE', max_price=300, limit=20
+            ),
+            'available_rooms': lambda: list(HotelSearch.search_available_rooms(
+                hotel_id=next(hotels), check_in_date=check_in, check_out_date=check_out
+            )),
+            'api_hotel_list': lambda: get('/api/hotels/', {'city': 'Delhi'}),
+            'api_room_list': lambda: get('/api/rooms/', {'hotel_id': str(next(hotels))}),
+            'api_booking_list': lambda: get('/api/bookings/', {'room': str(booked_room)}),
+            'api_hotel_availability': lambda: get(f'/api/hotels/{next(hotels)}/availability/', {
+                'check_in': str(check_in), 'check_out': str(check_out),
+            }),
+        }
+
+    def booking_requests(self, options):
+        rng = random.Random(options['seed'])
+        room_ids = list(Room.objects.order_by('id').values_list('id', flat=True)[:options['threads'] * 4])
+        start = date.today() + timedelta(days=1)
+        requests = []
+        for number in range(options['bookings']):
+            check_in = start + timedelta(days=rng.randrange(60))
+            requests.append({
+                'room': str(rng.choice(room_ids)),
+                'guest_name': f'Bench Guest {number}',
+                'guest_email': 'bench@example.com',
+                'check_in_date': str(check_in),
+                'check_out_date': str(check_in + timedelta(days=rng.randint(1, 4))),
+            })
+        return requests
+
+    def create_bookings(self, options):
+        def post(payload):
+            return Client().post('/api/bookings/', payload, content_type='application/json').status_code
+
+        # Rejected overlapping bookings are expected; don't log a warning for each
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            statuses, summary = measure_concurrent(post, self.booking_requests(options), options['threads'])
+        finally:
+            request_logger.setLevel(level)
+        summary['created'] = statuses.count(201)
+        summary['rejected'] = statuses.count(400)
+        summary['errors'] = len(statuses) - summary['created'] - summary['rejected']
+        return summary
+
+    def run(self, options):
+        results = {}
+        with benchmark_database():
+            self.stderr.write(f"Generating {options['hotels']} hotels ({options['profile']} bookings)...")
+            with quiet():
+                generate_mock_data(options['hotels'], options['rooms_per_hotel'], seed=options['seed'],
+                                   profile=options['profile'])
+            hotel_ids = list(Hotel.objects.order_by('id').values_list('id', flat=True)[:500])
+
+            with override_settings(ROOT_URLCONF='booking.urls', CACHES=DUMMY_CACHES, ALLOWED_HOSTS=['testserver']):
+                for name, func in self.sequential_cases(hotel_ids, options).items():
+                    results[name] = measure(func, repeat=options['repeat'])
+                    self.stderr.write(f"{name}: p95 {results[name]['p95_ms']} ms")
+                results['api_booking_create'] = self.create_bookings(options)
+                self.stderr.write(f"api_booking_create: p95 {results['api_booking_create']['p95_ms']} ms")
+        return results
+
+    def handle(self, *args, **options):
+        report = {
+            'dataset': {option: options[option] for option in DATASET_OPTIONS},
+            'results': self.run(options),
+        }
+
+        regressions = []
+        if options['baseline']:
+            with open(options['baseline']) as handle:
+                baseline = json.load(handle)
+            if baseline.get('dataset') != report['dataset']:
+                self.stderr.write(self.style.WARNING('Baseline was recorded on a different dataset'))
+            report['comparison'] = compare(report['results'], baseline['results'], options['tolerance'])
+            regressions = [
+                f'{case}.{metric}'
+                for case, metrics in report['comparison'].items()
+                for metric, values in metrics.items()
+                if values['regressed']
+            ]
+            report['regressions'] = regressions
+
+        if options['save']:
+            with open(options['save'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+        self.stdout.write(json.dumps(report, indent=2))
+
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"Regressed against the baseline: {', '.join(regressions)}")
@@ -0,0 +1,110 @@
+"""
+Django management command to load-test the read endpoints in WSGI mode (DRF
+viewsets) and ASGI mode (booking.async_views) with the same request mix.
+Usage: python manage.py bench_asgi [--hotels 2000] [--requests 500] [--concurrency 32]
+"""
+
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from booking.benchmarks import DUMMY_CACHES, benchmark_database, quiet, summarize
+from booking.models import Hotel
+from booking.utils import generate_mock_data, generate_test_bookings
+
+# Root URL configuration of each mode
+MODES = {
+    'wsgi': 'booking.urls',
+    'asgi': 'booking.async_urls',
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare requests per second and latency of the read endpoints under WSGI and ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hotels', type=int, default=2000, help='Hotels in the benchmark database')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per mode')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight at once')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the request mix')
+
+    def request_mix(self, options):
+        rng = random.Random(options['seed'])
+        hotel_ids = list(Hotel.objects.values_list('id', flat=True)[:500])
+        check_in = date.today() + timedelta(days=7)
+        templates = [
+            lambda: ('/api/hotels/', {'city': rng.choice(['umba', 'Delhi', 'ore'])}),
+            lambda: ('/api/hotels/', {'name': rng.choice(['Grand', 'Royal', 'Inn'])}),
+            lambda: ('/api/hotels/', {
+                'unfilled_only': 'true',
+                'check_in_date': str(check_in),
+                'check_out_date': str(check_in + timedelta(days=2)),
+            }),
+            lambda: ('/api/rooms/', {'hotel_id': str(rng.choice(hotel_ids))}),
+            lambda: (f'/api/hotels/{rng.choice(hotel_ids)}/availability/', {
+                'check_in': str(check_in), 'check_out': str(check_in + timedelta(days=3)),
+            }),
+        ]
+        return [rng.choice(templates)() for _ in range(options['requests'])]
+
+    def run_wsgi(self, requests, concurrency):
+        def fetch(request):
+            url, params = request
+            started = time.perf_counter()
+            try:
+                status = Client().get(url, params).status_code
+            finally:
+                connection.close()
+            return status, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(fetch, requests))
+        return results, time.perf_counter() - started
+
+    def run_asgi(self, requests, concurrency):
+        async def run():
+            client = AsyncClient()
+            slots = asyncio.Semaphore(concurrency)
+
+            async def fetch(request):
+                url, params = request
+                async with slots:
+                    started = time.perf_counter()
+                    response = await client.get(url, params)
+                    return response.status_code, time.perf_counter() - started
+
+            return await asyncio.gather(*(fetch(request) for request in requests))
+
+        started = time.perf_counter()
+        results = asyncio.run(run())
+        return results, time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        report = []
+        with benchmark_database():
+            self.stderr.write(f"Generating {options['hotels']} hotels...")
+            with quiet():
+                generate_mock_data(options['hotels'])
+                generate_test_bookings(options['hotels'])
+            requests = self.request_mix(options)
+
+            for mode, urlconf in MODES.items():
+                runner = self.run_wsgi if mode == 'wsgi' else self.run_asgi
+                with override_settings(ROOT_URLCONF=urlconf, CACHES=DUMMY_CACHES, ALLOWED_HOSTS=['testserver']):
+                    # Warm-up pass so both modes start with the same process state
+                    runner(requests[:options['concurrency']], options['concurrency'])
+                    results, elapsed = runner(requests, options['concurrency'])
+
+                entry = {'mode': mode, 'concurrency': options['concurrency']}
+                entry.update(summarize([latency for _, latency in results], elapsed=elapsed))
+                entry['errors'] = sum(1 for status, _ in results if status != 200)
+                report.append(entry)
+                self.stderr.write(f"{mode}: {entry['throughput_per_s']} req/s, p99 {entry['p99_ms']} ms")
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,162 @@
+"""
+Django management command to compare the room-locking booking path with the
+optimistic booking engine under concurrent, contended requests.
+Bulk requests are measured by replaying the same stays through
+create_bookings() in best-effort batches of each --batch-sizes value.
+Usage: python manage.py bench_booking [--rooms 10] [--requests 400] [--workers 8] [--batch-sizes 10 50]
+"""
+
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from booking.availability import room_is_free
+from booking.benchmarks import benchmark_database, summarize
+from booking.models import Booking, Hotel, Room, RoomNight
+from booking.services import BookingConflict, create_booking, create_bookings, is_lock_error
+
+
+def book_with_room_lock(room, check_in_date, check_out_date):
+    """
+    The previous request path: lock the room row, probe, then insert.
+    """
+    with transaction.atomic():
+        room = Room.objects.select_for_update().get(id=room.id)
+        if not room_is_free(room.id, check_in_date, check_out_date):
+            raise BookingConflict()
+        return Booking.objects.create(
+            room=room,
+            guest_name='Bench Guest',
+            guest_email='bench@example.com',
+            check_in_date=check_in_date,
+            check_out_date=check_out_date
+        )
+
+
+def book_optimistically(room, check_in_date, check_out_date):
+    return create_booking(
+        room,
+        check_in_date,
+        check_out_date,
+        guest_name='Bench Guest',
+        guest_email='bench@example.com'
+    )
+
+
+PATHS = {
+    'room_lock': book_with_room_lock,
+    'optimistic': book_optimistically,
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark booking throughput under contention for the locking and optimistic paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=10, help='Rooms competing for bookings')
+        parser.add_argument('--requests', type=int, default=400, help='Booking attempts per path')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent worker threads')
+        parser.add_argument('--days', type=int, default=30, help='Window of check-in dates')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the request mix')
+        parser.add_argument('--batch-sizes', type=int, nargs='*', default=[10, 50],
+                            help='Batch sizes for the bulk booking path')
+
+    def requests_for(self, rooms, options):
+        rng = random.Random(options['seed'])
+        start = date.today() + timedelta(days=1)
+        requests = []
+        for _ in range(options['requests']):
+            check_in_date = start + timedelta(days=rng.randrange(options['days']))
+            requests.append((rng.choice(rooms), check_in_date, check_in_date + timedelta(days=rng.randint(1, 4))))
+        return requests
+
+    def run_path(self, book, requests, workers):
+        def attempt(request):
+            started = time.perf_counter()
+            try:
+                book(*request)
+                outcome = 'booked'
+            except BookingConflict:
+                outcome = 'conflict'
+            except OperationalError as exc:
+                outcome = 'locked' if is_lock_error(exc) else 'error'
+            except Exception:
+                outcome = 'error'
+            finally:
+                connection.close()
+            return outcome, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(attempt, requests))
+        elapsed = time.perf_counter() - started
+
+        entry = summarize([latency for _, latency in results], elapsed=elapsed)
+        for outcome in ('booked', 'conflict', 'locked', 'error'):
+            entry[outcome] = sum(1 for result, _ in results if result == outcome)
+        # Requests answered with a booking or a clean 400 rather than a failure
+        entry['decided_per_s'] = round((entry['booked'] + entry['conflict']) / elapsed, 2)
+        return entry
+
+    def run_bulk(self, requests, batch_size, workers):
+        batches = [requests[start:start + batch_size] for start in range(0, len(requests), batch_size)]
+
+        def attempt(batch):
+            started = time.perf_counter()
+            try:
+                results = create_bookings([
+                    {'room_id': room.id, 'check_in_date': check_in_date, 'check_out_date': check_out_date,
+                     'guest_name': 'Bench Guest', 'guest_email': 'bench@example.com'}
+                    for room, check_in_date, check_out_date in batch
+                ], atomic=False)
+                outcomes = [outcome for outcome, _ in results]
+            except OperationalError as exc:
+                outcomes = ['locked' if is_lock_error(exc) else 'error'] * len(batch)
+            finally:
+                connection.close()
+            return outcomes, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(attempt, batches))
+        elapsed = time.perf_counter() - started
+
+        entry = summarize([latency for _, latency in results], elapsed=elapsed)
+        outcomes = [outcome for batch_outcomes, _ in results for outcome in batch_outcomes]
+        entry['booked'] = outcomes.count('created')
+        entry['conflict'] = outcomes.count('conflict')
+        entry['locked'] = outcomes.count('locked')
+        entry['error'] = outcomes.count('error')
+        entry['decided_per_s'] = round((entry['booked'] + entry['conflict']) / elapsed, 2)
+        return entry
+
+    def handle(self, *args, **options):
+        report = []
+        with benchmark_database():
+            hotel = Hotel.objects.create(name='Bench Hotel', city='Benchville', address='1 Bench Road')
+            rooms = [
+                Room.objects.create(hotel=hotel, room_number=str(100 + number), room_type='DOUBLE', price=100)
+                for number in range(options['rooms'])
+            ]
+            requests = self.requests_for(rooms, options)
+
+            for name, book in PATHS.items():
+                RoomNight.objects.all().delete()
+                Booking.objects.all().delete()
+                entry = {'path': name, 'workers': options['workers'], 'rooms': options['rooms']}
+                entry.update(self.run_path(book, requests, options['workers']))
+                report.append(entry)
+                self.stderr.write(f"{name}: {entry['booked']} booked, {entry['conflict']} conflicts")
+
+            for batch_size in options['batch_sizes']:
+                RoomNight.objects.all().delete()
+                Booking.objects.all().delete()
+                entry = {'path': f'bulk_{batch_size}', 'workers': options['workers'], 'rooms': options['rooms']}
+                entry.update(self.run_bulk(requests, batch_size, options['workers']))
+                report.append(entry)
+                self.stderr.write(f"bulk_{batch_size}: {entry['booked']} booked, {entry['conflict']} conflicts")
+
+        self.stdout.write(json.dumps(report, indent=2))
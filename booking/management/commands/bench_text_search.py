@@ -0,0 +1,68 @@
+"""
+Django management command to compare the text search backends with icontains.
+Usage: python manage.py bench_text_search [--sizes 100000 1000000] [--repeat 20]
+"""
+
+import json
+import time
+from django.core.management.base import BaseCommand
+from booking.benchmarks import benchmark_database, measure, quiet
+from booking.models import Hotel
+from booking.text_search import (IContainsBackend, NgramBackend, NgramIndex, PostgresTrigramBackend,
+                                 SQLiteFTSBackend, filter_hotels, get_backend)
+from booking.utils import generate_mock_data
+
+# (label, filters) pairs timed for every backend
+QUERIES = [
+    ('city_exact', {'city': 'Mumbai'}),
+    ('city_partial', {'city': 'umba'}),
+    ('name_partial', {'name': 'Grand'}),
+    ('name_rare', {'name': 'Sanctuary'}),
+    ('city_and_name', {'city': 'Hyderabad', 'name': 'Royal'}),
+    ('no_match', {'city': 'Atlantis'}),
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark hotel substring search backends against plain icontains'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000],
+                            help='Hotel counts to benchmark at')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed calls per query')
+        parser.add_argument('--limit', type=int, default=100, help='Rows fetched per search')
+
+    def backends(self):
+        backends = [IContainsBackend()]
+        configured = get_backend()
+        if isinstance(configured, (SQLiteFTSBackend, PostgresTrigramBackend)):
+            backends.append(configured)
+        backends.append(NgramBackend(NgramIndex()))
+        return backends
+
+    def handle(self, *args, **options):
+        report = []
+        with benchmark_database():
+            for size in sorted(options['sizes']):
+                missing = size - Hotel.objects.count()
+                if missing > 0:
+                    self.stderr.write(f'Generating {missing} hotels...')
+                    with quiet():
+                        generate_mock_data(missing, rooms_per_hotel=0)
+
+                for backend in self.backends():
+                    entry = {'hotels': size, 'backend': backend.name, 'queries': {}}
+                    if isinstance(backend, NgramBackend):
+                        started = time.perf_counter()
+                        backend.index.warm()
+                        entry['warm_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+                    for label, filters in QUERIES:
+                        def search(filters=filters, backend=backend):
+                            queryset = filter_hotels(Hotel.objects.all(), backend=backend, **filters)
+                            return list(queryset.order_by('id').values_list('id', 'name', 'city')[:options['limit']])
+                        entry['queries'][label] = measure(search, repeat=options['repeat'])
+                    report.append(entry)
+                    self.stderr.write(f'{size} hotels: {backend.name} done')
+
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,79 @@
+"""
+Django management command to compare the cost of DRF's timestamp-list
+throttle with the sliding-window throttles at several rates.
+Usage: python manage.py bench_throttle [--rates 10 100 1000 10000] [--calls 5000]
+"""
+
+import json
+import time
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from rest_framework.throttling import AnonRateThrottle
+from booking.benchmarks import CountingCache
+from booking.throttling import SlidingWindowThrottleMixin, WindowCounters
+
+# Throttle variants: (label, sliding window, sync interval in seconds)
+VARIANTS = [
+    ('drf_timestamp_list', False, 0),
+    ('sliding_window_exact', True, 0),
+    ('sliding_window_local', True, 1.0),
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-request cost and cache operations of the rate throttles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rates', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                            help='Requests per hour allowed per client')
+        parser.add_argument('--calls', type=int, default=5000, help='Timed requests per rate and variant')
+
+    def throttle_class(self, rate, sliding):
+        attributes = {'rate': f'{rate}/hour', 'scope': 'bench'}
+        if sliding:
+            attributes['counters'] = WindowCounters()
+            return type('BenchThrottle', (SlidingWindowThrottleMixin, AnonRateThrottle), attributes)
+        return type('BenchThrottle', (AnonRateThrottle,), attributes)
+
+    def run(self, rate, sliding, sync_interval, calls):
+        # Local-memory caches of the same name share their storage; start every run empty
+        backend = LocMemCache('bench_throttle', {})
+        backend.clear()
+        cache = CountingCache(backend)
+        throttle_class = self.throttle_class(rate, sliding)
+        request = RequestFactory().get('/api/bookings/')
+        request.user = AnonymousUser()
+        # One client sending just under its limit, so its history stays full and every request is admitted
+        clock = [0.0]
+        step = 3600 / rate * 1.01
+
+        samples = []
+        admitted = 0
+        with override_settings(BOOKING_THROTTLE_SYNC_INTERVAL=sync_interval):
+            for _ in range(calls):
+                throttle = throttle_class()
+                throttle.cache = cache
+                throttle.timer = lambda: clock[0]
+                started = time.perf_counter()
+                admitted += throttle.allow_request(request, None)
+                samples.append(time.perf_counter() - started)
+                clock[0] += step
+        return {
+            'us_per_call': round(sum(samples) / calls * 1e6, 2),
+            'cache_ops_per_call': round(cache.operations / calls, 3),
+            'admitted': admitted,
+        }
+
+    def handle(self, *args, **options):
+        report = []
+        for rate in options['rates']:
+            entry = {'rate_per_hour': rate}
+            for label, sliding, sync_interval in VARIANTS:
+                entry[label] = self.run(rate, sliding, sync_interval, options['calls'])
+            report.append(entry)
+            self.stderr.write(f"{rate}/hour: " + ', '.join(
+                f"{label} {entry[label]['us_per_call']} us" for label, _, _ in VARIANTS
+            ))
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,55 @@
+"""
+Django management command to stream hotels, rooms or bookings to a file (or
+stdout) as NDJSON or CSV in constant memory.
+Usage: python manage.py export_data hotels [--format csv] [--city Mumbai]
+       [--date-from 2025-01-01] [--date-to 2025-02-01] [--output hotels.csv]
+"""
+
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from booking.exports import EXPORT_CHUNK_SIZE, FORMATS, RESOURCES, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Export hotels, rooms or bookings as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('resource', choices=list(RESOURCES), help='What to export')
+        parser.add_argument('--format', choices=list(FORMATS), default='ndjson', help='Output format')
+        parser.add_argument('--city', help='City name, alias or substring to filter by')
+        parser.add_argument('--date-from', type=date.fromisoformat, help='Start of the date range (inclusive)')
+        parser.add_argument('--date-to', type=date.fromisoformat, help='End of the date range (exclusive)')
+        parser.add_argument('--output', help='File to write (defaults to stdout)')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help='Rows fetched per database round trip')
+
+    def write_blocks(self, blocks, write):
+        written = 0
+        for block in blocks:
+            write(block)
+            written += len(block)
+        return written
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        blocks = stream_export(
+            options['resource'],
+            options['format'],
+            city=options['city'],
+            date_from=options['date_from'],
+            date_to=options['date_to'],
+            chunk_size=options['chunk_size']
+        )
+
+        started = time.perf_counter()
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as target:
+                written = self.write_blocks(blocks, target.write)
+        else:
+            written = self.write_blocks(blocks, lambda block: self.stdout.write(block, ending=''))
+
+        elapsed = time.perf_counter() - started
+        self.stderr.write(f"Exported {options['resource']} ({written / 1024 / 1024:.1f} MiB) in {elapsed:.2f}s")
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from booking.datagen import DENSITY_PROFILES
 from booking.utils import generate_mock_data, generate_test_bookings
 
 class Command(BaseCommand):
@@ -8,6 +9,12 @@ class Command(BaseCommand):
         parser.add_argument('--hotels', type=int, default=1000, help='Number of hotels to generate')
         parser.add_argument('--rooms-per-hotel', type=int, default=3, help='Number of rooms per hotel')
         parser.add_argument('--bookings', type=int, default=100, help='Number of test bookings to generate')
+        parser.add_argument('--profile', choices=sorted(DENSITY_PROFILES),
+                            help='Generate bookings for every room with this density profile')
+        parser.add_argument('--seed', type=int, help='Seed for a reproducible dataset')
+        parser.add_argument('--workers', type=int, default=1, help='Processes building rows in parallel')
+        parser.add_argument('--start', type=int, default=0,
+                            help='Hotels already generated with this seed; extends that dataset')
 
     def handle(self, *args, **options):
         num_hotels = options['hotels']
@@ -16,10 +23,16 @@ class Command(BaseCommand):
         
         self.stdout.write(self.style.SUCCESS(f'Starting mock data generation: {num_hotels} hotels with {rooms_per_hotel} rooms each'))
         
-        generate_mock_data(num_hotels, rooms_per_hotel)
+        written = generate_mock_data(
+            num_hotels, rooms_per_hotel, seed=options['seed'], profile=options['profile'],
+            workers=options['workers'], start=options['start']
+        )
         
         if num_bookings > 0:
             self.stdout.write(self.style.SUCCESS(f'Generating {num_bookings} test bookings'))
-            generate_test_bookings(num_bookings)
+            generate_test_bookings(num_bookings, seed=options['seed'])
         
-        self.stdout.write(self.style.SUCCESS('Mock data generation completed successfully!'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(
+            f"Mock data generation completed successfully! {written['rooms']} rooms, "
+            f"{written['bookings']} profile bookings, {written['nights']} room nights"
+        ))
@@ -0,0 +1,76 @@
+"""
+Django management command to bulk-import hotels and rooms from CSV or NDJSON
+files in constant memory.
+Usage: python manage.py import_inventory [--hotels hotels.csv] [--rooms rooms.ndjson]
+       [--batch-size 5000] [--on-conflict update|ignore]
+
+Hotel rows: id (optional UUID; rows with an id are upserted), name, city,
+address, description. Room rows: hotel_id, room_number, room_type, price,
+is_available, capacity, available_from, available_to. Rooms are upserted on
+(hotel, room_number).
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from booking.importer import IMPORT_BATCH_SIZE, ON_CONFLICT, detect_format, import_records, read_records
+
+# Skipped rows listed individually at the end of the report
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = 'Bulk-import hotels and rooms from CSV or NDJSON files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hotels', help='CSV or NDJSON file of hotels (imported first)')
+        parser.add_argument('--rooms', help='CSV or NDJSON file of rooms')
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help='Rows written per bulk insert and transaction')
+        parser.add_argument('--on-conflict', choices=ON_CONFLICT, default='update',
+                            help='Upsert existing rows or leave them untouched')
+        parser.add_argument('--progress-every', type=int, default=10,
+                            help='Report progress every N batches (0 to disable)')
+
+    def progress(self, kind, every):
+        def report(stats):
+            if every and stats.batches % every == 0:
+                self.stderr.write(
+                    f'{kind}: {stats.read} rows read, {stats.written} written, '
+                    f'{stats.skipped} skipped ({stats.rows_per_second:,.0f} rows/s)'
+                )
+        return report
+
+    def handle(self, *args, **options):
+        if not options['hotels'] and not options['rooms']:
+            raise CommandError('Pass --hotels and/or --rooms')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        for kind in ('hotels', 'rooms'):
+            path = options[kind]
+            if not path:
+                continue
+            file_format = options['format'] or detect_format(path)
+            try:
+                with open(path, newline='', encoding='utf-8') as stream:
+                    stats = import_records(
+                        kind,
+                        read_records(stream, file_format),
+                        batch_size=options['batch_size'],
+                        on_conflict=options['on_conflict'],
+                        progress=self.progress(kind, options['progress_every'])
+                    )
+            except OSError as exc:
+                raise CommandError(f'Cannot read {path}: {exc}')
+            except ValueError as exc:
+                raise CommandError(f'{path}: {exc}')
+
+            for line_number, message in stats.errors[:MAX_REPORTED_ERRORS]:
+                self.stderr.write(f'{path}:{line_number}: {message}')
+            if stats.skipped > MAX_REPORTED_ERRORS:
+                self.stderr.write(f'... and {stats.skipped - MAX_REPORTED_ERRORS} more skipped rows')
+            self.stdout.write(self.style.SUCCESS(
+                f'Imported {kind}: {stats.read} rows read, {stats.written} written, '
+                f'{stats.skipped} skipped in {stats.elapsed:.2f}s ({stats.rows_per_second:,.0f} rows/s)'
+            ))
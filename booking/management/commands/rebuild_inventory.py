@@ -0,0 +1,28 @@
+"""
+Django management command to rebuild the room-night inventory from bookings.
+Usage: python manage.py rebuild_inventory [--batch-size 2000]
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from booking.inventory import rebuild, REBUILD_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the room-night inventory table from existing bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE,
+                            help='Number of bookings materialized per batch')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        
+        with transaction.atomic():
+            bookings, nights = rebuild(batch_size=options['batch_size'])
+        
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt inventory: {bookings} active bookings, {nights} room-nights in {elapsed:.2f}s'
+        ))
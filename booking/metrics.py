@@ -0,0 +1,396 @@
+"""
+Prometheus-style metrics without an external client library.
+
+Counters and histograms live in process memory, in one shard per thread
+so recording a sample never waits on another thread. A background thread
+writes them to one JSON file per process in BOOKING_METRICS_DIR every
+FLUSH_INTERVAL seconds; a scrape and exit write it at once. The /metrics
+view merges the files of every process, so the figures aggregate across
+gunicorn workers.
+Files of exited workers are kept, so counters never go backwards. Clear
+the directory when the service is (re)deployed, as with
+prometheus_client's multiprocess mode.
+
+Without BOOKING_METRICS_DIR the metrics of the serving process alone are
+exported (runserver, tests).
+"""
+
+import atexit
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+import weakref
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+# Seconds between writes of this process's metrics file
+FLUSH_INTERVAL = 1.0
+
+# Latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Metric:
+    """
+    A named counter or histogram with one sample per label combination.
+    """
+
+    def __init__(self, registry, name, kind, help_text, labels, buckets=None):
+        self.registry = registry
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) if buckets else None
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def inc(self, amount=1, **labels):
+        self.registry.update(self, self._key(labels), lambda value: (value or 0) + amount)
+
+    def observe(self, value, **labels):
+        index = bisect.bisect_left(self.buckets, value)
+
+        def add(sample):
+            # [count per bucket..., sum, count]; the +Inf bucket is the count
+            if sample is None:
+                sample = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                sample[index] += 1
+            sample[-2] += value
+            sample[-1] += 1
+            return sample
+        self.registry.update(self, self._key(labels), add)
+
+
+class _Shard:
+    """
+    One thread's samples. Only that thread writes them; the lock is taken
+    by readers, so it is almost never contended.
+    """
+    __slots__ = ('lock', 'samples')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+
+class _ShardOwner:
+    """
+    Holds a thread's shard in its thread-local storage; it is dropped when
+    the thread ends, which retires the shard.
+    """
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+class MetricsRegistry:
+    """
+    Process-local samples, flushed to a per-process file for aggregation.
+    """
+
+    def __init__(self):
+        # Reentrant: _reset() drops the thread-local owners, whose finalizers
+        # call _retire() in the thread that still holds the lock
+        self._lock = threading.RLock()
+        self.metrics = {}
+        self._reset()
+
+    def _reset(self):
+        # Live threads' shards; those of finished threads are folded into
+        # _retired, so counters never go backwards and snapshots stay O(live threads)
+        self._shards = set()
+        self._retired = {}
+        self._local = threading.local()
+        self._dirty = False
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Metric(self, name, 'counter', help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Metric(self, name, 'histogram', help_text, labels, buckets))
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def update(self, metric, key, change):
+        owner = getattr(self._local, 'owner', None)
+        if owner is None:
+            owner = self._local.owner = self._new_owner()
+        shard = owner.shard
+        with shard.lock:
+            samples = shard.samples.setdefault(metric.name, {})
+            samples[key] = change(samples.get(key))
+        self._dirty = True
+
+    def _new_owner(self):
+        shard = _Shard()
+        owner = _ShardOwner(shard)
+        with self._lock:
+            self._shards.add(shard)
+        weakref.finalize(owner, self._retire, shard).atexit = False
+        return owner
+
+    def _retire(self, shard):
+        with self._lock:
+            # Shards dropped by clear() or a fork are not folded back in
+            if shard not in self._shards:
+                return
+            self._shards.remove(shard)
+            with shard.lock:
+                for name, samples in shard.samples.items():
+                    target = self._retired.setdefault(name, {})
+                    for key, value in samples.items():
+                        _add_sample(target, key, value)
+
+    def snapshot(self):
+        merged = {}
+        with self._lock:
+            shards = list(self._shards)
+            for name, samples in self._retired.items():
+                target = merged.setdefault(name, {})
+                for key, value in samples.items():
+                    _add_sample(target, json.dumps(key), value)
+        for shard in shards:
+            with shard.lock:
+                for name, samples in shard.samples.items():
+                    target = merged.setdefault(name, {})
+                    for key, value in samples.items():
+                        _add_sample(target, json.dumps(key), value)
+        return merged
+
+    def start_flusher(self):
+        """
+        Write this process's file every FLUSH_INTERVAL seconds from a daemon
+        thread, so requests never wait on the file system.
+        """
+        if not metrics_dir():
+            return
+        threading.Thread(target=self._flush_periodically, name='booking-metrics-flush', daemon=True).start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            if not self._dirty:
+                continue
+            self._dirty = False
+            try:
+                self.flush()
+            except OSError:
+                # Retried at the next interval
+                self._dirty = True
+
+    def _forked(self):
+        # A forked worker starts from zero (its parent's samples are in the
+        # parent's file) and without the parent's threads
+        self._lock = threading.RLock()
+        self._reset()
+        self.start_flusher()
+
+    def flush(self):
+        """
+        Write this process's samples to its file in BOOKING_METRICS_DIR.
+        """
+        directory = metrics_dir()
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as handle:
+            json.dump(self.snapshot(), handle)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """
+        Merge the samples of every process.
+
+        Returns:
+            dict: Metric name to {label key: value or histogram list}
+        """
+        snapshots = [self.snapshot()]
+        directory = metrics_dir()
+        if directory:
+            self.flush()
+            own = os.path.join(directory, f'{os.getpid()}.json')
+            for path in glob.glob(os.path.join(directory, '*.json')):
+                if path == own:
+                    continue
+                try:
+                    with open(path) as handle:
+                        snapshots.append(json.load(handle))
+                except (OSError, ValueError):
+                    # A worker is replacing its file or it is corrupt; skip it this scrape
+                    continue
+
+        merged = {}
+        for snapshot in snapshots:
+            for name, samples in snapshot.items():
+                if name not in self.metrics:
+                    continue
+                target = merged.setdefault(name, {})
+                for key, value in samples.items():
+                    _add_sample(target, key, value)
+        return merged
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+        """
+        merged = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key, value in sorted(merged.get(name, {}).items()):
+                labels = list(zip(metric.labels, json.loads(key)))
+                if metric.kind == 'counter':
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets, value):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(labels + [("le", _number(bound))])} {cumulative}')
+                lines.append(f'{name}_bucket{_labels(labels + [("le", "+Inf")])} {value[-1]}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(value[-2])}')
+                lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        """
+        Drop this process's samples (and its file); used by tests.
+        """
+        with self._lock:
+            self._reset()
+        directory = metrics_dir()
+        if directory:
+            try:
+                os.remove(os.path.join(directory, f'{os.getpid()}.json'))
+            except FileNotFoundError:
+                pass
+
+
+def _add_sample(target, key, value):
+    if isinstance(value, list):
+        previous = target.get(key) or [0] * len(value)
+        target[key] = [a + b for a, b in zip(previous, value)]
+    else:
+        target[key] = target.get(key, 0) + value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{label}="{_escape(value)}"' for label, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def metrics_dir():
+    return getattr(settings, 'BOOKING_METRICS_DIR', None)
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry._forked)
+
+search_duration = registry.histogram(
+    'booking_search_duration_seconds',
+    'Latency of cached search functions, by whether the search cache answered',
+    labels=('function', 'cache'),
+)
+search_cache_lookups = registry.counter(
+    'booking_search_cache_lookups_total',
+    'Search cache lookups by tier (l1: per-process LRU, l2: shared cache) and result',
+    labels=('tier', 'result'),
+)
+booking_create_duration = registry.histogram(
+    'booking_create_duration_seconds',
+    'Latency of POST /api/bookings/ by outcome',
+    labels=('outcome',),
+)
+booking_write_duration = registry.histogram(
+    'booking_write_duration_seconds',
+    'Latency of booking writes in the booking service by outcome',
+    labels=('outcome',),
+)
+throttle_rejections = registry.counter(
+    'booking_throttle_rejections_total',
+    'Requests rejected by a rate throttle',
+    labels=('scope',),
+)
+db_queries = registry.counter(
+    'booking_db_queries_total',
+    'SQL statements executed',
+    labels=('alias',),
+)
+db_query_duration = registry.histogram(
+    'booking_db_query_duration_seconds',
+    'Latency of SQL statements',
+    labels=('alias',),
+)
+
+
+def record_booking_write(outcome, timings):
+    """
+    Booking service metrics hook (see services.register_metrics_hook).
+    """
+    if 'total' in timings:
+        booking_write_duration.observe(timings['total'], outcome=outcome)
+
+
+class _QueryCounter:
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            db_queries.inc(alias=self.alias)
+            db_query_duration.observe(time.perf_counter() - started, alias=self.alias)
+
+
+def count_queries(sender, connection, **kwargs):
+    """
+    connection_created receiver: count the statements of every new connection.
+    """
+    if not any(isinstance(wrapper, _QueryCounter) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.append(_QueryCounter(connection.alias))
+
+
+def install():
+    """
+    Hook the metrics into the database layer and the booking service.
+    Called once from BookingConfig.ready().
+    """
+    from .services import register_metrics_hook
+
+    connection_created.connect(count_queries, dispatch_uid='booking_metrics_count_queries')
+    register_metrics_hook(record_booking_write)
+    registry.start_flusher()
+
+
+def metrics_view(request):
+    """
+    GET /metrics: every metric of every worker in the text exposition format.
+    """
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:50
+
+import django.db.models.deletion
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def backfill_room_nights(apps, schema_editor):
+    """Materialize the nights of existing active bookings in batches."""
+    Booking = apps.get_model("booking", "Booking")
+    RoomNight = apps.get_model("booking", "RoomNight")
+    db_alias = schema_editor.connection.alias
+    batch = []
+    bookings = (
+        Booking.objects.using(db_alias)
+        .filter(is_cancelled=False)
+        .values_list("id", "room_id", "check_in_date", "check_out_date")
+    )
+    for booking_id, room_id, check_in_date, check_out_date in bookings.iterator(
+        chunk_size=2000
+    ):
+        night = check_in_date
+        while night < check_out_date:
+            batch.append(RoomNight(room_id=room_id, booking_id=booking_id, night=night))
+            night += timedelta(days=1)
+        if len(batch) >= 2000:
+            RoomNight.objects.using(db_alias).bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        RoomNight.objects.using(db_alias).bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0002_room_available_from_room_available_to"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RoomNight",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("night", models.DateField()),
+                (
+                    "booking",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="nights",
+                        to="booking.booking",
+                    ),
+                ),
+                (
+                    "room",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="occupied_nights",
+                        to="booking.room",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("room", "night"), name="unique_room_night"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_room_nights, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:55
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS booking_hotel_fts
+    USING fts5(hotel_id UNINDEXED, name, city, tokenize = 'trigram')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS booking_hotel_fts_insert
+    AFTER INSERT ON booking_hotel BEGIN
+        INSERT INTO booking_hotel_fts (hotel_id, name, city)
+        VALUES (new.id, new.name, new.city);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS booking_hotel_fts_update
+    AFTER UPDATE OF id, name, city ON booking_hotel BEGIN
+        DELETE FROM booking_hotel_fts WHERE hotel_id = old.id;
+        INSERT INTO booking_hotel_fts (hotel_id, name, city)
+        VALUES (new.id, new.name, new.city);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS booking_hotel_fts_delete
+    AFTER DELETE ON booking_hotel BEGIN
+        DELETE FROM booking_hotel_fts WHERE hotel_id = old.id;
+    END
+    """,
+    """
+    INSERT INTO booking_hotel_fts (hotel_id, name, city)
+    SELECT id, name, city FROM booking_hotel
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS booking_hotel_fts_insert",
+    "DROP TRIGGER IF EXISTS booking_hotel_fts_update",
+    "DROP TRIGGER IF EXISTS booking_hotel_fts_delete",
+    "DROP TABLE IF EXISTS booking_hotel_fts",
+]
+
+# Django compiles icontains to UPPER(col) LIKE UPPER(%s) on PostgreSQL
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS booking_hotel_name_trgm "
+    "ON booking_hotel USING gin (UPPER(name) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS booking_hotel_city_trgm "
+    "ON booking_hotel USING gin (UPPER(city) gin_trgm_ops)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS booking_hotel_name_trgm",
+    "DROP INDEX IF EXISTS booking_hotel_city_trgm",
+]
+
+
+def _sqlite_supports_trigram(connection):
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE temp.booking_fts_probe "
+                "USING fts5(value, tokenize = 'trigram')"
+            )
+        except Exception:
+            return False
+        cursor.execute("DROP TABLE temp.booking_fts_probe")
+    return True
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_text_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == "sqlite" and _sqlite_supports_trigram(schema_editor.connection):
+        _run(schema_editor, SQLITE_FORWARD)
+    # Other backends fall back to the in-process n-gram index
+
+
+def drop_text_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        _run(schema_editor, POSTGRES_REVERSE)
+    elif vendor == "sqlite":
+        _run(schema_editor, SQLITE_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0003_roomnight"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_text_search_indexes, drop_text_search_indexes),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0004_hotel_text_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="City",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                (
+                    "key",
+                    models.CharField(
+                        help_text="Canonical lowercase name",
+                        max_length=100,
+                        unique=True,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "cities",
+            },
+        ),
+        migrations.CreateModel(
+            name="CityAlias",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "alias",
+                    models.CharField(
+                        help_text="Canonical lowercase alias",
+                        max_length=100,
+                        unique=True,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "city aliases",
+            },
+        ),
+        migrations.AddField(
+            model_name="hotel",
+            name="city_ref",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="hotels",
+                to="booking.city",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="hotel",
+            index=models.Index(
+                fields=["city_ref", "id"], name="booking_hot_city_re_58ba28_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="cityalias",
+            name="city",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="aliases",
+                to="booking.city",
+            ),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:05
+
+from django.db import migrations
+
+BATCH_SIZE = 5000
+
+# Well-known alternative spellings, attached when the canonical city exists
+SEED_ALIASES = {
+    "mumbai": ["bombay"],
+    "bangalore": ["bengaluru"],
+    "kolkata": ["calcutta"],
+    "chennai": ["madras"],
+    "new york": ["nyc", "new york city"],
+    "allahabad": ["prayagraj"],
+    "mysore": ["mysuru"],
+}
+
+
+def normalize(name):
+    return " ".join((name or "").split()).lower()
+
+
+def backfill_hotel_cities(apps, schema_editor):
+    """Create City rows for every distinct hotel city and link hotels in batches."""
+    City = apps.get_model("booking", "City")
+    CityAlias = apps.get_model("booking", "CityAlias")
+    Hotel = apps.get_model("booking", "Hotel")
+    db_alias = schema_editor.connection.alias
+
+    city_ids = dict(City.objects.using(db_alias).values_list("key", "id"))
+    raw_cities = (
+        Hotel.objects.using(db_alias)
+        .filter(city_ref__isnull=True)
+        .values_list("city", flat=True)
+        .distinct()
+    )
+    for raw_city in raw_cities.iterator():
+        key = normalize(raw_city)
+        if not key:
+            continue
+        if key not in city_ids:
+            city = City.objects.using(db_alias).create(
+                key=key, name=" ".join(raw_city.split())
+            )
+            city_ids[key] = city.id
+
+        # Link hotels of this spelling a batch at a time
+        hotels = Hotel.objects.using(db_alias).filter(
+            city=raw_city, city_ref__isnull=True
+        )
+        while True:
+            batch = list(hotels.values_list("id", flat=True)[:BATCH_SIZE])
+            if not batch:
+                break
+            Hotel.objects.using(db_alias).filter(id__in=batch).update(
+                city_ref_id=city_ids[key]
+            )
+
+    for key, aliases in SEED_ALIASES.items():
+        if key in city_ids:
+            for alias in aliases:
+                if alias not in city_ids:
+                    CityAlias.objects.using(db_alias).get_or_create(
+                        alias=alias, defaults={"city_id": city_ids[key]}
+                    )
+
+
+def unlink_hotel_cities(apps, schema_editor):
+    Hotel = apps.get_model("booking", "Hotel")
+    Hotel.objects.using(schema_editor.connection.alias).update(city_ref=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0005_city"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_hotel_cities, unlink_hotel_cities),
+    ]
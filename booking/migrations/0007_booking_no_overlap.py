@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:10
+
+from django.db import migrations
+
+# Active bookings of one room may not share a night. The half-open '[)'
+# range lets a stay start on the day the previous one checks out.
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    "ALTER TABLE booking_booking ADD CONSTRAINT booking_no_overlap "
+    "EXCLUDE USING gist (room_id WITH =, daterange(check_in_date, check_out_date, '[)') WITH &&) "
+    "WHERE (NOT is_cancelled)",
+]
+
+POSTGRES_REVERSE = [
+    "ALTER TABLE booking_booking DROP CONSTRAINT IF EXISTS booking_no_overlap",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def add_overlap_constraint(apps, schema_editor):
+    # Other backends rely on the unique (room, night) inventory rows
+    if schema_editor.connection.vendor == "postgresql":
+        _run(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        _run(schema_editor, POSTGRES_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0006_backfill_hotel_cities"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_overlap_constraint, drop_overlap_constraint),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0007_booking_no_overlap"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="room",
+            name="booking_roo_room_ty_81d7c1_idx",
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                fields=["room_type", "price"], name="room_type_price_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                fields=["hotel", "room_type", "price"], name="room_hotel_type_price_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0008_room_search_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="room",
+            name="booking_roo_is_avai_2c7faa_idx",
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                fields=["hotel", "is_available", "available_from", "available_to"],
+                name="room_hotel_open_window_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("booking", "0009_room_open_window_index"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="booking",
+            name="booking_boo_is_canc_989417_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="room",
+            name="room_hotel_type_price_idx",
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                condition=models.Q(("is_cancelled", False)),
+                fields=["room", "check_in_date", "check_out_date"],
+                name="booking_active_room_stay_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="room",
+            index=models.Index(
+                fields=["hotel", "room_type", "is_available", "price"],
+                name="room_hotel_type_open_idx",
+            ),
+        ),
+    ]
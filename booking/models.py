@@ -1,5 +1,4 @@
 from django.db import models
-from django.core.exceptions import ValidationError
 from django.utils import timezone
 import uuid
 
@@ -10,11 +9,71 @@ ROOM_TYPES = [
     ('SUITE', 'Suite'),
 ]
 
+def normalize_city_name(name):
+    """Canonical lookup key for a city name: trimmed, single-spaced, lowercase"""
+    return ' '.join((name or '').split()).lower()
+
+class CityManager(models.Manager):
+    def matching(self, name):
+        """Cities whose key or alias matches `name` exactly"""
+        key = normalize_city_name(name)
+        # A subquery rather than a join: an OR across a LEFT JOIN can only be planned as a scan of every city
+        aliased = CityAlias.objects.filter(alias=key).values('city_id')
+        return self.filter(models.Q(key=key) | models.Q(id__in=aliased))
+    
+    def resolve(self, name):
+        """Return the City whose key or alias matches `name` exactly, or None"""
+        if not normalize_city_name(name):
+            return None
+        return self.matching(name).first()
+    
+    async def aresolve(self, name):
+        """Async version of resolve()"""
+        if not normalize_city_name(name):
+            return None
+        return await self.matching(name).afirst()
+    
+    def for_name(self, name):
+        """Return the City for `name`, creating it if it is not known yet"""
+        city = self.resolve(name)
+        if city is None:
+            city, _ = self.get_or_create(key=normalize_city_name(name), defaults={'name': ' '.join(name.split())})
+        return city
+
+class City(models.Model):
+    """Normalized city dimension referenced by hotels"""
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, unique=True, help_text="Canonical lowercase name")
+    
+    objects = CityManager()
+    
+    def __str__(self):
+        return self.name
+    
+    class Meta:
+        verbose_name_plural = 'cities'
+
+class CityAlias(models.Model):
+    """Alternative spelling of a city (e.g. Bombay for Mumbai)"""
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='aliases')
+    alias = models.CharField(max_length=100, unique=True, help_text="Canonical lowercase alias")
+    
+    def __str__(self):
+        return f"{self.alias} -> {self.city.name}"
+    
+    def save(self, *args, **kwargs):
+        self.alias = normalize_city_name(self.alias)
+        super().save(*args, **kwargs)
+    
+    class Meta:
+        verbose_name_plural = 'city aliases'
+
 class Hotel(models.Model):
     """Model representing a hotel"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100)
     city = models.CharField(max_length=100)
+    city_ref = models.ForeignKey(City, on_delete=models.PROTECT, null=True, blank=True, related_name='hotels')
     address = models.TextField()
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -23,10 +82,17 @@ class Hotel(models.Model):
     def __str__(self):
         return f"{self.name} - {self.city}"
     
+    def save(self, *args, **kwargs):
+        # Keep the normalized city reference in line with the free-text city
+        if self.city and (self.city_ref is None or self.city_ref.key != normalize_city_name(self.city)):
+            self.city_ref = City.objects.for_name(self.city)
+        super().save(*args, **kwargs)
+    
     class Meta:
         indexes = [
             models.Index(fields=['name']),
             models.Index(fields=['city']),
+            models.Index(fields=['city_ref', 'id']),
         ]
 
 class Room(models.Model):
@@ -49,8 +115,13 @@ class Room(models.Model):
     class Meta:
         unique_together = ['hotel', 'room_number']
         indexes = [
-            models.Index(fields=['room_type']),
-            models.Index(fields=['is_available']),
+            # Ranked search filters: room type with a price band, per hotel or across hotels
+            models.Index(fields=['room_type', 'price'], name='room_type_price_idx'),
+            # Per hotel also the rooms list filters (hotel_id, room_type, is_available)
+            models.Index(fields=['hotel', 'room_type', 'is_available', 'price'], name='room_hotel_type_open_idx'),
+            # Open-for-the-stay predicate of the availability engine (availability.open_rooms)
+            models.Index(fields=['hotel', 'is_available', 'available_from', 'available_to'],
+                         name='room_hotel_open_window_idx'),
         ]
 
 class Booking(models.Model):
@@ -68,29 +139,40 @@ class Booking(models.Model):
         return f"{self.guest_name} - {self.room} ({self.check_in_date} to {self.check_out_date})"
     
     def clean(self):
-        # Ensure check-out date is after check-in date
-        if self.check_in_date and self.check_out_date:
-            if self.check_out_date < self.check_in_date:
-                raise ValidationError("Check-out date must be after check-in date")
+        from .services import validate_booking
         
-        # Check for double booking
-        if not self.is_cancelled and self.id is None:  # Only check on new bookings
-            overlapping_bookings = Booking.objects.filter(
-                room=self.room,
-                is_cancelled=False,
-                check_in_date__lt=self.check_out_date,
-                check_out_date__gt=self.check_in_date
-            )
-            
-            if overlapping_bookings.exists():
-                raise ValidationError("This room is already booked for the selected dates")
+        validate_booking(self)
     
     def save(self, *args, **kwargs):
-        self.clean()
-        super().save(*args, **kwargs)
+        # The booking engine validates the stay, writes the room-night inventory
+        # in the same transaction and raises BookingConflict on overlaps
+        from .services import save_booking
+        
+        save_booking(self, *args, **kwargs)
     
     class Meta:
         indexes = [
             models.Index(fields=['check_in_date', 'check_out_date']),
-            models.Index(fields=['is_cancelled']),
+            # Active bookings per room in stay order (per-room booking lists);
+            # cancelled bookings are never read by these queries, so they are left out
+            models.Index(fields=['room', 'check_in_date', 'check_out_date'], condition=models.Q(is_cancelled=False),
+                         name='booking_active_room_stay_idx'),
+        ]
+
+class RoomNight(models.Model):
+    """
+    Materialized inventory: one row per room per night held by an active booking.
+    Availability for a date range becomes an indexed (room, night) range lookup
+    instead of an interval-overlap scan over bookings.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='occupied_nights')
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='nights')
+    night = models.DateField()
+    
+    def __str__(self):
+        return f"{self.room_id} - {self.night}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'night'], name='unique_room_night'),
         ]
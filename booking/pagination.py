@@ -0,0 +1,145 @@
+"""
+Keyset (cursor) pagination for the API list endpoints.
+
+Pages are fetched with `WHERE id > <last id> ORDER BY id LIMIT n` on the
+primary key index, so deep pages cost the same as the first one and no
+COUNT(*) runs over the filtered table. Clients that need a total can ask
+for an approximate count read from the database's table statistics.
+"""
+
+from collections import OrderedDict
+from asgiref.sync import sync_to_async
+from django.db import connection
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+
+def approximate_row_count(model):
+    """
+    Estimate the number of rows of a model's table from planner statistics.
+
+    Returns:
+        int: Estimated row count, or None if the database keeps no statistics
+            (e.g. SQLite before ANALYZE has been run)
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # The first number of every stat row of a table is its estimated row count
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s", [table]
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination ordered on the primary key.
+    Pass ?approx_count=true to include an estimated total from table statistics.
+    """
+    ordering = 'id'
+    approx_count_query_param = 'approx_count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.model = getattr(queryset, 'model', None)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_keyset_bounds(self, request):
+        """
+        Decode the request's cursor into keyset bounds for code that runs its
+        own keyset query (such as search_hotels_optimized).
+
+        Returns:
+            tuple: (after, before) primary key values; at most one is set
+        """
+        cursor = self.decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return None, None
+        if cursor.reverse:
+            return None, cursor.position
+        return cursor.position, None
+
+    def wants_approximate_count(self):
+        value = self.request.query_params.get(self.approx_count_query_param, '')
+        return value.lower() in ('1', 'true', 'yes')
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.model is not None and self.wants_approximate_count():
+            payload['approximate_count'] = approximate_row_count(self.model)
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['approximate_count'] = {'type': 'integer', 'nullable': True}
+        return response_schema
+
+    async def apaginate(self, queryset, request, serialize):
+        """
+        Async keyset pagination for plain Django async views, producing the
+        same payload (and cursors) as the DRF list endpoints.
+
+        Args:
+            queryset (QuerySet): Unordered queryset to page through by id
+            request (HttpRequest): The incoming request
+            serialize (callable): Turns the list of page rows into result data
+
+        Returns:
+            OrderedDict: next, previous, optional approximate_count and results
+
+        Raises:
+            NotFound: If the cursor parameter is invalid
+        """
+        self.request = Request(request)
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        page_size = self.get_page_size(self.request)
+        after, before = self.get_keyset_bounds(self.request)
+
+        if before is not None:
+            queryset = queryset.filter(id__lt=before).order_by('-id')
+        elif after is not None:
+            queryset = queryset.filter(id__gt=after).order_by('id')
+        else:
+            queryset = queryset.order_by('id')
+        rows = [row async for row in queryset[:page_size + 1]]
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if before is not None:
+            rows.reverse()
+
+        next_link = previous_link = None
+        if rows and (before is not None or has_more):
+            next_link = self.encode_cursor(Cursor(offset=0, reverse=False, position=str(rows[-1].id)))
+        if rows and (after is not None or (before is not None and has_more)):
+            previous_link = self.encode_cursor(Cursor(offset=0, reverse=True, position=str(rows[0].id)))
+
+        payload = OrderedDict([
+            ('next', next_link),
+            ('previous', previous_link),
+        ])
+        if self.wants_approximate_count():
+            payload['approximate_count'] = await sync_to_async(approximate_row_count)(self.model)
+        payload['results'] = serialize(rows)
+        return payload
+
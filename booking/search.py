@@ -1,6 +1,24 @@
-from django.db.models import Q
+from collections import namedtuple
+from django.db.models import Count, Max, Min
 from .models import Hotel, Room
 from .cache import cache_search_results
+from .availability import free_rooms, hotels_with_free_rooms
+from .text_search import filter_hotels
+
+# Compact search result row stored in the search cache
+HotelRow = namedtuple('HotelRow', ['id', 'name', 'city'])
+
+# Ranked search result row: the cheapest price, number and largest capacity
+# of the hotel's rooms that are free for the requested dates
+HotelOffer = namedtuple('HotelOffer', ['id', 'name', 'city', 'min_price', 'free_rooms', 'max_capacity'])
+
+# Sort orders of search_hotels_ranked; the hotel id breaks ties so pages are stable
+RANKED_SORT_ORDERS = {
+    'price': ('min_price', 'hotel_id'),
+    '-price': ('-min_price', 'hotel_id'),
+    'availability': ('-free_rooms', 'min_price', 'hotel_id'),
+    'capacity': ('-max_capacity', 'min_price', 'hotel_id'),
+}
 
 class HotelSearch:
     """
@@ -26,12 +44,8 @@ class HotelSearch:
         if not filters:
             filters = {}
         
-        # Apply filters
-        if 'city' in filters and filters['city']:
-            queryset = queryset.filter(city__icontains=filters['city'])
-        
-        if 'name' in filters and filters['name']:
-            queryset = queryset.filter(name__icontains=filters['name'])
+        # Apply filters through the trigram-backed text search
+        queryset = filter_hotels(queryset, city=filters.get('city'), name=filters.get('name'))
         
         # Apply pagination
         if limit is not None:
@@ -65,18 +79,14 @@ class HotelSearch:
         
         # Filter for available rooms during the specified date range
         if check_in_date and check_out_date:
-            # Exclude rooms with overlapping bookings
-            queryset = queryset.exclude(
-                bookings__is_cancelled=False,
-                bookings__check_in_date__lt=check_out_date,
-                bookings__check_out_date__gt=check_in_date
-            )
+            # Rooms open for the stay without overlapping bookings
+            queryset = free_rooms(check_in_date, check_out_date, queryset)
         
         return queryset
 
 # Optimized search function for large datasets
 @cache_search_results
-def search_hotels_optimized(city=None, name=None, unfilled_only=False, check_in_date=None, check_out_date=None, limit=100, offset=0):
+def search_hotels_optimized(city=None, name=None, unfilled_only=False, check_in_date=None, check_out_date=None, limit=100, offset=0, after=None, before=None):
     """
     Optimized search function for large datasets.
     Uses indexed fields and query optimization.
@@ -89,53 +99,82 @@ def search_hotels_optimized(city=None, name=None, unfilled_only=False, check_in_
         check_in_date (date): Check-in date for availability check
         check_out_date (date): Check-out date for availability check
         limit (int): Maximum number of results
-        offset (int): Offset for pagination
+        offset (int): Offset for pagination (prefer the keyset arguments)
+        after (UUID): Keyset cursor; return hotels with an id greater than this
+        before (UUID): Keyset cursor; return the hotels immediately preceding this id
         
     Returns:
-        list: List of matching hotels
+        list: List of HotelRow(id, name, city) tuples, ordered by id
     """
-    query = Hotel.objects.all()
+    # Substring filters are served by the trigram-backed text search
+    query = filter_hotels(Hotel.objects.all(), city=city, name=name)
     
-    # Build query filters
-    filters = Q()
-    
-    if city:
-        filters &= Q(city__icontains=city)
+    # Filter for hotels with unfilled (available) rooms if requested.
+    # This is a single correlated EXISTS query rather than one query per hotel.
+    if unfilled_only and check_in_date and check_out_date:
+        query = hotels_with_free_rooms(query, check_in_date, check_out_date)
     
-    if name:
-        filters &= Q(name__icontains=name)
+    # Keyset pagination on the primary key index: WHERE id > cursor ORDER BY id LIMIT n
+    if before is not None:
+        rows = query.filter(id__lt=before).order_by('-id').values_list('id', 'name', 'city')[offset:offset+limit]
+        rows = reversed(list(rows))
+    else:
+        if after is not None:
+            query = query.filter(id__gt=after)
+        # Materialize compact (id, name, city) rows so the cache stores results,
+        # not a lazy query definition
+        rows = query.order_by('id').values_list('id', 'name', 'city')[offset:offset+limit]
     
-    # Apply filters if any exist
-    if filters:
-        query = query.filter(filters)
+    return [HotelRow(*row) for row in rows]
+
+@cache_search_results
+def search_hotels_ranked(check_in_date, check_out_date, city=None, name=None, room_type=None, min_capacity=None, min_price=None, max_price=None, sort='price', limit=100, offset=0):
+    """
+    Hotels with free rooms for the dates, ranked by price or availability.
+    The prices, free room counts and capacities of every hotel on the page
+    come from one aggregated query over the free rooms.
     
-    # Filter for hotels with unfilled (available) rooms if requested
-    if unfilled_only and check_in_date and check_out_date:
-        # Get hotels that have at least one available room
-        hotels_with_available_rooms = []
-        
-        for hotel in query:
-            # Check if hotel has any available rooms for the specified dates
-            available_rooms = Room.objects.filter(hotel=hotel).exclude(
-                bookings__is_cancelled=False,
-                bookings__check_in_date__lt=check_out_date,
-                bookings__check_out_date__gt=check_in_date
-            )
-            
-            if available_rooms.exists():
-                hotels_with_available_rooms.append(hotel.id)
+    Args:
+        check_in_date (date): Check-in date
+        check_out_date (date): Check-out date
+        city (str): City name to filter by
+        name (str): Hotel name to filter by
+        room_type (str): Only count rooms of this type
+        min_capacity (int): Only count rooms sleeping at least this many guests
+        min_price (Decimal): Only count rooms costing at least this much
+        max_price (Decimal): Only count rooms costing at most this much
+        sort (str): One of RANKED_SORT_ORDERS
+        limit (int): Maximum number of results
+        offset (int): Offset for pagination
         
-        # Filter the query to only include hotels with available rooms
-        if hotels_with_available_rooms:
-            query = query.filter(id__in=hotels_with_available_rooms)
-        else:
-            # No hotels with available rooms found
-            return Hotel.objects.none()
+    Returns:
+        list: List of HotelOffer tuples in the requested order
     
-    # Use only() to select specific fields for better performance
-    query = query.only('id', 'name', 'city')
+    Raises:
+        ValueError: If sort is not a known sort order
+    """
+    if sort not in RANKED_SORT_ORDERS:
+        raise ValueError(f"sort must be one of: {', '.join(RANKED_SORT_ORDERS)}")
     
-    # Apply pagination
-    query = query[offset:offset+limit]
+    rooms = Room.objects.all()
+    if room_type:
+        rooms = rooms.filter(room_type=room_type)
+    if min_capacity is not None:
+        rooms = rooms.filter(capacity__gte=min_capacity)
+    if min_price is not None:
+        rooms = rooms.filter(price__gte=min_price)
+    if max_price is not None:
+        rooms = rooms.filter(price__lte=max_price)
+    if city or name:
+        hotels = filter_hotels(Hotel.objects.all(), city=city, name=name)
+        rooms = rooms.filter(hotel_id__in=hotels.values('id'))
+    rooms = free_rooms(check_in_date, check_out_date, rooms)
     
-    return query
\ No newline at end of file
+    # GROUP BY hotel over the matching free rooms
+    rows = (
+        rooms.values('hotel_id', 'hotel__name', 'hotel__city')
+        .annotate(min_price=Min('price'), free_rooms=Count('id'), max_capacity=Max('capacity'))
+        .order_by(*RANKED_SORT_ORDERS[sort])
+        .values_list('hotel_id', 'hotel__name', 'hotel__city', 'min_price', 'free_rooms', 'max_capacity')
+    )[offset:offset+limit]
+    return [HotelOffer(*row) for row in rows]
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Hotel, Room, Booking
-from django.core.exceptions import ValidationError
+from .services import MAX_BULK_SIZE, create_booking, validate_dates
+from django.core.exceptions import ValidationError as DjangoValidationError
 
 class HotelSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,6 +15,40 @@ class RoomSerializer(serializers.ModelSerializer):
     class Meta:
         model = Room
         fields = ['id', 'hotel', 'hotel_name', 'room_number', 'room_type', 'room_type_display', 'price', 'is_available', 'capacity']
+    
+    # Columns read when serializing, relative to Room
+    load_only = ['id', 'hotel', 'hotel__name', 'room_number', 'room_type', 'price', 'is_available', 'capacity']
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Load the hotel in the same query and only the columns the serializer reads.
+        """
+        return queryset.select_related('hotel').only(*cls.load_only)
+
+class RoomAvailabilitySerializer(RoomSerializer):
+    """
+    Room with its status for a date range, as computed by hotel_room_availability.
+    """
+    is_free = serializers.BooleanField(read_only=True)
+    next_free_date = serializers.DateField(read_only=True, allow_null=True)
+    
+    class Meta(RoomSerializer.Meta):
+        fields = RoomSerializer.Meta.fields + ['is_free', 'next_free_date']
+    
+    # The open window is read when computing the status
+    load_only = RoomSerializer.load_only + ['available_from', 'available_to']
+
+class HotelOfferSerializer(serializers.Serializer):
+    """
+    Hotel with the free rooms matching a ranked search (search.HotelOffer).
+    """
+    id = serializers.UUIDField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    city = serializers.CharField(read_only=True)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    free_rooms = serializers.IntegerField(read_only=True)
+    max_capacity = serializers.IntegerField(read_only=True)
 
 class BookingSerializer(serializers.ModelSerializer):
     room_details = RoomSerializer(source='room', read_only=True)
@@ -23,31 +58,42 @@ class BookingSerializer(serializers.ModelSerializer):
         fields = ['id', 'room', 'room_details', 'guest_name', 'guest_email', 'check_in_date', 'check_out_date', 'booking_date', 'is_cancelled']
         read_only_fields = ['booking_date']
     
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Load the room and its hotel in the same query and only the columns the
+        serializer (including the nested room details) reads.
+        """
+        booking_fields = ['id', 'room', 'guest_name', 'guest_email', 'check_in_date',
+                          'check_out_date', 'booking_date', 'is_cancelled']
+        room_fields = [f'room__{field}' for field in RoomSerializer.load_only]
+        return queryset.select_related('room__hotel').only(*booking_fields, *room_fields)
+    
     def validate(self, data):
-        # Ensure check-out date is after check-in date
-        if data.get('check_in_date') and data.get('check_out_date'):
-            if data['check_out_date'] < data['check_in_date']:
-                raise serializers.ValidationError("Check-out date must be after check-in date")
-        
-        # Check for double booking
-        room = data.get('room')
-        check_in_date = data.get('check_in_date')
-        check_out_date = data.get('check_out_date')
-        booking_id = self.instance.id if self.instance else None
-        
-        if room and check_in_date and check_out_date:
-            overlapping_bookings = Booking.objects.filter(
-                room=room,
-                is_cancelled=False,
-                check_in_date__lt=check_out_date,
-                check_out_date__gt=check_in_date
-            )
-            
-            # Exclude current booking when updating
-            if booking_id:
-                overlapping_bookings = overlapping_bookings.exclude(id=booking_id)
-            
-            if overlapping_bookings.exists():
-                raise serializers.ValidationError("This room is already booked for the selected dates")
-        
-        return data
\ No newline at end of file
+        # Overlaps are rejected by the booking engine when the booking is written
+        try:
+            validate_dates(data.get('check_in_date'), data.get('check_out_date'))
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
+        return data
+    
+    def create(self, validated_data):
+        return create_booking(**validated_data)
+
+class BulkBookingItemSerializer(serializers.Serializer):
+    """
+    One stay of a bulk request. Rooms are looked up by the booking service
+    in a single query, so `room` is a plain id here.
+    """
+    room = serializers.UUIDField()
+    guest_name = serializers.CharField(max_length=100)
+    guest_email = serializers.EmailField()
+    check_in_date = serializers.DateField()
+    check_out_date = serializers.DateField()
+
+class BulkBookingSerializer(serializers.Serializer):
+    MODES = ('atomic', 'best_effort')
+    
+    mode = serializers.ChoiceField(choices=MODES, default='atomic')
+    bookings = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=MAX_BULK_SIZE)
+
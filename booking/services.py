@@ -0,0 +1,346 @@
+"""
+Booking engine.
+
+Every booking write goes through this module: the API serializer and
+viewset, Booking.save() and test_functions.book_room all delegate here, so a
+booking is validated once and written with a single insert.
+
+Bookings are inserted optimistically: instead of locking the room and
+probing for overlaps first, the insert itself is the check. The database
+rejects overlapping stays through
+
+- PostgreSQL: the `booking_no_overlap` daterange exclusion constraint on
+  booking_booking (created by migration 0007)
+- everything else: the unique (room, night) constraint on the RoomNight
+  inventory rows written in the same transaction as the booking
+
+and the resulting IntegrityError is translated into BookingConflict.
+
+Each write reports per-phase timings to the hooks registered with
+register_metrics_hook().
+"""
+
+import logging
+import time
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from .availability import room_is_free, room_is_open
+from .models import Booking, Room, RoomNight
+
+logger = logging.getLogger(__name__)
+
+CONFLICT_MESSAGE = "This room is already booked for the selected dates"
+INVALID_DATES_MESSAGE = "Check-out date must be after check-in date"
+ROOM_CLOSED_MESSAGE = "This room is not available for the selected dates"
+
+# Constraint / table names reported when an insert overlaps an existing stay
+OVERLAP_CONSTRAINTS = ('booking_no_overlap', 'unique_room_night', 'booking_roomnight')
+
+# SQLite reports concurrent writers as "database is locked" / "database table
+# is locked"; such writes are retried with exponential backoff
+LOCK_RETRIES = 8
+LOCK_RETRY_DELAY = 0.005
+
+# Largest number of bookings accepted by one create_bookings() call
+MAX_BULK_SIZE = 500
+
+# Callables invoked as hook(outcome, timings) after every booking write
+_metrics_hooks = []
+
+
+class BookingConflict(Exception):
+    """
+    The room is already booked for (part of) the requested stay.
+    """
+    def __init__(self, message=CONFLICT_MESSAGE):
+        super().__init__(message)
+
+
+def register_metrics_hook(hook):
+    """
+    Receive the outcome and per-phase timings of every booking write.
+
+    Args:
+        hook (callable): Called as hook(outcome, timings) where outcome is
+            'created', 'updated', 'conflict' or 'error' and timings maps the
+            phases 'validate', 'write', 'inventory', 'commit' and 'total' to
+            seconds (phases that did not run are absent) plus 'attempts'.
+            Bulk writes report outcome 'bulk' with the phases 'lock', 'probe',
+            'write', 'commit' and 'total' plus 'attempts' and 'bookings'
+    """
+    if hook not in _metrics_hooks:
+        _metrics_hooks.append(hook)
+
+
+def unregister_metrics_hook(hook):
+    if hook in _metrics_hooks:
+        _metrics_hooks.remove(hook)
+
+
+def _report(outcome, timings):
+    for hook in list(_metrics_hooks):
+        try:
+            hook(outcome, timings)
+        except Exception:
+            # Metrics must never fail a booking
+            logger.exception("Booking metrics hook %r failed", hook)
+
+
+def is_overlap_violation(exc):
+    message = str(exc)
+    return any(name in message for name in OVERLAP_CONSTRAINTS)
+
+
+def is_lock_error(exc):
+    return 'locked' in str(exc).lower()
+
+
+def _with_lock_retries(write, timings, on_retry=None):
+    """
+    Run `write` in a transaction, retrying SQLite lock errors with backoff.
+
+    Args:
+        write (callable): Performs the writes; its return value is passed through
+        timings (dict): Per-phase timings; its 'attempts' counter is incremented
+        on_retry (callable): Resets in-memory state before another attempt
+    """
+    while True:
+        timings['attempts'] += 1
+        try:
+            with transaction.atomic():
+                return write()
+        except OperationalError as exc:
+            # Inside an outer transaction the failed statement cannot be replayed
+            if not is_lock_error(exc) or timings['attempts'] > LOCK_RETRIES or connection.in_atomic_block:
+                raise
+            time.sleep(LOCK_RETRY_DELAY * 2 ** (timings['attempts'] - 1))
+        if on_retry is not None:
+            on_retry()
+
+
+def validate_dates(check_in_date, check_out_date):
+    """
+    Raise ValidationError unless the stay ends after its start. A stay
+    has at least one night; a zero-night stay would hold no room-night.
+    """
+    if check_in_date and check_out_date and check_out_date <= check_in_date:
+        raise ValidationError(INVALID_DATES_MESSAGE)
+
+
+def validate_room_open(room, check_in_date, check_out_date):
+    """
+    Raise ValidationError unless the room is available and the stay lies
+    inside its available_from / available_to window.
+    """
+    if not room_is_open(room, check_in_date, check_out_date):
+        raise ValidationError(ROOM_CLOSED_MESSAGE)
+
+
+def validate_booking(booking):
+    """
+    Full validation for forms and the admin: dates, the room's open window
+    plus one overlap probe. Writes do not need the probe; the database
+    constraints reject overlaps.
+
+    Raises:
+        ValidationError: If the dates are invalid, the room is closed for
+            them or the room is taken
+    """
+    validate_dates(booking.check_in_date, booking.check_out_date)
+    if booking.is_cancelled or not (booking.room_id and booking.check_in_date and booking.check_out_date):
+        return
+    validate_room_open(booking.room, booking.check_in_date, booking.check_out_date)
+    exclude_booking_id = None if booking._state.adding else booking.id
+    if not room_is_free(booking.room_id, booking.check_in_date, booking.check_out_date, exclude_booking_id):
+        raise ValidationError(CONFLICT_MESSAGE)
+
+
+def save_booking(booking, *args, **kwargs):
+    """
+    Validate and write a booking and its room-night inventory atomically.
+
+    Args:
+        booking (Booking): New or changed booking
+        *args, **kwargs: Passed on to Model.save()
+
+    Returns:
+        Booking: The saved booking
+
+    New bookings are only accepted for rooms that are open for the stay;
+    existing bookings keep their room if it is closed later.
+
+    Raises:
+        ValidationError: If check-out is before check-in or the room is not
+            open for a new stay
+        BookingConflict: If an active booking already holds one of the nights
+    """
+    from .inventory import sync_booking
+
+    created = booking._state.adding
+    timings = {'attempts': 0}
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        phase = time.perf_counter()
+        validate_dates(booking.check_in_date, booking.check_out_date)
+        if created and not booking.is_cancelled:
+            validate_room_open(booking.room, booking.check_in_date, booking.check_out_date)
+        timings['validate'] = time.perf_counter() - phase
+
+        def write():
+            phase = time.perf_counter()
+            super(Booking, booking).save(*args, **kwargs)
+            timings['write'] = time.perf_counter() - phase
+
+            phase = time.perf_counter()
+            sync_booking(booking, created=created)
+            timings['inventory'] = time.perf_counter() - phase
+            return time.perf_counter()
+
+        def reset():
+            # The failed attempt may have flagged the instance as saved
+            booking._state.adding = created
+
+        try:
+            written_at = _with_lock_retries(write, timings, on_retry=reset)
+        except IntegrityError as exc:
+            if is_overlap_violation(exc):
+                outcome = 'conflict'
+                raise BookingConflict() from exc
+            raise
+        timings['commit'] = time.perf_counter() - written_at
+
+        outcome = 'created' if created else 'updated'
+        return booking
+    finally:
+        timings['total'] = time.perf_counter() - started
+        _report(outcome, timings)
+
+
+def create_booking(room, check_in_date, check_out_date, **fields):
+    """
+    Book a room for [check_in, check_out).
+
+    Args:
+        room (Room): Room to book
+        check_in_date (date): Check-in date
+        check_out_date (date): Check-out date
+        **fields: Remaining Booking fields (guest_name, guest_email, ...)
+
+    Returns:
+        Booking: The saved booking
+
+    Raises:
+        ValidationError: If check-out is before check-in or the room is not
+            open for the stay
+        BookingConflict: If an active booking already holds one of the nights
+    """
+    booking = Booking(room=room, check_in_date=check_in_date, check_out_date=check_out_date, **fields)
+    return save_booking(booking)
+
+
+def create_bookings(items, atomic=True):
+    """
+    Book many stays with one lock query, one overlap probe and one bulk insert.
+
+    The rooms involved are locked in primary key order, so concurrent batches
+    cannot deadlock each other. Overlaps with existing bookings and between
+    items of the batch are both detected from the single probe; the database
+    constraints still back the probe up against concurrent single bookings.
+
+    Args:
+        items (list): Dicts with room_id, check_in_date, check_out_date and the
+            remaining Booking fields (guest_name, guest_email, ...)
+        atomic (bool): All-or-nothing if True; otherwise every item that can
+            be booked is booked and the others are reported
+
+    Returns:
+        list: One (status, value) pair per item, in input order. status is
+            'created' (value: Booking), 'conflict', 'invalid' (value: message)
+            or, in atomic mode when another item failed, 'rolled_back'
+    """
+    from .inventory import build_nights, stay_nights
+    from .signals import bookings_bulk_created
+
+    if len(items) > MAX_BULK_SIZE:
+        raise ValidationError(f"At most {MAX_BULK_SIZE} bookings can be created at once")
+
+    timings = {'attempts': 0, 'bookings': 0}
+    started = time.perf_counter()
+
+    def write():
+        results = [None] * len(items)
+        accepted = []
+
+        phase = time.perf_counter()
+        room_ids = sorted({item['room_id'] for item in items})
+        rooms = {
+            room.id: room
+            for room in Room.objects.select_for_update().filter(id__in=room_ids).order_by('id')
+            .only('id', 'hotel_id', 'is_available', 'available_from', 'available_to')
+        }
+        room_hotels = {room_id: room.hotel_id for room_id, room in rooms.items()}
+        timings['lock'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        for position, item in enumerate(items):
+            if item['room_id'] not in rooms:
+                results[position] = ('invalid', "Room not found")
+            elif item['check_out_date'] <= item['check_in_date']:
+                results[position] = ('invalid', INVALID_DATES_MESSAGE)
+            elif not room_is_open(rooms[item['room_id']], item['check_in_date'], item['check_out_date']):
+                results[position] = ('invalid', ROOM_CLOSED_MESSAGE)
+            else:
+                accepted.append(position)
+
+        taken = set()
+        if accepted:
+            taken = set(
+                RoomNight.objects.filter(
+                    room_id__in={items[position]['room_id'] for position in accepted},
+                    night__gte=min(items[position]['check_in_date'] for position in accepted),
+                    night__lt=max(items[position]['check_out_date'] for position in accepted),
+                ).values_list('room_id', 'night')
+            )
+
+        bookings = []
+        for position in accepted:
+            item = dict(items[position])
+            room_id = item.pop('room_id')
+            nights = {(room_id, night) for night in stay_nights(item['check_in_date'], item['check_out_date'])}
+            if nights & taken:
+                results[position] = ('conflict', CONFLICT_MESSAGE)
+                continue
+            taken |= nights
+            booking = Booking(room_id=room_id, **item)
+            bookings.append(booking)
+            results[position] = ('created', booking)
+        timings['probe'] = time.perf_counter() - phase
+
+        if atomic and len(bookings) < len(items):
+            return [
+                ('rolled_back', None) if outcome == 'created' else (outcome, value)
+                for outcome, value in results
+            ], [], room_hotels, time.perf_counter()
+
+        phase = time.perf_counter()
+        Booking.objects.bulk_create(bookings)
+        RoomNight.objects.bulk_create(build_nights(bookings))
+        timings['write'] = time.perf_counter() - phase
+        return results, bookings, room_hotels, time.perf_counter()
+
+    try:
+        results, bookings, room_hotels, written_at = _with_lock_retries(write, timings)
+    except IntegrityError as exc:
+        # A concurrent booking slipped in after the probe; probe again
+        if not is_overlap_violation(exc) or connection.in_atomic_block:
+            raise
+        results, bookings, room_hotels, written_at = _with_lock_retries(write, timings)
+    timings['commit'] = time.perf_counter() - written_at
+    timings['bookings'] = len(bookings)
+
+    bookings_bulk_created(bookings, room_hotels)
+    timings['total'] = time.perf_counter() - started
+    _report('bulk', timings)
+    return results
+
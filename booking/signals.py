@@ -0,0 +1,123 @@
+"""
+Signal handlers that keep in-process derived state in sync with writes.
+"""
+
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Hotel, Room, Booking
+from .cache import invalidate_city, invalidate_hotel_cache
+from .text_search import hotels_changed, ngram_index
+
+
+def _loaded_hotel_id(booking):
+    """
+    Hotel id of the booked room if the room is already loaded (validation and
+    the serializer load it), else None; avoids a query inside the booking write.
+    """
+    return booking.room.hotel_id if Booking.room.is_cached(booking) else None
+
+
+def _invalidate_after_write(invalidate):
+    """
+    Invalidate immediately, and again once the surrounding transaction
+    commits so a search recomputed from pre-commit data cannot stay cached.
+    """
+    invalidate()
+    if connection.in_atomic_block:
+        transaction.on_commit(invalidate)
+
+
+@receiver([post_save, post_delete], sender=Hotel)
+def invalidate_search_cache_for_hotel(sender, instance, **kwargs):
+    """
+    Hotel rows change rarely and may move between cities, so retire all searches.
+    """
+    _invalidate_after_write(invalidate_hotel_cache)
+
+
+def _invalidate_hotel_city(**hotel_filter):
+    """
+    Invalidate searches for the city of the hotel matching `hotel_filter`,
+    including searches made through one of the city's aliases.
+    """
+    rows = list(
+        Hotel.objects.filter(**hotel_filter).values_list('city', 'city_ref__aliases__alias')[:50]
+    )
+    if not rows:
+        _invalidate_after_write(invalidate_hotel_cache)
+        return
+
+    city = rows[0][0]
+    aliases = [alias for _, alias in rows if alias]
+    _invalidate_after_write(lambda: invalidate_city(city, aliases))
+
+
+@receiver([post_save, post_delete], sender=Room)
+def invalidate_search_cache_for_room(sender, instance, **kwargs):
+    """
+    Room changes affect availability searches in the room's city.
+    """
+    _invalidate_hotel_city(id=instance.hotel_id)
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def invalidate_search_cache_for_booking(sender, instance, **kwargs):
+    """
+    Booking changes affect availability searches in the booked hotel's city.
+
+    The city is looked up and invalidated after the write commits, which
+    keeps the booking transaction to its inserts and also retires searches
+    recomputed from pre-commit data.
+    """
+    hotel_id = _loaded_hotel_id(instance)
+    hotel_filter = {'id': hotel_id} if hotel_id else {'rooms__id': instance.room_id}
+    transaction.on_commit(lambda: _invalidate_hotel_city(**hotel_filter))
+
+
+def bookings_bulk_created(bookings, room_hotels):
+    """
+    Counterpart of the Booking post_save handlers for bulk inserts, which send
+    no signals: each affected city is invalidated once.
+
+    Args:
+        bookings (list): Bookings inserted with bulk_create
+        room_hotels (dict): Hotel id of every booked room id
+    """
+    if not bookings:
+        return
+
+    hotel_ids = {room_hotels[booking.room_id] for booking in bookings}
+    aliases = {}
+    for city, alias in Hotel.objects.filter(id__in=hotel_ids).values_list('city', 'city_ref__aliases__alias'):
+        aliases.setdefault(city, [])
+        if alias:
+            aliases[city].append(alias)
+    for city, city_aliases in aliases.items():
+        _invalidate_after_write(lambda city=city, city_aliases=city_aliases: invalidate_city(city, city_aliases))
+
+
+@receiver(post_save, sender=Hotel)
+def update_ngram_index(sender, instance, **kwargs):
+    """
+    Re-index a saved hotel in the in-process n-gram index once it commits,
+    and bump the shared counter so other processes' indexes re-warm.
+    """
+    def apply():
+        if ngram_index.warmed:
+            ngram_index.update(instance)
+        ngram_index.caught_up(hotels_changed())
+
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=Hotel)
+def remove_from_ngram_index(sender, instance, **kwargs):
+    hotel_id = instance.id
+
+    def apply():
+        if ngram_index.warmed:
+            ngram_index.remove(hotel_id)
+        ngram_index.caught_up(hotels_changed())
+
+    transaction.on_commit(apply)
@@ -3,9 +3,53 @@ Functions to support the test cases for the hotel booking platform.
 These functions provide the interface expected by the test cases.
 """
 
+import re
+from contextlib import contextmanager
 from datetime import date
-from django.db import transaction
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from .models import Hotel, Room, Booking
+from .services import create_booking
+from .text_search import filter_hotels
+from .throttling import window_counters
+
+
+# Tests use a private in-memory cache instead of the one BOOKING_CACHE_URL
+# configures, whichever runner runs them
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'booking-tests',
+    },
+}
+
+
+class CacheResetMixin:
+    """
+    Start every test with an empty cache. The throttles' process-local
+    counters are derived from the cached ones and are reset with them.
+    """
+    @classmethod
+    def _pre_setup(cls):
+        super()._pre_setup()
+        cache.clear()
+        window_counters.clear()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BookingTestCase(CacheResetMixin, TestCase):
+    """
+    TestCase running against a fresh TEST_CACHES.
+    """
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BookingTransactionTestCase(CacheResetMixin, TransactionTestCase):
+    """
+    TransactionTestCase running against a fresh TEST_CACHES.
+    """
 
 
 def book_room(room, check_in_date, check_out_date, guest_name="Test Guest", guest_email="test@example.com"):
@@ -32,33 +76,15 @@ def book_room(room, check_in_date, check_out_date, guest_name="Test Guest", gues
     if check_out_date <= check_in_date:
         return None
     
+    # The booking engine inserts optimistically and the database rejects overlaps
     try:
-        with transaction.atomic():
-            # Use select_for_update to prevent race conditions
-            room = Room.objects.select_for_update().get(id=room.id)
-            
-            # Check for overlapping bookings
-            overlapping_bookings = Booking.objects.filter(
-                room=room,
-                is_cancelled=False,
-                check_in_date__lt=check_out_date,
-                check_out_date__gt=check_in_date
-            )
-            
-            if overlapping_bookings.exists():
-                return None
-            
-            # Create the booking
-            booking = Booking.objects.create(
-                room=room,
-                guest_name=guest_name,
-                guest_email=guest_email,
-                check_in_date=check_in_date,
-                check_out_date=check_out_date
-            )
-            
-            return booking
-            
+        return create_booking(
+            room,
+            check_in_date,
+            check_out_date,
+            guest_name=guest_name,
+            guest_email=guest_email
+        )
     except Exception:
         # Return None if any error occurs
         return None
@@ -107,12 +133,82 @@ def search_hotels_orm(city=None, name=None):
     Returns:
         QuerySet of Hotel objects matching the criteria
     """
-    queryset = Hotel.objects.all()
+    return filter_hotels(Hotel.objects.all(), city=city, name=name)
+
+
+@contextmanager
+def query_budget(max_queries, using='default'):
+    """
+    Fail if the block issues more than `max_queries` SQL statements.
+    Use it around endpoint calls so N+1 regressions fail the test suite.
     
-    if city:
-        queryset = queryset.filter(city__icontains=city)
+    Args:
+        max_queries: Maximum number of statements the block may run
+        using: Database alias to watch
     
-    if name:
-        queryset = queryset.filter(name__icontains=name)
+    Yields:
+        CaptureQueriesContext with the captured statements
+    """
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    
+    executed = len(context.captured_queries)
+    if executed > max_queries:
+        statements = '\n'.join(
+            f"{number}. {query['sql']}" for number, query in enumerate(context.captured_queries, start=1)
+        )
+        raise AssertionError(
+            f"Query budget exceeded: {executed} queries executed, budget is {max_queries}\n{statements}"
+        )
+
+
+# A plan step reading a whole table. Index scans (SCAN ... USING INDEX), virtual
+# tables (FTS) and SQLite's own catalogue (sqlite_master) do not match.
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(?!sqlite_)(\w+)(?: AS \w+)?$')
+
+
+def full_table_scans(sql, using='default'):
+    """
+    Tables a statement reads with a full table scan, according to SQLite's
+    EXPLAIN QUERY PLAN.
+    
+    Args:
+        sql: SELECT statement with its parameters inlined
+        using: Database alias to plan the statement on
+    
+    Returns:
+        List of scanned table names (or aliases), empty if every table is
+        read through an index
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        details = [row[-1] for row in cursor.fetchall()]
+    return [match.group(1) for match in map(FULL_SCAN.match, details) if match]
+
+
+@contextmanager
+def no_full_scans(using='default'):
+    """
+    Fail if any SELECT the block issues is planned as a full table scan.
+    Use it around hot queries so a dropped index or an unindexable filter
+    fails the test suite. SQLite only.
+    
+    Args:
+        using: Database alias to watch
+    
+    Yields:
+        CaptureQueriesContext with the captured statements
+    """
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
     
-    return queryset
+    offenders = []
+    for query in context.captured_queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        scanned = full_table_scans(sql, using)
+        if scanned:
+            offenders.append(f"{', '.join(scanned)}: {sql}")
+    if offenders:
+        raise AssertionError("Full table scans:\n" + '\n'.join(offenders))
@@ -1,18 +1,53 @@
-from django.test import TestCase, TransactionTestCase
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
 from datetime import date, timedelta
+from decimal import Decimal
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
 import threading
+from io import StringIO
 import json
+import os
+import tempfile
 import uuid
+from unittest import mock, skipUnless
 
-from .models import Hotel, Room, Booking
-from .search import search_hotels_optimized
+from .models import Hotel, Room, Booking, RoomNight, City, CityAlias
+from .search import HotelSearch, search_hotels_optimized, search_hotels_ranked
+from .serializers import BookingSerializer, RoomSerializer
+from .availability import hotel_room_availability, room_is_free
+from .datagen import CHUNK_SIZE, CITIES, DENSITY_PROFILES, generate_rows
+from .benchmarks import CountingCache, compare, summarize
+from .cache import (CITY_REGISTRY_KEY, _scope_generation_keys, cache_search_results, cache_stats,
+                    get_cache_key, get_cache_stats, invalidate_city, invalidate_hotel_cache, local_cache,
+                    normalize_city)
+from .exports import BOOKING_COLUMNS, stream_export
+from .importer import MAX_ERRORS, import_records
+from .instrumentation import QueryInstrumentationMiddleware, instrument
+from .metrics import registry as metrics_registry
+from .pagination import approximate_row_count
+from .services import (BookingConflict, create_booking, create_bookings, register_metrics_hook,
+                       unregister_metrics_hook)
+from .test_functions import (BookingTestCase, BookingTransactionTestCase, book_room, full_table_scans,
+                             no_full_scans, query_budget)
+from .throttling import BookingAnonRateThrottle, WindowCounters
+from .text_search import (IContainsBackend, NgramBackend, NgramIndex, SQLiteFTSBackend,
+                          filter_hotels, get_backend, hotels_changed, ngram_index)
+from .utils import generate_mock_data, generate_test_bookings
 
-class HotelModelTests(TestCase):
+class HotelModelTests(BookingTestCase):
     def test_hotel_creation(self):
         hotel = Hotel.objects.create(
             name="Test Hotel",
@@ -23,7 +58,7 @@ class HotelModelTests(TestCase):
         self.assertEqual(hotel.name, "Test Hotel")
         self.assertEqual(hotel.city, "Test City")
 
-class RoomModelTests(TestCase):
+class RoomModelTests(BookingTestCase):
     def setUp(self):
         self.hotel = Hotel.objects.create(
             name="Test Hotel",
@@ -43,7 +78,7 @@ class RoomModelTests(TestCase):
         self.assertEqual(room.room_type, "SINGLE")
         self.assertEqual(room.hotel, self.hotel)
 
-class BookingTests(TransactionTestCase):
+class BookingTests(BookingTransactionTestCase):
     def setUp(self):
         self.hotel = Hotel.objects.create(
             name="Test Hotel",
@@ -115,7 +150,7 @@ class BookingTests(TransactionTestCase):
         
         self.assertEqual(booking2.guest_name, "Second Guest")
 
-class SimultaneousBookingTests(TransactionTestCase):
+class SimultaneousBookingTests(BookingTransactionTestCase):
     def setUp(self):
         self.hotel = Hotel.objects.create(
             name="Test Hotel",
@@ -166,7 +201,7 @@ class SimultaneousBookingTests(TransactionTestCase):
                 (response1.status_code == status.HTTP_400_BAD_REQUEST and response2.status_code == status.HTTP_201_CREATED)
             )
 
-class SearchTests(TestCase):
+class SearchTests(BookingTestCase):
     def setUp(self):
         # Create test hotels
         self.hotel1 = Hotel.objects.create(
@@ -211,3 +246,1628 @@ class SearchTests(TestCase):
         
         results = search_hotels_optimized(city="Miami")
         self.assertEqual(len(results), 2)
+
+
+class RankedSearchTests(BookingTestCase):
+    def setUp(self):
+        self.check_in = date(2030, 5, 10)
+        self.check_out = date(2030, 5, 12)
+        self.budget = Hotel.objects.create(name="Budget Stay", city="Goa", address="1 Beach Road")
+        self.grand = Hotel.objects.create(name="Grand Palace", city="Goa", address="2 Beach Road")
+        self.inland = Hotel.objects.create(name="Inland Lodge", city="Pune", address="3 Hill Road")
+        rooms = [
+            (self.budget, "101", "SINGLE", 40, 1),
+            (self.budget, "102", "DOUBLE", 70, 2),
+            (self.grand, "201", "DOUBLE", 150, 2),
+            (self.grand, "202", "DOUBLE", 180, 3),
+            (self.grand, "203", "SUITE", 400, 4),
+            (self.inland, "301", "SINGLE", 60, 1),
+        ]
+        self.rooms = {
+            number: Room.objects.create(hotel=hotel, room_number=number, room_type=room_type, price=price,
+                                        capacity=capacity)
+            for hotel, number, room_type, price, capacity in rooms
+        }
+        # The cheapest room is taken for the stay, the unavailable one never counts
+        Booking.objects.create(room=self.rooms["101"], guest_name="Guest", guest_email="guest@example.com",
+                               check_in_date=date(2030, 5, 11), check_out_date=date(2030, 5, 13))
+        self.rooms["301"].is_available = False
+        self.rooms["301"].save()
+    
+    def search(self, **kwargs):
+        return search_hotels_ranked(self.check_in, self.check_out, **kwargs)
+    
+    def test_aggregates_free_rooms_in_one_query(self):
+        with self.assertNumQueries(1):
+            results = self.search()
+        
+        self.assertEqual([(row.name, row.min_price, row.free_rooms, row.max_capacity) for row in results], [
+            ("Budget Stay", Decimal("70.00"), 1, 2),
+            ("Grand Palace", Decimal("150.00"), 3, 4),
+        ])
+    
+    def test_sort_orders(self):
+        self.assertEqual([row.name for row in self.search(sort='-price')], ["Grand Palace", "Budget Stay"])
+        self.assertEqual([row.name for row in self.search(sort='availability')], ["Grand Palace", "Budget Stay"])
+        self.assertEqual([row.name for row in self.search(sort='price', limit=1, offset=1)], ["Grand Palace"])
+        with self.assertRaises(ValueError):
+            self.search(sort='stars')
+    
+    def test_filters_apply_to_the_counted_rooms(self):
+        results = self.search(room_type="DOUBLE", min_capacity=2, min_price=100, max_price=160)
+        self.assertEqual([(row.name, row.min_price, row.free_rooms, row.max_capacity) for row in results], [
+            ("Grand Palace", Decimal("150.00"), 1, 2),
+        ])
+        self.assertEqual([row.name for row in self.search(min_capacity=3, city="Goa")], ["Grand Palace"])
+        self.assertEqual(self.search(city="Pune"), [])
+    
+    def test_booking_invalidates_ranked_results(self):
+        self.assertEqual(self.search(name="Budget")[0].free_rooms, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(room=self.rooms["102"], guest_name="Guest", guest_email="guest@example.com",
+                                   check_in_date=self.check_in, check_out_date=self.check_out)
+        self.assertEqual(self.search(name="Budget"), [])
+    
+    def test_search_endpoint(self):
+        response = self.client.get('/api/hotels/search/', {
+            'check_in': '2030-05-10', 'check_out': '2030-05-12', 'city': 'Goa', 'sort': 'availability',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['sort'], 'availability')
+        self.assertEqual(response.data['results'][0], {
+            'id': str(self.grand.id), 'name': "Grand Palace", 'city': "Goa",
+            'min_price': "150.00", 'free_rooms': 3, 'max_capacity': 4,
+        })
+        
+        for params in ({'sort': 'stars'}, {'min_price': 'cheap'}, {'min_price': '200', 'max_price': '100'},
+                       {'min_capacity': '0'}, {'max_price': 'NaN'}):
+            response = self.client.get('/api/hotels/search/', {'check_in': '2030-05-10', **params})
+            self.assertEqual(response.status_code, 400, params)
+
+class AvailabilitySearchQueryCountTests(BookingTestCase):
+    """
+    Benchmark for the unfilled_only search: the number of SQL statements
+    must not grow with the number of hotels.
+    """
+    def setUp(self):
+        # Resolve the text search backend up front; its one-off probe is not per search
+        get_backend()
+        self.check_in = date(2030, 1, 10)
+        self.check_out = date(2030, 1, 12)
+    
+    def create_hotels(self, count, booked=False):
+        for i in range(count):
+            hotel = Hotel.objects.create(
+                name=f"Bench Hotel {i}",
+                city="Benchville",
+                address=f"{i} Bench Street"
+            )
+            room = Room.objects.create(
+                hotel=hotel,
+                room_number="101",
+                room_type="SINGLE",
+                price=100.00
+            )
+            if booked:
+                Booking.objects.create(
+                    room=room,
+                    guest_name="Bench Guest",
+                    guest_email="bench@example.com",
+                    check_in_date=self.check_in,
+                    check_out_date=self.check_out
+                )
+    
+    def count_search_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            results = list(search_hotels_optimized(
+                city="Benchville",
+                unfilled_only=True,
+                check_in_date=self.check_in,
+                check_out_date=self.check_out
+            ))
+        return len(ctx.captured_queries), results
+    
+    def test_query_count_is_constant(self):
+        self.create_hotels(5)
+        small_count, small_results = self.count_search_queries()
+        
+        self.create_hotels(50)
+        large_count, large_results = self.count_search_queries()
+        
+        # One indexed city lookup plus the search itself
+        self.assertEqual(small_count, 2)
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(small_results), 5)
+        self.assertEqual(len(large_results), 55)
+    
+    def test_fully_booked_hotels_are_excluded(self):
+        self.create_hotels(3, booked=True)
+        self.create_hotels(2)
+        
+        count, results = self.count_search_queries()
+        
+        self.assertEqual(count, 2)
+        self.assertEqual(len(results), 2)
+
+
+class RoomNightInventoryTests(BookingTestCase):
+    def setUp(self):
+        self.hotel = Hotel.objects.create(
+            name="Inventory Hotel",
+            city="Test City",
+            address="123 Test Street"
+        )
+        self.room = Room.objects.create(
+            hotel=self.hotel,
+            room_number="101",
+            room_type="SINGLE",
+            price=100.00
+        )
+        self.check_in = date(2030, 3, 1)
+        self.check_out = date(2030, 3, 4)
+    
+    def create_booking(self, **kwargs):
+        data = {
+            'room': self.room,
+            'guest_name': "Inventory Guest",
+            'guest_email': "inventory@example.com",
+            'check_in_date': self.check_in,
+            'check_out_date': self.check_out,
+        }
+        data.update(kwargs)
+        return Booking.objects.create(**data)
+    
+    def test_booking_materializes_nights(self):
+        booking = self.create_booking()
+        nights = list(booking.nights.order_by('night').values_list('night', flat=True))
+        self.assertEqual(nights, [date(2030, 3, 1), date(2030, 3, 2), date(2030, 3, 3)])
+        self.assertFalse(room_is_free(self.room.id, date(2030, 3, 3), date(2030, 3, 5)))
+        self.assertTrue(room_is_free(self.room.id, self.check_out, date(2030, 3, 6)))
+    
+    def test_cancel_endpoint_releases_nights(self):
+        booking = self.create_booking()
+        response = APIClient().post(reverse('booking-cancel', args=[booking.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(RoomNight.objects.filter(booking=booking).exists())
+        self.assertTrue(room_is_free(self.room.id, self.check_in, self.check_out))
+    
+    def test_rebuild_inventory_command(self):
+        booking = self.create_booking()
+        self.create_booking(
+            check_in_date=date(2030, 4, 1),
+            check_out_date=date(2030, 4, 3),
+            is_cancelled=True
+        )
+        RoomNight.objects.all().delete()
+        
+        call_command('rebuild_inventory', batch_size=1, stdout=StringIO())
+        
+        self.assertEqual(RoomNight.objects.count(), 3)
+        self.assertEqual(set(RoomNight.objects.values_list('booking_id', flat=True)), {booking.id})
+
+
+class SearchCacheTests(BookingTestCase):
+    def setUp(self):
+        cache_stats.reset()
+        self.hotel = Hotel.objects.create(
+            name="Harbour Hotel",
+            city="Navi Mumbai",
+            address="1 Harbour Road"
+        )
+        self.room = Room.objects.create(
+            hotel=self.hotel,
+            room_number="101",
+            room_type="SINGLE",
+            price=100.00
+        )
+        self.search_kwargs = {
+            'city': "Mumbai",
+            'unfilled_only': True,
+            'check_in_date': date(2030, 7, 1),
+            'check_out_date': date(2030, 7, 3),
+        }
+    
+    def test_results_are_materialized_rows(self):
+        results = search_hotels_optimized(**self.search_kwargs)
+        self.assertIsInstance(results, list)
+        self.assertEqual(results, [(self.hotel.id, "Harbour Hotel", "Navi Mumbai")])
+        
+        with self.assertNumQueries(0):
+            cached = search_hotels_optimized(**self.search_kwargs)
+        self.assertEqual(cached, results)
+        stats = get_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 1, 0))
+    
+    def test_booking_in_matching_city_invalidates(self):
+        self.assertEqual(len(search_hotels_optimized(**self.search_kwargs)), 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(
+                room=self.room,
+                guest_name="Cache Guest",
+                guest_email="cache@example.com",
+                check_in_date=date(2030, 7, 1),
+                check_out_date=date(2030, 7, 2)
+            )
+        
+        self.assertEqual(search_hotels_optimized(**self.search_kwargs), [])
+        self.assertEqual(get_cache_stats()['evictions'], 1)
+    
+    def test_other_city_writes_keep_entries(self):
+        search_hotels_optimized(**self.search_kwargs)
+        cache_stats.reset()
+        invalidate_city("Denver")
+        
+        search_hotels_optimized(**self.search_kwargs)
+        self.assertEqual(get_cache_stats()['hits'], 1)
+    
+    def test_invalidate_hotel_cache(self):
+        search_hotels_optimized(**self.search_kwargs)
+        invalidate_hotel_cache(self.hotel.id)
+        search_hotels_optimized(**self.search_kwargs)
+        invalidate_hotel_cache()
+        search_hotels_optimized(**self.search_kwargs)
+        stats = get_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (0, 3, 2))
+    
+    def test_concurrent_city_registrations_are_kept(self):
+        cities = [f"City {number}" for number in range(16)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda city: _scope_generation_keys(city), cities))
+        self.assertEqual(cache.get(CITY_REGISTRY_KEY)[1], {normalize_city(city) for city in cities})
+    
+    def test_unregistered_city_is_still_invalidated(self):
+        search_kwargs = dict(self.search_kwargs, city="Navi Mumbai")
+        search_hotels_optimized(**search_kwargs)
+        # A concurrent registration overwrote this one
+        epoch, cities = cache.get(CITY_REGISTRY_KEY)
+        cache.set(CITY_REGISTRY_KEY, (epoch, cities - {"navi mumbai"}), None)
+        
+        invalidate_city("Navi Mumbai")
+        search_hotels_optimized(**search_kwargs)
+        self.assertEqual(get_cache_stats()['evictions'], 1)
+
+class SearchCacheTierTests(BookingTestCase):
+    def setUp(self):
+        local_cache.clear()
+        cache_stats.reset()
+        self.calls = 0
+        
+        @cache_search_results
+        def tiered_search(city=None):
+            self.calls += 1
+            return [(self.calls, city)]
+        
+        self.tiered_search = tiered_search
+    
+    def test_repeat_lookup_is_served_from_l1(self):
+        self.tiered_search(city="Goa")
+        key = get_cache_key('tiered_search', city="Goa")
+        with mock.patch.object(cache, 'get', wraps=cache.get) as get:
+            self.assertEqual(self.tiered_search(city="Goa"), [(1, "Goa")])
+        # Only the invalidation state is read from the shared cache, never the rows
+        self.assertNotIn(mock.call(key), get.call_args_list)
+        stats = get_cache_stats()
+        self.assertEqual((stats['l1_hits'], stats['l2_hits'], stats['misses']), (1, 0, 1))
+        self.assertEqual(stats['l1_hit_rate'], 0.5)
+    
+    def test_other_workers_entries_come_from_l2(self):
+        self.tiered_search(city="Goa")
+        # A worker that has not seen this search yet
+        local_cache.clear()
+        self.tiered_search(city="Goa")
+        self.tiered_search(city="Goa")
+        
+        self.assertEqual(self.calls, 1)
+        stats = get_cache_stats()
+        self.assertEqual((stats['l1_hits'], stats['l2_hits'], stats['misses']), (1, 1, 1))
+        self.assertEqual(stats['l2_hit_rate'], 0.5)
+    
+    def test_invalidation_from_another_worker_retires_l1_entries(self):
+        self.tiered_search(city="Goa")
+        self.tiered_search()
+        # Another worker's write only touches the shared generations
+        invalidate_city("Goa")
+        
+        self.assertEqual(self.tiered_search(city="Goa"), [(3, "Goa")])
+        self.assertEqual(self.tiered_search(), [(4, None)])
+        self.assertEqual(get_cache_stats()['l1_hits'], 0)
+    
+    def test_l1_is_bounded(self):
+        with override_settings(HOTEL_SEARCH_CACHE_L1_SIZE=2):
+            for city in ("Goa", "Pune", "Delhi"):
+                self.tiered_search(city=city)
+            self.assertEqual(len(local_cache), 2)
+            self.tiered_search(city="Goa")
+        
+        stats = get_cache_stats()
+        self.assertEqual((stats['l1_hits'], stats['l2_hits']), (0, 1))
+        
+        with override_settings(HOTEL_SEARCH_CACHE_L1_SIZE=0):
+            local_cache.clear()
+            self.tiered_search(city="Pune")
+            self.assertEqual(len(local_cache), 0)
+
+
+
+@override_settings(HOTEL_SEARCH_CACHE_BACKGROUND_REFRESH=False, HOTEL_SEARCH_CACHE_LOCK_WAIT=0.2)
+class SearchCacheStampedeTests(BookingTestCase):
+    def setUp(self):
+        cache_stats.reset()
+        self.calls = 0
+        
+        @cache_search_results
+        def slow_search(city=None):
+            self.calls += 1
+            return [(self.calls, city)]
+        
+        self.slow_search = slow_search
+    
+    def test_soft_expired_entry_is_served_stale_and_refreshed(self):
+        with override_settings(HOTEL_SEARCH_CACHE_SOFT_TIMEOUT=-1):
+            first = self.slow_search(city="Goa")
+        
+        stale = self.slow_search(city="Goa")
+        fresh = self.slow_search(city="Goa")
+        
+        self.assertEqual(first, [(1, "Goa")])
+        self.assertEqual(stale, first)
+        self.assertEqual(fresh, [(2, "Goa")])
+        stats = get_cache_stats()
+        self.assertEqual((stats['stale_hits'], stats['refreshes']), (1, 1))
+    
+    def test_concurrent_miss_waits_for_lock_holder(self):
+        self.slow_search(city="Goa")
+        key = get_cache_key('slow_search', city="Goa")
+        entry = cache.get(key)
+        cache.delete(key)
+        local_cache.delete(key)
+        cache.add(f"{key}:lock", "other-worker", 30)
+        
+        # Simulate the lock holder finishing while this request waits
+        timer = threading.Timer(0.05, cache.set, args=(key, entry, 60))
+        timer.start()
+        results = self.slow_search(city="Goa")
+        timer.join()
+        
+        self.assertEqual(results, [(1, "Goa")])
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(get_cache_stats()['coalesced'], 1)
+    
+    def test_abandoned_lock_falls_back_to_computing(self):
+        key = get_cache_key('slow_search', city="Goa")
+        cache.add(f"{key}:lock", "dead-worker", 30)
+        
+        self.assertEqual(self.slow_search(city="Goa"), [(1, "Goa")])
+
+
+
+class TextSearchBackendTests(BookingTestCase):
+    def setUp(self):
+        for name, city in [
+            ("Grand Mumbai Hotel", "Mumbai"),
+            ("Harbour Inn", "Navi Mumbai"),
+            ("Royal \"Quoted\" Suites", "New York"),
+            ("Mountain Lodge", "Denver"),
+        ]:
+            Hotel.objects.create(name=name, city=city, address="1 Test Road")
+    
+    def assertSameAsIContains(self, backend, **filters):
+        expected = set(filter_hotels(Hotel.objects.all(), backend=IContainsBackend(), **filters))
+        actual = set(filter_hotels(Hotel.objects.all(), backend=backend, **filters))
+        self.assertEqual(actual, expected, filters)
+        return actual
+    
+    def check_backend(self, backend):
+        self.assertEqual(len(self.assertSameAsIContains(backend, city="umba")), 2)
+        self.assertEqual(len(self.assertSameAsIContains(backend, city="umba", name="harb")), 1)
+        self.assertEqual(len(self.assertSameAsIContains(backend, name='"quoted"')), 1)
+        self.assertEqual(len(self.assertSameAsIContains(backend, city="ve")), 1)
+        self.assertEqual(len(self.assertSameAsIContains(backend, city="Chicago")), 0)
+    
+    def test_sqlite_fts_backend(self):
+        self.assertIsInstance(get_backend(), SQLiteFTSBackend)
+        self.check_backend(SQLiteFTSBackend())
+    
+    def test_fts_table_follows_updates(self):
+        hotel = Hotel.objects.get(name="Mountain Lodge")
+        hotel.city = "Boulder"
+        hotel.save()
+        backend = SQLiteFTSBackend()
+        self.assertEqual(list(filter_hotels(Hotel.objects.all(), city="boulder", backend=backend)), [hotel])
+        hotel.delete()
+        self.assertEqual(list(filter_hotels(Hotel.objects.all(), city="boulder", backend=backend)), [])
+    
+    def test_ngram_backend(self):
+        index = NgramIndex()
+        self.check_backend(NgramBackend(index))
+        
+        hotel = Hotel.objects.create(name="Lakeside Retreat", city="Boulder", address="2 Lake Road")
+        index.update(hotel)
+        self.assertEqual(list(filter_hotels(Hotel.objects.all(), name="keside", backend=NgramBackend(index))), [hotel])
+    
+    def test_ngram_index_rewarms_after_writes_elsewhere(self):
+        cache.clear()
+        index = NgramIndex()
+        backend = NgramBackend(index)
+        self.check_backend(backend)
+        
+        # Another worker (or a bulk import) adds a hotel; no signal reaches this index
+        hotel, = Hotel.objects.bulk_create([Hotel(name="Lakeside Retreat", city="Boulder", address="2 Lake Road")])
+        hotels_changed()
+        self.assertFalse(index.is_current())
+        self.assertEqual(list(filter_hotels(Hotel.objects.all(), name="keside", backend=backend)), [hotel])
+        self.assertTrue(index.is_current())
+    
+    def test_ngram_index_is_rebuilt_once_and_swapped_in_whole(self):
+        hotel = Hotel.objects.create(name="Lakeside Retreat", city="Boulder", address="2 Lake Road")
+        index = NgramIndex()
+        index.warm()
+        # Callers that waited for another thread's rebuild find the index current
+        with self.assertNumQueries(0):
+            index.warm()
+        
+        hotels_changed()
+        seen = []
+        iterator = QuerySet.iterator
+        
+        def read_during_rebuild(queryset, *args, **kwargs):
+            seen.append(index.candidates('name', "keside"))
+            return iterator(queryset, *args, **kwargs)
+        
+        with mock.patch.object(QuerySet, 'iterator', read_during_rebuild):
+            index.warm()
+        # Readers keep the previous build until the new one is complete
+        self.assertEqual(seen, [[hotel.id]])
+        self.assertEqual(index.candidates('name', "keside"), [hotel.id])
+    
+    def test_own_writes_keep_ngram_index_current(self):
+        cache.clear()
+        hotels_changed()
+        ngram_index.warm()
+        self.addCleanup(ngram_index.reset)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            hotel = Hotel.objects.create(name="Lakeside Retreat", city="Boulder", address="2 Lake Road")
+        self.assertTrue(ngram_index.is_current())
+        self.assertEqual(ngram_index.candidates('name', "keside"), [hotel.id])
+
+
+
+class CityNormalizationTests(BookingTestCase):
+    def setUp(self):
+        self.mumbai = Hotel.objects.create(name="Sea Face Hotel", city="Mumbai", address="1 Marine Drive")
+        self.navi = Hotel.objects.create(name="Harbour Inn", city="Navi  Mumbai ", address="2 Palm Beach Road")
+        CityAlias.objects.create(city=self.mumbai.city_ref, alias="Bombay")
+    
+    def test_hotels_reference_normalized_cities(self):
+        self.assertEqual(self.mumbai.city_ref.key, "mumbai")
+        self.assertEqual(self.navi.city_ref.key, "navi mumbai")
+        other = Hotel.objects.create(name="Gateway Hotel", city="  MUMBAI", address="3 Colaba")
+        self.assertEqual(other.city_ref_id, self.mumbai.city_ref_id)
+    
+    def test_exact_city_uses_foreign_key_lookup(self):
+        with CaptureQueriesContext(connection) as ctx:
+            results = list(filter_hotels(Hotel.objects.all(), city="mumbai"))
+        self.assertEqual(results, [self.mumbai])
+        self.assertIn('"city_ref_id" =', ctx.captured_queries[-1]['sql'])
+        self.assertEqual(list(filter_hotels(Hotel.objects.all(), city="Bombay")), [self.mumbai])
+    
+    def test_partial_city_falls_back_to_text_search(self):
+        results = set(filter_hotels(Hotel.objects.all(), city="umba"))
+        self.assertEqual(results, {self.mumbai, self.navi})
+
+    def test_alias_searches_are_invalidated(self):
+        room = Room.objects.create(hotel=self.mumbai, room_number="101", room_type="SINGLE", price=100.00)
+        cache.clear()
+        search = {
+            'city': "Bombay",
+            'unfilled_only': True,
+            'check_in_date': date(2030, 8, 1),
+            'check_out_date': date(2030, 8, 2),
+        }
+        self.assertEqual(len(search_hotels_optimized(**search)), 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(
+                room=room,
+                guest_name="Alias Guest",
+                guest_email="alias@example.com",
+                check_in_date=date(2030, 8, 1),
+                check_out_date=date(2030, 8, 2)
+            )
+        
+        self.assertEqual(search_hotels_optimized(**search), [])
+
+
+class KeysetPaginationTests(BookingTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for i in range(25):
+            hotel = Hotel.objects.create(name=f"Page Hotel {i}", city="Pageville", address=f"{i} Page Road")
+            Room.objects.create(hotel=hotel, room_number="101", room_type="SINGLE", price=100.00)
+    
+    def collect_pages(self, url):
+        ids = []
+        pages = 0
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            for query in ctx.captured_queries:
+                self.assertNotIn('COUNT(', query['sql'].upper())
+            ids.extend(hotel['id'] for hotel in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return ids, pages
+    
+    def test_hotels_are_paged_by_cursor(self):
+        ids, pages = self.collect_pages(reverse('hotel-list'))
+        self.assertEqual(pages, 2)
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), 25)
+    
+    def test_unfilled_search_is_paged_by_cursor(self):
+        url = reverse('hotel-list') + '?unfilled_only=true&check_in_date=2030-09-01&check_out_date=2030-09-03'
+        ids, pages = self.collect_pages(url)
+        self.assertEqual(pages, 2)
+        self.assertEqual(len(set(ids)), 25)
+    
+    def test_previous_link_returns_preceding_page(self):
+        url = reverse('hotel-list') + '?unfilled_only=true&check_in_date=2030-09-01&check_out_date=2030-09-03'
+        first = self.client.get(url).data
+        second = self.client.get(first['next']).data
+        previous = self.client.get(second['previous']).data
+        self.assertEqual(previous['results'], first['results'])
+    
+    def test_rooms_and_bookings_use_cursor_pagination(self):
+        for name in ('room-list', 'booking-list'):
+            response = self.client.get(reverse(name))
+            self.assertIn('next', response.data)
+            self.assertNotIn('count', response.data)
+    
+    def test_approximate_count_from_table_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        response = self.client.get(reverse('hotel-list') + '?approx_count=true')
+        self.assertEqual(response.data['approximate_count'], 25)
+        self.assertEqual(approximate_row_count(Hotel), 25)
+
+
+class QueryBudgetTests(BookingTestCase):
+    """
+    Fixed per-endpoint query budgets; the cost must not depend on page size.
+    """
+    def setUp(self):
+        self.client = APIClient()
+        for i in range(10):
+            hotel = Hotel.objects.create(name=f"Budget Hotel {i}", city="Budgetville", address=f"{i} Budget Road")
+            for number in ("101", "102"):
+                room = Room.objects.create(hotel=hotel, room_number=number, room_type="DOUBLE", price=120.00)
+                Booking.objects.create(
+                    room=room,
+                    guest_name="Budget Guest",
+                    guest_email="budget@example.com",
+                    check_in_date=date(2030, 10, 1),
+                    check_out_date=date(2030, 10, 3)
+                )
+        self.hotel = hotel
+    
+    def assertWithinBudget(self, url, max_queries):
+        with query_budget(max_queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+    
+    def test_booking_list(self):
+        response = self.assertWithinBudget(reverse('booking-list'), 1)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertTrue(response.data['results'][0]['room_details']['hotel_name'].startswith("Budget Hotel"))
+    
+    def test_booking_detail(self):
+        booking = Booking.objects.first()
+        self.assertWithinBudget(reverse('booking-detail', args=[booking.id]), 1)
+    
+    def test_room_list(self):
+        response = self.assertWithinBudget(reverse('room-list'), 1)
+        self.assertEqual(len(response.data['results']), 20)
+    
+    def test_hotel_rooms_action(self):
+        response = self.assertWithinBudget(reverse('hotel-rooms', args=[self.hotel.id]), 2)
+        self.assertEqual(len(response.data), 2)
+    
+    def test_hotel_list(self):
+        self.assertWithinBudget(reverse('hotel-list'), 1)
+    
+    def test_budget_violation_fails(self):
+        with self.assertRaises(AssertionError):
+            with query_budget(1):
+                list(Hotel.objects.all())
+                list(Room.objects.all())
+
+
+@skipUnless(connection.vendor == 'sqlite', "Plans are read from SQLite's EXPLAIN QUERY PLAN")
+class QueryPlanTests(BookingTestCase):
+    """
+    The hot queries of search, the API views and the serializers must be
+    answered through indexes; a full table scan fails the test.
+    """
+    def setUp(self):
+        self.client = APIClient()
+        CityAlias.objects.create(city=City.objects.for_name("Mumbai"), alias="Bombay")
+        self.hotel = Hotel.objects.create(name="Grand Plan Hotel", city="Mumbai", address="1 Index Road")
+        self.room = Room.objects.create(hotel=self.hotel, room_number="101", room_type="DOUBLE", price=120)
+        self.cancelled = book_room(self.room, "2030-01-01", "2030-01-03")
+        self.cancelled.is_cancelled = True
+        self.cancelled.save()
+        book_room(self.room, "2030-01-05", "2030-01-07")
+        self.check_in, self.check_out = date(2030, 1, 1), date(2030, 1, 3)
+    
+    def test_search_queries(self):
+        stay = dict(check_in_date=self.check_in, check_out_date=self.check_out)
+        with no_full_scans() as context:
+            self.assertEqual(len(search_hotels_optimized(city="Bombay")), 1)
+            search_hotels_optimized(name="Grand")
+            search_hotels_optimized(city="Mumbai", unfilled_only=True, **stay)
+            search_hotels_optimized(unfilled_only=True, **stay)
+            search_hotels_ranked(self.check_in, self.check_out, city="Mumbai", sort='availability')
+            search_hotels_ranked(self.check_in, self.check_out, room_type="DOUBLE", max_price=300)
+            list(HotelSearch.search_available_rooms(hotel_id=self.hotel.id, room_type="DOUBLE", **stay))
+            HotelSearch.search_hotels({'city': "Mumbai"})
+        self.assertGreater(len(context.captured_queries), 8)
+    
+    def test_api_read_queries(self):
+        urls = [
+            (reverse('hotel-list'), {'city': "Mumbai"}),
+            (reverse('hotel-list'), {}),
+            (reverse('hotel-rooms', args=[self.hotel.id]), {}),
+            (reverse('hotel-availability', args=[self.hotel.id]),
+             {'check_in': str(self.check_in), 'check_out': str(self.check_out)}),
+            (reverse('hotel-search'), {'check_in': str(self.check_in), 'check_out': str(self.check_out),
+                                       'city': "Mumbai", 'room_type': "DOUBLE"}),
+            (reverse('room-list'), {'hotel_id': str(self.hotel.id), 'room_type': "DOUBLE", 'is_available': 'true'}),
+            (reverse('booking-list'), {'room': str(self.room.id)}),
+            (reverse('booking-list'), {}),
+        ]
+        for url, params in urls:
+            with self.subTest(url=url, params=params), no_full_scans():
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_booking_create_queries(self):
+        with no_full_scans():
+            response = self.client.post(reverse('booking-list'), {
+                'room': str(self.room.id), 'guest_name': "Plan Guest", 'guest_email': "plan@example.com",
+                'check_in_date': '2030-02-01', 'check_out_date': '2030-02-03',
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+    
+    def test_serializer_eager_loading(self):
+        with no_full_scans():
+            list(BookingSerializer.setup_eager_loading(Booking.objects.filter(room=self.room)))
+            list(RoomSerializer.setup_eager_loading(Room.objects.filter(hotel=self.hotel)))
+    
+    def test_active_bookings_use_partial_index(self):
+        active = Booking.objects.filter(is_cancelled=False).order_by('room_id', 'check_in_date')
+        self.assertIn('booking_active_room_stay_idx', active.explain())
+        self.assertEqual([booking.check_in_date for booking in active], [date(2030, 1, 5)])
+    
+    def test_full_scan_is_reported(self):
+        self.assertEqual(full_table_scans("SELECT id FROM booking_hotel WHERE address = '1 Index Road'"),
+                         ['booking_hotel'])
+        with self.assertRaisesMessage(AssertionError, "Full table scans"):
+            with no_full_scans():
+                list(Hotel.objects.filter(address="1 Index Road"))
+
+
+class HotelAvailabilityTests(BookingTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.hotel = Hotel.objects.create(name="Availability Hotel", city="Availtown", address="1 Avail Street")
+        self.free_room = Room.objects.create(hotel=self.hotel, room_number="101", room_type="SINGLE", price=80.00)
+        self.booked_room = Room.objects.create(hotel=self.hotel, room_number="102", room_type="DOUBLE", price=120.00)
+        self.closed_room = Room.objects.create(
+            hotel=self.hotel, room_number="103", room_type="SUITE", price=300.00, is_available=False
+        )
+        self.check_in = date(2030, 11, 10)
+        # Booked for the nights 9th-11th and 13th-14th, leaving the 12th free
+        Booking.objects.create(room=self.booked_room, guest_name="A", guest_email="a@example.com",
+                               check_in_date=date(2030, 11, 9), check_out_date=date(2030, 11, 12))
+        Booking.objects.create(room=self.booked_room, guest_name="B", guest_email="b@example.com",
+                               check_in_date=date(2030, 11, 13), check_out_date=date(2030, 11, 15))
+    
+    def test_room_statuses(self):
+        with self.assertNumQueries(1):
+            rooms = hotel_room_availability(self.hotel.id, self.check_in, self.check_in + timedelta(days=2))
+        statuses = {room.room_number: (room.is_free, room.next_free_date) for room in rooms}
+        self.assertEqual(statuses, {
+            "101": (True, self.check_in),
+            "102": (False, date(2030, 11, 12)),
+            "103": (False, None),
+        })
+    
+    def test_endpoint(self):
+        url = reverse('hotel-availability', args=[self.hotel.id])
+        with query_budget(2):
+            response = self.client.get(url, {'check_in': '2030-11-12', 'check_out': '2030-11-13'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rooms = {room['room_number']: room for room in response.data['rooms']}
+        self.assertTrue(rooms["102"]['is_free'])
+        self.assertEqual(rooms["102"]['next_free_date'], '2030-11-12')
+        self.assertEqual(rooms["101"]['hotel_name'], "Availability Hotel")
+    
+    def test_endpoint_rejects_bad_dates(self):
+        url = reverse('hotel-availability', args=[self.hotel.id])
+        response = self.client.get(url, {'check_in': '2030-11-12', 'check_out': '2030-11-12'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {'check_in': 'tomorrow'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_bookings_filter_by_room(self):
+        response = self.client.get(reverse('booking-list'), {'room': self.booked_room.id})
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(reverse('booking-list'), {'room': self.free_room.id})
+        self.assertEqual(len(response.data['results']), 0)
+    
+    def test_hotel_rooms_page(self):
+        url = reverse('hotel_rooms', args=[self.hotel.id])
+        response = self.client.get(url, {'check_in': '2030-11-10', 'check_out': '2030-11-11'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rooms = {room.room_number: room.is_free for room in response.context['rooms']}
+        self.assertEqual(rooms, {"101": True, "102": False})
+
+class RoomOpenWindowTests(BookingTestCase):
+    def setUp(self):
+        self.hotel = Hotel.objects.create(name="Seasonal Lodge", city="Manali", address="1 Snow Road")
+        # Open for stays checking in from Aug 1st and checking out by Aug 5th
+        self.seasonal = Room.objects.create(hotel=self.hotel, room_number="101", room_type="SINGLE", price=100,
+                                            available_from=date(2030, 8, 1), available_to=date(2030, 8, 5))
+        self.closed = Room.objects.create(hotel=self.hotel, room_number="102", room_type="SINGLE", price=90,
+                                          is_available=False)
+    
+    def available(self, check_in, check_out):
+        return [room.room_number for room in HotelSearch.search_available_rooms(
+            hotel_id=self.hotel.id, check_in_date=check_in, check_out_date=check_out
+        )]
+    
+    def test_search_honours_the_open_window(self):
+        self.assertEqual(self.available(date(2030, 8, 1), date(2030, 8, 5)), ["101"])
+        self.assertEqual(self.available(date(2030, 7, 31), date(2030, 8, 2)), [])
+        self.assertEqual(self.available(date(2030, 8, 4), date(2030, 8, 6)), [])
+        
+        unfilled = dict(unfilled_only=True, city="Manali")
+        self.assertEqual(len(search_hotels_optimized(check_in_date=date(2030, 8, 2), check_out_date=date(2030, 8, 4),
+                                                     **unfilled)), 1)
+        self.assertEqual(search_hotels_optimized(check_in_date=date(2030, 9, 2), check_out_date=date(2030, 9, 4),
+                                                 **unfilled), [])
+        self.assertEqual(search_hotels_ranked(date(2030, 9, 2), date(2030, 9, 4)), [])
+    
+    def test_bookings_outside_the_window_are_rejected(self):
+        self.assertIsNotNone(book_room(self.seasonal, "2030-08-03", "2030-08-05"))
+        self.assertIsNone(book_room(self.seasonal, "2030-08-05", "2030-08-06"))
+        self.assertIsNone(book_room(self.closed, "2030-08-01", "2030-08-02"))
+        
+        response = self.client.post('/api/bookings/', {
+            'room': str(self.seasonal.id), 'guest_name': 'Early Guest', 'guest_email': 'early@example.com',
+            'check_in_date': '2030-07-30', 'check_out_date': '2030-08-02',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": ["This room is not available for the selected dates"]})
+        
+        results = create_bookings([
+            {'room_id': self.seasonal.id, 'guest_name': 'Bulk', 'guest_email': 'bulk@example.com',
+             'check_in_date': date(2030, 8, 1), 'check_out_date': date(2030, 8, 3)},
+            {'room_id': self.closed.id, 'guest_name': 'Bulk', 'guest_email': 'bulk@example.com',
+             'check_in_date': date(2030, 8, 1), 'check_out_date': date(2030, 8, 3)},
+        ], atomic=False)
+        self.assertEqual([outcome for outcome, _ in results], ['created', 'invalid'])
+    
+    def test_room_statuses_within_the_window(self):
+        rooms = hotel_room_availability(self.hotel.id, date(2030, 7, 28), date(2030, 7, 30))
+        statuses = {room.room_number: (room.is_free, room.next_free_date) for room in rooms}
+        self.assertEqual(statuses, {"101": (False, date(2030, 8, 1)), "102": (False, None)})
+        
+        rooms = hotel_room_availability(self.hotel.id, date(2030, 8, 5), date(2030, 8, 6))
+        self.assertEqual((rooms[0].is_free, rooms[0].next_free_date), (False, None))
+
+
+class BookingEngineTests(BookingTransactionTestCase):
+    def setUp(self):
+        self.hotel = Hotel.objects.create(name="Engine Hotel", city="Enginetown", address="1 Engine Road")
+        self.room = Room.objects.create(hotel=self.hotel, room_number="101", room_type="SINGLE", price=90.00)
+        self.check_in = date(2030, 12, 1)
+        self.check_out = date(2030, 12, 4)
+    
+    def book(self, check_in_date, check_out_date):
+        return create_booking(
+            self.room,
+            check_in_date,
+            check_out_date,
+            guest_name="Engine Guest",
+            guest_email="engine@example.com"
+        )
+    
+    def test_overlap_raises_conflict(self):
+        self.book(self.check_in, self.check_out)
+        with self.assertRaises(BookingConflict):
+            self.book(self.check_in + timedelta(days=2), self.check_out + timedelta(days=2))
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(RoomNight.objects.count(), 3)
+    
+    def test_adjacent_and_cancelled_stays(self):
+        first = self.book(self.check_in, self.check_out)
+        self.book(self.check_out, self.check_out + timedelta(days=1))
+        first.is_cancelled = True
+        first.save()
+        self.assertEqual(self.book(self.check_in, self.check_out).check_in_date, self.check_in)
+    
+    def test_optimistic_insert_skips_overlap_probe(self):
+        with CaptureQueriesContext(connection) as context:
+            self.book(self.check_in, self.check_out)
+        self.assertFalse(any('booking_roomnight' in query['sql'] and query['sql'].startswith('SELECT')
+                             for query in context.captured_queries))
+    
+    def test_concurrent_requests_book_once(self):
+        def attempt(_):
+            try:
+                self.book(self.check_in, self.check_out)
+                return True
+            except BookingConflict:
+                return False
+            finally:
+                connection.close()
+        
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            results = list(executor.map(attempt, range(6)))
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(Booking.objects.count(), 1)
+    
+    def test_api_conflict_response(self):
+        client = APIClient()
+        payload = {
+            'room': str(self.room.id),
+            'guest_name': 'Engine Guest',
+            'guest_email': 'engine@example.com',
+            'check_in_date': '2030-12-01',
+            'check_out_date': '2030-12-04'
+        }
+        self.assertEqual(client.post(reverse('booking-list'), payload, format='json').status_code,
+                         status.HTTP_201_CREATED)
+        response = client.post(reverse('booking-list'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "This room is already booked for the selected dates")
+
+
+class BookingServiceTests(BookingTestCase):
+    def setUp(self):
+        self.hotel = Hotel.objects.create(name="Service Hotel", city="Servicetown", address="1 Service Road")
+        self.room = Room.objects.create(hotel=self.hotel, room_number="101", room_type="SINGLE", price=90.00)
+        self.payload = {
+            'room': str(self.room.id),
+            'guest_name': 'Service Guest',
+            'guest_email': 'service@example.com',
+            'check_in_date': '2031-01-10',
+            'check_out_date': '2031-01-12'
+        }
+        self.events = []
+        register_metrics_hook(self.record)
+        self.addCleanup(unregister_metrics_hook, self.record)
+    
+    def record(self, outcome, timings):
+        self.events.append((outcome, timings))
+    
+    def test_api_create_probes_once_and_inserts_once(self):
+        with CaptureQueriesContext(connection) as context:
+            response = APIClient().post(reverse('booking-list'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        statements = [query['sql'] for query in context.captured_queries]
+        self.assertFalse([sql for sql in statements if sql.startswith('SELECT') and 'booking_roomnight' in sql])
+        self.assertEqual(len([sql for sql in statements if sql.startswith('INSERT INTO "booking_booking"')]), 1)
+        # Signal handlers defer their lookups until after the commit: the write is just the inserts
+        tables = [sql.split('"')[1] for sql in statements if sql.startswith(('INSERT', 'SELECT', 'UPDATE'))]
+        inserted = tables.index('booking_booking')
+        self.assertEqual(tables[inserted:inserted + 2], ['booking_booking', 'booking_roomnight'])
+        
+        outcome, timings = self.events[-1]
+        self.assertEqual(outcome, 'created')
+        self.assertEqual(timings['attempts'], 1)
+        for phase in ('validate', 'write', 'inventory', 'commit', 'total'):
+            self.assertGreaterEqual(timings[phase], 0)
+    
+    def test_conflicts_are_reported(self):
+        client = APIClient()
+        client.post(reverse('booking-list'), self.payload, format='json')
+        response = client.post(reverse('booking-list'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.events[-1][0], 'conflict')
+    
+    def test_zero_night_stays_are_rejected(self):
+        client = APIClient()
+        client.post(reverse('booking-list'), self.payload, format='json')
+        # A same-day stay holds no room-night, so it must not get past validation
+        payload = dict(self.payload, check_in_date='2031-01-11', check_out_date='2031-01-11')
+        response = client.post(reverse('booking-list'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.assertRaises(ValidationError):
+            create_booking(self.room, date(2031, 2, 1), date(2031, 2, 1), guest_name="Same Day",
+                           guest_email="same@example.com")
+        
+        results = create_bookings([{'room_id': self.room.id, 'guest_name': 'Bulk', 'guest_email': 'bulk@example.com',
+                                    'check_in_date': date(2031, 1, 11), 'check_out_date': date(2031, 1, 11)}],
+                                  atomic=False)
+        self.assertEqual(results[0][0], 'invalid')
+        self.assertEqual(Booking.objects.count(), 1)
+    
+    def test_update_into_overlap_is_rejected(self):
+        client = APIClient()
+        client.post(reverse('booking-list'), self.payload, format='json')
+        later = client.post(reverse('booking-list'), dict(self.payload, check_in_date='2031-01-12',
+                                                           check_out_date='2031-01-14'), format='json')
+        response = client.patch(reverse('booking-detail', args=[later.data['id']]),
+                                {'check_in_date': '2031-01-11'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "This room is already booked for the selected dates")
+        self.assertEqual(RoomNight.objects.filter(booking_id=later.data['id']).count(), 2)
+    
+    def test_invalid_dates(self):
+        response = APIClient().post(reverse('booking-list'), dict(self.payload, check_out_date='2031-01-01'),
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.events, [])
+    
+    def test_clean_checks_overlap_for_forms(self):
+        create_booking(self.room, date(2031, 1, 10), date(2031, 1, 12), guest_name="A", guest_email="a@example.com")
+        booking = Booking(room=self.room, guest_name="B", guest_email="b@example.com",
+                          check_in_date=date(2031, 1, 11), check_out_date=date(2031, 1, 13))
+        with self.assertRaises(ValidationError):
+            booking.full_clean()
+
+
+class BulkBookingTests(BookingTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="group-organizer"))
+        self.url = reverse('booking-bulk')
+        self.hotel = Hotel.objects.create(name="Bulk Hotel", city="Bulkton", address="1 Bulk Road")
+        self.rooms = [
+            Room.objects.create(hotel=self.hotel, room_number=str(100 + i), room_type="DOUBLE", price=100.00)
+            for i in range(5)
+        ]
+        Booking.objects.create(room=self.rooms[0], guest_name="Existing", guest_email="existing@example.com",
+                               check_in_date=date(2031, 2, 1), check_out_date=date(2031, 2, 3))
+    
+    def item(self, room, check_in, check_out):
+        return {
+            'room': str(room.id),
+            'guest_name': 'Group Guest',
+            'guest_email': 'group@example.com',
+            'check_in_date': check_in,
+            'check_out_date': check_out
+        }
+    
+    def test_anonymous_clients_cannot_bulk_book(self):
+        items = [self.item(room, '2031-03-01', '2031-03-02') for room in self.rooms]
+        response = APIClient().post(self.url, {'mode': 'best_effort', 'bookings': items}, format='json')
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.assertFalse(Booking.objects.filter(check_in_date=date(2031, 3, 1)).exists())
+    
+    def test_best_effort_reports_each_item(self):
+        items = [
+            self.item(self.rooms[1], '2031-02-01', '2031-02-03'),
+            self.item(self.rooms[0], '2031-02-02', '2031-02-04'),  # overlaps the existing booking
+            self.item(self.rooms[1], '2031-02-02', '2031-02-05'),  # overlaps the first item
+            self.item(self.rooms[2], '2031-02-01', 'not-a-date'),
+            {**self.item(self.rooms[3], '2031-02-01', '2031-02-02'), 'room': str(uuid.uuid4())},
+            self.item(self.rooms[0], '2031-02-03', '2031-02-05'),
+        ]
+        response = self.client.post(self.url, {'mode': 'best_effort', 'bookings': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['created', 'conflict', 'conflict', 'invalid', 'invalid', 'created'])
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(Booking.objects.count(), 3)
+        self.assertEqual(RoomNight.objects.count(), 6)
+    
+    def test_atomic_creates_nothing_on_conflict(self):
+        items = [
+            self.item(self.rooms[1], '2031-02-01', '2031-02-03'),
+            self.item(self.rooms[0], '2031-02-01', '2031-02-02'),
+        ]
+        response = self.client.post(self.url, {'mode': 'atomic', 'bookings': items}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([result['status'] for result in response.data['results']], ['rolled_back', 'conflict'])
+        self.assertEqual(Booking.objects.count(), 1)
+    
+    def test_atomic_batch_uses_constant_queries(self):
+        def book(first, count):
+            items = [self.item(self.rooms[i % 5], f'2031-03-{1 + i // 5:02d}', f'2031-03-{2 + i // 5:02d}')
+                     for i in range(first, first + count)]
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(self.url, {'bookings': items}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(context.captured_queries)
+        
+        self.assertEqual(book(0, 5), book(5, 20))
+        self.assertEqual(RoomNight.objects.filter(night__month=3).count(), 25)
+    
+    def test_service_invalidates_search_cache(self):
+        search = dict(city="Bulkton", unfilled_only=True,
+                      check_in_date=date(2031, 4, 1), check_out_date=date(2031, 4, 2))
+        self.assertEqual(len(search_hotels_optimized(**search)), 1)
+        results = create_bookings([
+            {'room_id': room.id, 'guest_name': 'Full', 'guest_email': 'full@example.com',
+             'check_in_date': date(2031, 4, 1), 'check_out_date': date(2031, 4, 2)}
+            for room in self.rooms
+        ])
+        self.assertEqual({outcome for outcome, _ in results}, {'created'})
+        self.assertEqual(search_hotels_optimized(**search), [])
+
+
+
+class AsyncViewTests(BookingTestCase):
+    """
+    The ASGI-mode views must answer with the same payloads as the viewsets.
+    """
+    def setUp(self):
+        self.hotels = [
+            Hotel.objects.create(name=f"Async Hotel {i}", city="Asyncville" if i % 2 else "Awaitburg",
+                                 address=f"{i} Async Road")
+            for i in range(25)
+        ]
+        for hotel in self.hotels[:3]:
+            Room.objects.create(hotel=hotel, room_number="101", room_type="DOUBLE", price=150.00)
+        self.room = Room.objects.get(hotel=self.hotels[0])
+        Booking.objects.create(room=self.room, guest_name="Async", guest_email="async@example.com",
+                               check_in_date=date(2031, 5, 1), check_out_date=date(2031, 5, 3))
+    
+    def sync_get(self, url, params=None):
+        response = APIClient().get(url, params or {})
+        return response.status_code, json.loads(response.content)
+    
+    async def async_get(self, url, params=None):
+        with override_settings(ROOT_URLCONF='booking.async_urls'):
+            response = await self.async_client.get(url, params or {})
+        return response.status_code, json.loads(response.content)
+    
+    async def assertSamePayload(self, url, params=None):
+        expected = await sync_to_async(self.sync_get)(url, params)
+        await sync_to_async(cache.clear)()
+        actual = await self.async_get(url, params)
+        self.assertEqual(actual, expected)
+        return actual
+    
+    async def test_hotel_list_pages(self):
+        url = reverse('hotel-list')
+        status_code, first_page = await self.assertSamePayload(url)
+        self.assertEqual(status_code, 200)
+        self.assertEqual(len(first_page['results']), 20)
+        status_code, second_page = await self.assertSamePayload(first_page['next'])
+        self.assertEqual(len(second_page['results']), 5)
+        await self.assertSamePayload(second_page['previous'])
+    
+    async def test_hotel_search_filters(self):
+        url = reverse('hotel-list')
+        await self.assertSamePayload(url, {'city': 'Asyncville'})
+        await self.assertSamePayload(url, {'name': 'Hotel 1'})
+        _, payload = await self.assertSamePayload(url, {
+            'unfilled_only': 'true', 'check_in_date': '2031-05-01', 'check_out_date': '2031-05-02'
+        })
+        self.assertEqual(len(payload['results']), 2)
+    
+    async def test_room_list(self):
+        _, payload = await self.assertSamePayload(reverse('room-list'), {'hotel_id': str(self.hotels[1].id)})
+        self.assertEqual(len(payload['results']), 1)
+    
+    async def test_availability(self):
+        url = reverse('hotel-availability', args=[self.hotels[0].id])
+        _, payload = await self.assertSamePayload(url, {'check_in': '2031-05-02', 'check_out': '2031-05-04'})
+        self.assertFalse(payload['rooms'][0]['is_free'])
+        self.assertEqual(payload['rooms'][0]['next_free_date'], '2031-05-03')
+        status_code, _ = await self.async_get(url, {'check_in': 'soon'})
+        self.assertEqual(status_code, 400)
+        status_code, _ = await self.async_get(reverse('hotel-availability', args=[uuid.uuid4()]))
+        self.assertEqual(status_code, 404)
+    
+    async def test_writes_fall_through_to_viewset(self):
+        with override_settings(ROOT_URLCONF='booking.async_urls'):
+            response = await self.async_client.post(
+                reverse('hotel-list'),
+                {'name': 'Posted Hotel', 'city': 'Asyncville', 'address': '1 Post Road'},
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await Hotel.objects.filter(name='Posted Hotel').aexists())
+
+
+class ExportTests(BookingTestCase):
+    def setUp(self):
+        self.mumbai = Hotel.objects.create(name="Export Palace", city="Mumbai", address="1 Export Road")
+        self.delhi = Hotel.objects.create(name="Export Inn", city="Delhi", address="2 Export Road")
+        self.room = Room.objects.create(hotel=self.mumbai, room_number="101", room_type="SUITE", price=250.50)
+        Room.objects.create(hotel=self.delhi, room_number="201", room_type="SINGLE", price=60.00)
+        Booking.objects.create(room=self.room, guest_name="Exporter", guest_email="export@example.com",
+                               check_in_date=date(2031, 6, 1), check_out_date=date(2031, 6, 5))
+        Booking.objects.create(room=self.room, guest_name="Later", guest_email="later@example.com",
+                               check_in_date=date(2031, 8, 1), check_out_date=date(2031, 8, 2))
+        self.client = APIClient()
+        staff = User.objects.create(username="exporter", is_staff=True)
+        self.client.force_authenticate(staff)
+    
+    def export(self, resource, **params):
+        response = self.client.get(reverse('export', args=[resource]), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content).decode()
+    
+    def test_ndjson_hotels_filtered_by_city(self):
+        rows = [json.loads(line) for line in self.export('hotels', city='Mumbai').splitlines()]
+        self.assertEqual([row['name'] for row in rows], ["Export Palace"])
+        self.assertEqual(rows[0]['id'], str(self.mumbai.id))
+    
+    def test_csv_rooms(self):
+        lines = self.export('rooms', output='csv', city='Mumbai').splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'hotel_id', 'room_number'])
+        self.assertEqual(len(lines), 2)
+        self.assertIn('250.50', lines[1])
+    
+    def test_bookings_overlapping_date_range(self):
+        rows = [json.loads(line) for line in
+                self.export('bookings', date_from='2031-06-04', date_to='2031-07-01').splitlines()]
+        self.assertEqual([row['guest_name'] for row in rows], ["Exporter"])
+    
+    def test_requires_staff_and_valid_params(self):
+        self.assertEqual(APIClient().get(reverse('export', args=['bookings'])).status_code,
+                         status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(reverse('export', args=['guests'])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('export', args=['hotels']), {'output': 'xml'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('export', args=['hotels']), {'date_from': 'May'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('export', args=['bookings']), {'date_to': '2025-02-30'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+    
+    async def test_asgi_export_is_streamed_asynchronously(self):
+        expected = await sync_to_async(self.export)('bookings', output='csv')
+        await self.async_client.aforce_login(await User.objects.aget(username="exporter"))
+        response = await self.async_client.get(reverse('export', args=['bookings']), {'output': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # A sync iterator would be read to the end before the first byte is sent
+        self.assertTrue(response.is_async)
+        blocks = [block async for block in response.streaming_content]
+        self.assertEqual(b''.join(blocks).decode(), expected)
+    
+    def test_export_streams_from_one_query(self):
+        with CaptureQueriesContext(connection) as context:
+            blocks = list(stream_export('hotels', chunk_size=1))
+        self.assertEqual(len(''.join(blocks).splitlines()), 2)
+        self.assertLessEqual(len(context.captured_queries), 1)
+    
+    def test_command(self):
+        out = StringIO()
+        call_command('export_data', 'bookings', '--format', 'csv', '--city', 'Mumbai', stdout=out, stderr=StringIO())
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], ','.join(BOOKING_COLUMNS))
+        self.assertEqual(len(lines), 3)
+
+
+class ImportInventoryTests(BookingTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.hotel_id = uuid.uuid4()
+    
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w') as handle:
+            handle.write(content)
+        return path
+    
+    def run_import(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_inventory', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+    
+    def test_hotels_and_rooms(self):
+        hotels = self.write('hotels.csv', (
+            "id,name,city,address,description\n"
+            f"{self.hotel_id},Imported Hotel,  mumbai ,1 Import Road,\n"
+            ",Second Hotel,Delhi,2 Import Road,Nice\n"
+            ",,Delhi,Missing name,\n"
+        ))
+        rooms = self.write('rooms.ndjson', "\n".join([
+            json.dumps({'hotel_id': str(self.hotel_id), 'room_number': '101', 'room_type': 'SUITE', 'price': '300.00'}),
+            json.dumps({'hotel_id': str(self.hotel_id), 'room_number': '102', 'room_type': 'DOUBLE', 'price': 120,
+                        'is_available': False, 'available_from': '2031-01-01'}),
+            json.dumps({'hotel_id': str(uuid.uuid4()), 'room_number': '101', 'room_type': 'SUITE', 'price': 1}),
+            json.dumps({'hotel_id': str(self.hotel_id), 'room_number': '103', 'room_type': 'PENTHOUSE', 'price': 1}),
+            '{not json',
+        ]))
+        out, err = self.run_import('--hotels', hotels, '--rooms', rooms, '--batch-size', '2')
+        
+        hotel = Hotel.objects.get(id=self.hotel_id)
+        self.assertEqual(hotel.city_ref.key, "mumbai")
+        self.assertEqual(Hotel.objects.count(), 2)
+        self.assertEqual(Room.objects.filter(hotel=hotel).count(), 2)
+        self.assertFalse(Room.objects.get(hotel=hotel, room_number='102').is_available)
+        self.assertIn('hotels.csv:4: name is required', err)
+        self.assertIn('Unknown hotel', err)
+        self.assertIn('rooms.ndjson:4:', err)
+        self.assertIn('rooms.ndjson:5:', err)
+        self.assertIn('Imported rooms: 5 rows read, 2 written, 3 skipped', out)
+    
+    def test_upsert_and_ignore(self):
+        Hotel.objects.create(id=self.hotel_id, name="Old Name", city="Pune", address="Old Road")
+        Room.objects.create(hotel_id=self.hotel_id, room_number="101", room_type="SINGLE", price=50)
+        rooms = self.write('rooms.csv', (
+            "hotel_id,room_number,room_type,price\n"
+            f"{self.hotel_id},101,SINGLE,75.00\n"
+            f"{self.hotel_id},101,SINGLE,80.00\n"
+        ))
+        self.run_import('--rooms', rooms, '--on-conflict', 'ignore')
+        self.assertEqual(Room.objects.get(room_number="101").price, 50)
+        
+        self.run_import('--rooms', rooms)
+        self.assertEqual(Room.objects.get(room_number="101").price, 80)
+        self.assertEqual(Room.objects.count(), 1)
+        
+        hotels = self.write('hotels.ndjson', json.dumps(
+            {'id': str(self.hotel_id), 'name': 'New Name', 'city': 'Pune', 'address': 'New Road'}
+        ))
+        self.run_import('--hotels', hotels)
+        self.assertEqual(Hotel.objects.get(id=self.hotel_id).name, "New Name")
+    
+    def test_batches_use_constant_queries(self):
+        Hotel.objects.create(id=self.hotel_id, name="Batch Hotel", city="Pune", address="1 Batch Road")
+        
+        def import_rooms(first, count):
+            records = [
+                (number, {'hotel_id': str(self.hotel_id), 'room_number': str(number),
+                          'room_type': 'SINGLE', 'price': '10'})
+                for number in range(first, first + count)
+            ]
+            with CaptureQueriesContext(connection) as context:
+                stats = import_records('rooms', records, batch_size=1000)
+            self.assertEqual(stats.written, count)
+            return len(context.captured_queries)
+        
+        self.assertEqual(import_rooms(0, 10), import_rooms(10, 60))
+    
+    def test_skipped_rows_are_counted_but_few_are_kept(self):
+        rows = range(MAX_ERRORS + 50)
+        records = ((number, {'hotel_id': 'not-a-uuid', 'room_number': str(number)}) for number in rows)
+        stats = import_records('rooms', records)
+        self.assertEqual(stats.skipped, MAX_ERRORS + 50)
+        self.assertEqual(len(stats.errors), MAX_ERRORS)
+        self.assertEqual(stats.errors[0][0], 0)
+
+class MockDataGeneratorTests(BookingTestCase):
+    def rows(self, num_hotels, **kwargs):
+        options = {'seed': 7, 'city_ids': dict.fromkeys(CITIES, 1), 'start_date': date(2030, 1, 1),
+                   'timestamp': 'now', 'rooms_per_hotel': 1, 'profile': DENSITY_PROFILES['typical']}
+        options.update(kwargs)
+        chunks = list(generate_rows(num_hotels, **options))
+        return {name: [row for chunk in chunks for row in chunk[name]] for name in chunks[0]}
+    
+    def test_reproducible_and_extendable(self):
+        full = self.rows(CHUNK_SIZE + 10)
+        self.assertEqual(full, self.rows(CHUNK_SIZE + 10))
+        self.assertNotEqual(full['hotels'], self.rows(CHUNK_SIZE + 10, seed=8)['hotels'])
+        
+        # Extending a smaller dataset with the same seed gives the larger one
+        head = self.rows(CHUNK_SIZE - 5)
+        tail = self.rows(15, start=CHUNK_SIZE - 5)
+        self.assertEqual(head['hotels'] + tail['hotels'], full['hotels'])
+        self.assertEqual(head['rooms'] + tail['rooms'], full['rooms'])
+        self.assertEqual(head['nights'] + tail['nights'], full['nights'])
+    
+    def test_process_pool_matches_serial(self):
+        serial = self.rows(CHUNK_SIZE + 10, profile=None)
+        self.assertEqual(serial, self.rows(CHUNK_SIZE + 10, profile=None, workers=2))
+    
+    def test_generated_dataset(self):
+        out = StringIO()
+        with redirect_stdout(out):
+            written = generate_mock_data(40, rooms_per_hotel=25, seed=3, profile='peak')
+        
+        self.assertIn('seed 3', out.getvalue())
+        self.assertEqual(Hotel.objects.count(), 40)
+        self.assertFalse(Hotel.objects.filter(city_ref=None).exists())
+        self.assertEqual(Room.objects.count(), 1000)
+        self.assertEqual(Room.objects.filter(hotel=Hotel.objects.first()).values('room_number').distinct().count(), 25)
+        self.assertEqual(Booking.objects.count(), written['bookings'])
+        
+        # Every active booking holds its nights and no two of them overlap
+        active = Booking.objects.filter(is_cancelled=False)
+        nights = sum((booking.check_out_date - booking.check_in_date).days for booking in active)
+        self.assertEqual(RoomNight.objects.count(), nights)
+        self.assertEqual(written['nights'], nights)
+        self.assertGreater(nights, 1000 * 60 * 0.7)
+    
+    def test_test_bookings_do_not_overlap(self):
+        with redirect_stdout(StringIO()):
+            generate_mock_data(2, rooms_per_hotel=2, seed=5)
+            generate_test_bookings(20, seed=5)
+        
+        self.assertEqual(Booking.objects.count(), 20)
+        self.assertEqual(Booking.objects.values('room').distinct().count(), 4)
+        active = Booking.objects.filter(is_cancelled=False)
+        nights = sum((booking.check_out_date - booking.check_in_date).days for booking in active)
+        self.assertEqual(RoomNight.objects.count(), nights)
+    
+    def test_zero_test_bookings(self):
+        with redirect_stdout(StringIO()) as out:
+            generate_mock_data(1, rooms_per_hotel=2, seed=5)
+            generate_test_bookings(0, seed=5)
+        
+        self.assertEqual(Booking.objects.count(), 0)
+        self.assertIn("Created 0 test bookings", out.getvalue())
+    
+    def test_test_bookings_avoid_profile_bookings(self):
+        with redirect_stdout(StringIO()):
+            written = generate_mock_data(2, rooms_per_hotel=2, seed=5, profile='peak')
+            generate_test_bookings(20, seed=5)
+        
+        self.assertEqual(Booking.objects.count(), written['bookings'] + 20)
+        # No night of a test booking was dropped for clashing with a profile booking
+        active = Booking.objects.filter(is_cancelled=False)
+        nights = sum((booking.check_out_date - booking.check_in_date).days for booking in active)
+        self.assertEqual(RoomNight.objects.count(), nights)
+
+class BenchmarkComparisonTests(BookingTestCase):
+    def test_summarize(self):
+        summary = summarize([0.001 * n for n in range(1, 101)], queries=200, elapsed=2.0)
+        self.assertEqual(summary['calls'], 100)
+        self.assertEqual(summary['p50_ms'], 50.0)
+        self.assertEqual(summary['p99_ms'], 99.0)
+        self.assertEqual(summary['throughput_per_s'], 50.0)
+        self.assertEqual(summary['queries_per_call'], 2.0)
+    
+    def test_compare_flags_regressions(self):
+        baseline = {
+            'search': {'p50_ms': 10.0, 'p95_ms': 20.0, 'throughput_per_s': 100.0, 'queries_per_call': 2.0},
+            'removed_case': {'p95_ms': 1.0},
+        }
+        results = {
+            'search': {'p50_ms': 11.0, 'p95_ms': 30.0, 'throughput_per_s': 70.0, 'queries_per_call': 3.0},
+            'new_case': {'p95_ms': 1.0},
+        }
+        baseline['bookings'] = {'p95_ms': 100.0, 'queries_per_call': 9.0, 'concurrency': 8}
+        results['bookings'] = {'p95_ms': 110.0, 'queries_per_call': 10.0, 'concurrency': 8}
+        comparison = compare(results, baseline, tolerance=0.2)
+        
+        self.assertEqual(list(comparison), ['search', 'bookings'])
+        search = comparison['search']
+        self.assertFalse(search['p50_ms']['regressed'])
+        self.assertTrue(search['p95_ms']['regressed'])
+        self.assertEqual(search['p95_ms']['change_pct'], 50.0)
+        self.assertTrue(search['throughput_per_s']['regressed'])
+        # Query counts are deterministic, so any increase is a regression
+        self.assertTrue(search['queries_per_call']['regressed'])
+        # Concurrent cases retry, so their query counts get the tolerance
+        self.assertFalse(comparison['bookings']['queries_per_call']['regressed'])
+        
+        self.assertFalse(any(
+            values['regressed'] for values in compare(baseline, baseline)['search'].values()
+        ))
+
+class InstrumentationTests(BookingTestCase):
+    def setUp(self):
+        self.hotel = Hotel.objects.create(name="Timing Hotel", city="Pune", address="1 Timing Road")
+    
+    def test_disabled_middleware_is_not_used(self):
+        from django.core.exceptions import MiddlewareNotUsed
+        with override_settings(BOOKING_INSTRUMENTATION_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                QueryInstrumentationMiddleware(lambda request: None)
+        
+        response = self.client.get('/api/hotels/')
+        self.assertNotIn('Server-Timing', response)
+    
+    @override_settings(BOOKING_INSTRUMENTATION_ENABLED=True, BOOKING_SLOW_REQUEST_MS=10000)
+    def test_request_headers_and_log(self):
+        with self.assertLogs('booking.instrumentation', 'INFO') as logs:
+            response = self.client.get('/api/hotels/', {'city': 'Pune'})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", .*total;dur=')
+        self.assertEqual(len(logs.records), 1)
+        payload = logs.records[0].instrumentation
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertEqual(payload['path'], '/api/hotels/')
+        self.assertEqual(payload['status'], 200)
+        self.assertGreater(payload['queries'], 0)
+        self.assertLessEqual(len(payload['slowest']), 5)
+        self.assertNotIn('statements', payload)
+        self.assertEqual(json.loads(logs.records[0].getMessage())['queries'], payload['queries'])
+    
+    @override_settings(BOOKING_INSTRUMENTATION_ENABLED=True, BOOKING_SLOW_REQUEST_MS=0)
+    def test_slow_request_logs_every_statement(self):
+        with self.assertLogs('booking.instrumentation', 'WARNING') as logs:
+            self.client.get('/api/rooms/', {'hotel_id': str(self.hotel.id)})
+        
+        payload = logs.records[0].instrumentation
+        self.assertTrue(payload['slow'])
+        self.assertEqual(len(payload['statements']), payload['queries'])
+    
+    def test_context_manager_counts_queries_and_cache(self):
+        with self.assertLogs('booking.instrumentation', 'INFO'), CaptureQueriesContext(connection) as ctx:
+            with instrument('search twice') as profile:
+                search_hotels_optimized(city="Pune")
+                search_hotels_optimized(city="Pune")
+        
+        self.assertEqual(profile.queries, len(ctx.captured_queries))
+        self.assertGreater(profile.db_time, 0)
+        self.assertEqual(profile.cache['hits'], 1)
+        self.assertEqual(profile.cache['misses'], 1)
+        self.assertIn('cache;desc="1 hits, 1 misses"', profile.server_timing())
+        
+        with self.assertLogs('booking.instrumentation', 'INFO'):
+            with instrument('outer', log=False) as outer, instrument('inner') as inner:
+                list(Hotel.objects.all())
+        self.assertEqual((outer.queries, inner.queries), (1, 1))
+    
+    @override_settings(BOOKING_INSTRUMENTATION_ENABLED=True, BOOKING_SLOW_REQUEST_MS=10000,
+                       ROOT_URLCONF='booking.async_urls')
+    async def test_async_requests_stay_async(self):
+        async def view(request):
+            return HttpResponse()
+        
+        self.assertTrue(iscoroutinefunction(QueryInstrumentationMiddleware(view)))
+        with self.assertLogs('booking.instrumentation', 'INFO') as logs:
+            response = await self.async_client.get('/api/hotels/', {'city': 'Pune'})
+        
+        self.assertEqual(response.status_code, 200)
+        # The async view's queries run in a sync_to_async thread and are still counted
+        self.assertGreater(logs.records[0].instrumentation['queries'], 0)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+class MetricsTests(BookingTestCase):
+    def setUp(self):
+        metrics_registry.clear()
+        self.addCleanup(metrics_registry.clear)
+        self.hotel = Hotel.objects.create(name="Metrics Hotel", city="Pune", address="1 Metrics Road")
+        self.room = Room.objects.create(hotel=self.hotel, room_number="101", room_type="SINGLE", price=100)
+    
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+    
+    def book(self, room, check_in):
+        return self.client.post('/api/bookings/', {
+            'room': str(room),
+            'guest_name': 'Metrics Guest',
+            'guest_email': 'metrics@example.com',
+            'check_in_date': str(check_in),
+            'check_out_date': str(check_in + timedelta(days=2)),
+        }, content_type='application/json')
+    
+    def test_search_latency_by_cache_outcome(self):
+        search_hotels_optimized(city="Pune")
+        search_hotels_optimized(city="Pune")
+        
+        text = self.scrape()
+        self.assertIn('# TYPE booking_search_duration_seconds histogram', text)
+        self.assertIn('booking_search_duration_seconds_count{function="search_hotels_optimized",cache="hit"} 1', text)
+        self.assertIn('booking_search_duration_seconds_count{function="search_hotels_optimized",cache="miss"} 1', text)
+        self.assertIn('booking_search_duration_seconds_bucket{function="search_hotels_optimized",cache="hit",le="+Inf"} 1', text)
+    
+    def test_booking_outcomes_throttles_and_queries(self):
+        check_in = date.today() + timedelta(days=10)
+        self.assertEqual(self.book(self.room.id, check_in).status_code, 201)
+        self.assertEqual(self.book(self.room.id, check_in).status_code, 400)
+        self.assertEqual(self.book(uuid.uuid4(), check_in).status_code, 400)
+        for _ in range(8):
+            self.book(uuid.uuid4(), check_in)
+        
+        text = self.scrape()
+        self.assertIn('booking_create_duration_seconds_count{outcome="success"} 1', text)
+        self.assertIn('booking_create_duration_seconds_count{outcome="overlap_rejected"} 1', text)
+        self.assertIn('booking_create_duration_seconds_count{outcome="room_not_found"} 8', text)
+        # Anonymous booking requests are limited to 10 an hour
+        self.assertIn('booking_throttle_rejections_total{scope="booking_anon"} 1', text)
+        self.assertIn('booking_write_duration_seconds_count{outcome="created"} 1', text)
+        self.assertRegex(text, r'booking_db_queries_total\{alias="default"\} [1-9]')
+    
+    def test_workers_are_aggregated_from_files(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(BOOKING_METRICS_DIR=directory):
+            # Another worker's flushed samples
+            with open(os.path.join(directory, '999999.json'), 'w') as handle:
+                json.dump({'booking_throttle_rejections_total': {'["search_anon"]': 4}}, handle)
+            metrics_registry.metrics['booking_throttle_rejections_total'].inc(scope='search_anon')
+            
+            text = self.scrape()
+            self.assertIn('booking_throttle_rejections_total{scope="search_anon"} 5', text)
+            self.assertTrue(os.path.exists(os.path.join(directory, f'{os.getpid()}.json')))
+            metrics_registry.clear()
+    
+    def test_recording_does_not_write_the_file(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(BOOKING_METRICS_DIR=directory):
+            metrics_registry.metrics['booking_throttle_rejections_total'].inc(scope='search_anon')
+            # The background thread or the next scrape writes it, never the request
+            self.assertEqual(os.listdir(directory), [])
+            metrics_registry.clear()
+    
+    def test_samples_of_every_thread_are_merged(self):
+        def record():
+            for _ in range(100):
+                metrics_registry.metrics['booking_db_queries_total'].inc(alias='threads')
+                metrics_registry.metrics['booking_db_query_duration_seconds'].observe(0.002, alias='threads')
+        
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Finished threads' shards are folded into one aggregate
+        self.assertFalse(any(('threads',) in shard.samples.get('booking_db_queries_total', {})
+                             for shard in metrics_registry._shards))
+        
+        text = self.scrape()
+        self.assertIn('booking_db_queries_total{alias="threads"} 400', text)
+        self.assertIn('booking_db_query_duration_seconds_bucket{alias="threads",le="0.0025"} 400', text)
+        self.assertIn('booking_db_query_duration_seconds_count{alias="threads"} 400', text)
+
+class SlidingWindowThrottleTests(BookingTestCase):
+    def setUp(self):
+        self.cache = CountingCache(cache)
+        self.counters = WindowCounters()
+    
+    def hit(self, now, sync_interval=0, key='throttle_test', limit=10, duration=100):
+        return self.counters.hit(self.cache, key, limit, duration, now, sync_interval)[0]
+    
+    def test_previous_window_is_weighted_by_overlap(self):
+        self.assertEqual([self.hit(1000 + i) for i in range(11)], [True] * 10 + [False])
+        # Halfway through the next window half of the previous one still counts
+        allowed = [self.hit(1150) for _ in range(6)]
+        self.assertEqual(allowed, [True] * 5 + [False])
+        # Two windows later nothing of it is left
+        self.assertTrue(self.hit(1300))
+    
+    def test_cache_operations_do_not_grow_with_history(self):
+        for i in range(10):
+            self.hit(1000 + i)
+        self.cache.operations = 0
+        for i in range(50):
+            self.hit(1020 + i)
+        # A read of both windows per request, plus at most one write when admitted
+        self.assertLessEqual(self.cache.operations, 50 * 3)
+    
+    def test_local_counts_are_synced_on_interval_and_before_rejecting(self):
+        self.assertTrue(self.hit(1000, sync_interval=5))
+        self.cache.operations = 0
+        self.assertEqual([self.hit(1001, sync_interval=5) for _ in range(9)], [True] * 9)
+        self.assertEqual(self.cache.operations, 0)
+        # The 11th request would be rejected locally; the rejection flushes and re-reads first
+        self.assertFalse(self.hit(1002, sync_interval=5))
+        self.assertGreater(self.cache.operations, 0)
+        self.assertEqual(cache.get('throttle_test:10'), 10)
+    
+    def test_other_processes_are_seen_at_the_next_sync(self):
+        other = WindowCounters()
+        for _ in range(8):
+            other.hit(cache, 'throttle_test', 10, 100, 1000, 0)
+        self.assertEqual([self.hit(1001, sync_interval=5) for _ in range(3)], [True, True, False])
+    
+    def test_evicted_clients_keep_their_admitted_requests(self):
+        counters = WindowCounters(max_clients=1)
+        for _ in range(4):
+            counters.hit(cache, 'throttle_a', 10, 100, 1000, 5)
+        # Tracking another client drops 'throttle_a' from memory; its counts go to the cache
+        counters.hit(cache, 'throttle_b', 10, 100, 1000, 5)
+        self.assertEqual(cache.get('throttle_a:10'), 4)
+    
+    def test_throttle_rejects_with_wait(self):
+        throttle = BookingAnonRateThrottle()
+        throttle.counters = self.counters
+        throttle.timer = lambda: 7200.0
+        request = APIClient().get('/').wsgi_request
+        
+        with override_settings(BOOKING_THROTTLE_SYNC_INTERVAL=0):
+            allowed = [throttle.allow_request(request, None) for _ in range(11)]
+        self.assertEqual(allowed, [True] * 10 + [False])
+        # The full window must start sliding out of the next one
+        self.assertAlmostEqual(throttle.wait(), 3600)
@@ -0,0 +1,360 @@
+"""
+Substring search over hotel names and cities.
+
+`icontains` compiles to LIKE '%x%', which cannot use the B-tree indexes on
+Hotel.name / Hotel.city. The backends here answer the same substring
+question from a trigram index instead:
+
+- PostgreSQL: GIN pg_trgm indexes on UPPER(name) / UPPER(city), which serve
+  Django's icontains SQL directly (created by migration 0004)
+- SQLite: an FTS5 virtual table with the trigram tokenizer, kept in sync
+  with booking_hotel by triggers (created by migration 0004)
+- anything else: an in-process n-gram inverted index kept in sync by signals,
+  and re-warmed when a shared counter shows hotel writes made elsewhere
+  (other workers, bulk imports)
+
+Every backend returns the same rows as the icontains filter. City filters
+that name a known City skip substring matching entirely (see filter_hotels).
+"""
+
+import threading
+import time
+from array import array
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from .models import City, Hotel
+
+# Searchable Hotel text fields
+TEXT_FIELDS = ('name', 'city')
+
+# Trigram indexes cannot answer queries shorter than one trigram
+NGRAM_SIZE = 3
+
+# Above this many candidates an id IN (...) list costs more than a scan
+MAX_CANDIDATES = 20000
+
+# SQLite FTS5 table created by migration 0004
+FTS_TABLE = 'booking_hotel_fts'
+
+# Shared counter of committed hotel writes in every process; an n-gram index
+# warmed under an older value has missed some of them
+GENERATION_KEY = 'search:ngram:generation'
+
+
+def _fold(value):
+    return (value or '').lower()
+
+
+def ngrams(value):
+    """
+    Distinct character n-grams of a (case-folded) string.
+    """
+    value = _fold(value)
+    return {value[i:i + NGRAM_SIZE] for i in range(len(value) - NGRAM_SIZE + 1)}
+
+
+def hotels_generation():
+    """
+    Current value of the shared hotel write counter (0 if it is not set).
+    """
+    return cache.get(GENERATION_KEY, 0)
+
+
+def hotels_changed():
+    """
+    Record a committed hotel write, so every process's n-gram index re-warms.
+
+    Returns:
+        int: The new counter value, or None if the counter had to be restarted
+    """
+    try:
+        return cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Time-based restart so an evicted counter never repeats an old value
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+        return None
+
+
+class IContainsBackend:
+    """
+    Plain LIKE '%x%' filtering; the reference behaviour for other backends.
+    """
+    name = 'icontains'
+
+    def filter(self, queryset, field, value):
+        return queryset.filter(**{f'{field}__icontains': value})
+
+
+class PostgresTrigramBackend(IContainsBackend):
+    """
+    Django compiles icontains to UPPER(col) LIKE UPPER(%s) on PostgreSQL,
+    which the GIN (UPPER(col) gin_trgm_ops) indexes serve directly.
+    """
+    name = 'postgres_trigram'
+
+
+class SQLiteFTSBackend(IContainsBackend):
+    """
+    Resolve substring matches through the FTS5 trigram table.
+    """
+    name = 'sqlite_fts'
+
+    def filter(self, queryset, field, value):
+        if len(value) < NGRAM_SIZE:
+            return super().filter(queryset, field, value)
+
+        # A quoted FTS5 string restricted to one column is a substring match
+        phrase = '"{}"'.format(value.replace('"', '""'))
+        matches = RawSQL(
+            f"SELECT hotel_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [f'{field} : {phrase}']
+        )
+        return queryset.filter(id__in=matches)
+
+
+class _Documents:
+    """
+    One build of the n-gram index: trigram posting lists per field, and the
+    hotel of every dense document id (None once tombstoned).
+    """
+    __slots__ = ('postings', 'doc_ids', 'hotel_ids')
+
+    def __init__(self):
+        self.postings = {field: {} for field in TEXT_FIELDS}
+        self.doc_ids = {}
+        self.hotel_ids = []
+
+    def add(self, hotel_id, values):
+        # The hotel id is in place before any posting refers to its document
+        doc_id = len(self.hotel_ids)
+        self.hotel_ids.append(hotel_id)
+        previous = self.doc_ids.get(hotel_id)
+        self.doc_ids[hotel_id] = doc_id
+        for field, value in values.items():
+            postings = self.postings[field]
+            for gram in ngrams(value):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array('I')
+                posting.append(doc_id)
+        # A changed hotel's old document is only tombstoned once the new one is complete
+        if previous is not None:
+            self.hotel_ids[previous] = None
+
+    def remove(self, hotel_id):
+        doc_id = self.doc_ids.pop(hotel_id, None)
+        if doc_id is not None:
+            self.hotel_ids[doc_id] = None
+
+
+class NgramIndex:
+    """
+    In-process trigram inverted index over hotel names and cities.
+
+    Hotels get dense integer document ids so posting lists are compact
+    array('I')s. Candidates from the index are re-checked with icontains by
+    the database, so removed or renamed hotels only need to be tombstoned.
+    The index records the hotel write counter it was warmed under; see
+    is_current().
+
+    Writers hold the lock. A warm builds a new set of documents and swaps it
+    in whole, so readers, which take no lock, never see a partial index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._documents = _Documents()
+        self.generation = None
+        self.warmed = False
+
+    def warm(self):
+        """
+        Rebuild the index from the database unless it is already current.
+        Concurrent callers on a stale index wait for one rebuild.
+        """
+        with self._lock:
+            if self.is_current():
+                return
+            # Read before the hotels, so writes committed meanwhile re-warm it again
+            generation = hotels_generation()
+            documents = _Documents()
+            hotels = Hotel.objects.values_list('id', *TEXT_FIELDS).order_by()
+            for hotel_id, *values in hotels.iterator(chunk_size=5000):
+                documents.add(hotel_id, dict(zip(TEXT_FIELDS, values)))
+            self._documents = documents
+            self.generation = generation
+            self.warmed = True
+
+    def is_current(self):
+        """
+        True if the index is warm and no process has written hotels it missed.
+        """
+        return self.warmed and hotels_generation() == self.generation
+
+    def caught_up(self, generation):
+        """
+        Adopt the counter value returned by hotels_changed() for a write this
+        index has applied itself, if that write was the only one since.
+        """
+        with self._lock:
+            if self.warmed and generation is not None and generation == self.generation + 1:
+                self.generation = generation
+
+    def update(self, hotel):
+        """
+        Index a created or changed hotel; its previous document is tombstoned.
+        """
+        with self._lock:
+            self._documents.add(hotel.id, {field: getattr(hotel, field) for field in TEXT_FIELDS})
+
+    def remove(self, hotel_id):
+        with self._lock:
+            self._documents.remove(hotel_id)
+
+    def candidates(self, field, value):
+        """
+        Hotel ids whose `field` contains every trigram of `value`.
+        """
+        documents = self._documents
+        postings = documents.postings[field]
+        lists = []
+        for gram in ngrams(value):
+            posting = postings.get(gram)
+            if posting is None:
+                return []
+            lists.append(posting)
+
+        lists.sort(key=len)
+        matches = set(lists[0])
+        for posting in lists[1:]:
+            matches.intersection_update(posting)
+            if not matches:
+                return []
+        hotel_ids = documents.hotel_ids
+        return [hotel_ids[doc_id] for doc_id in matches if hotel_ids[doc_id] is not None]
+
+
+ngram_index = NgramIndex()
+
+
+class NgramBackend(IContainsBackend):
+    """
+    Narrow substring matches with the in-process n-gram index.
+    """
+    name = 'ngram'
+
+    def __init__(self, index=None):
+        self.index = index if index is not None else ngram_index
+
+    def filter(self, queryset, field, value):
+        if len(value) < NGRAM_SIZE:
+            return super().filter(queryset, field, value)
+        if not self.index.is_current():
+            self.index.warm()
+
+        candidates = self.index.candidates(field, value)
+        if len(candidates) > MAX_CANDIDATES:
+            return super().filter(queryset, field, value)
+        # The database re-checks the candidates, so the index may over-match
+        return super().filter(queryset.filter(id__in=candidates), field, value)
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (IContainsBackend, PostgresTrigramBackend, SQLiteFTSBackend, NgramBackend)
+}
+
+
+# FTS table presence per database file, checked once
+_fts_available = {}
+
+
+def _sqlite_fts_available():
+    database = connection.settings_dict['NAME']
+    if database not in _fts_available:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+            )
+            _fts_available[database] = cursor.fetchone() is not None
+    return _fts_available[database]
+
+
+def get_backend():
+    """
+    Return the configured text search backend.
+
+    HOTEL_TEXT_SEARCH_BACKEND is 'auto' (default) or one of BACKENDS.
+    """
+    name = getattr(settings, 'HOTEL_TEXT_SEARCH_BACKEND', 'auto')
+    if name != 'auto':
+        return BACKENDS[name]()
+
+    if connection.vendor == 'postgresql':
+        return PostgresTrigramBackend()
+    if connection.vendor == 'sqlite' and _sqlite_fts_available():
+        return SQLiteFTSBackend()
+    return NgramBackend()
+
+
+def filter_hotels(queryset, city=None, name=None, backend=None):
+    """
+    Apply city / name filters to a hotel queryset.
+
+    A city that matches a known City (by canonical key or alias) is an exact
+    foreign-key lookup served by the (city_ref, id) index; anything else is
+    treated as partial text and goes through the substring backend.
+
+    Args:
+        queryset (QuerySet): Hotel queryset to filter
+        city (str): City name, alias or case-insensitive substring of the city
+        name (str): Case-insensitive substring of the hotel name
+        backend: Backend instance to use (defaults to get_backend())
+
+    Returns:
+        QuerySet: Filtered hotel queryset
+    """
+    if not city and not name:
+        return queryset
+    if backend is None:
+        backend = get_backend()
+    if city:
+        known_city = City.objects.resolve(city)
+        if known_city is not None:
+            queryset = queryset.filter(city_ref_id=known_city.id)
+        else:
+            queryset = backend.filter(queryset, 'city', city)
+    if name:
+        queryset = backend.filter(queryset, 'name', name)
+    return queryset
+
+
+async def afilter_hotels(queryset, city=None, name=None, backend=None):
+    """
+    Async version of filter_hotels() for async views.
+
+    The City lookup uses the async ORM; probing the FTS table and warming
+    the n-gram index happen at most once per process and run in a thread.
+    """
+    if not city and not name:
+        return queryset
+    if backend is None:
+        backend = await sync_to_async(get_backend)()
+    if isinstance(backend, NgramBackend) and not backend.index.warmed:
+        await sync_to_async(backend.index.warm)()
+    if city:
+        known_city = await City.objects.aresolve(city)
+        if known_city is not None:
+            queryset = queryset.filter(city_ref_id=known_city.id)
+        else:
+            queryset = backend.filter(queryset, 'city', city)
+    if name:
+        queryset = backend.filter(queryset, 'name', name)
+    return queryset
+
@@ -1,6 +1,185 @@
+"""
+Request throttles for the booking and search endpoints.
+
+DRF's SimpleRateThrottle keeps a list of request timestamps per client and
+reads and rewrites the whole list on every request, so its cost grows with
+the rate. The throttles here use a sliding-window counter instead: two
+fixed-window counters (the current and the previous window), with the
+previous one weighted by how much of it still overlaps the sliding window.
+That is O(1) cache operations per request whatever the rate.
+
+Each process also counts admitted requests locally and only syncs them
+with the shared cache every BOOKING_THROTTLE_SYNC_INTERVAL seconds, when a
+window rolls over, or before rejecting a request. Between syncs requests
+are admitted without any cache operation. Other workers' requests are seen
+at the next sync, so with N workers a client can overshoot its limit by at
+most what the workers admit in one interval, but no request is rejected on
+stale local counts. Set the interval to 0 to sync every request.
+
+That bound holds only if the cache's incr() and add() are atomic, as with
+Redis. The default per-process locmem cache keeps separate counts in every
+worker; backends that emulate incr() with get and set lose concurrent
+increments, and the overshoot is then unbounded.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
 from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+from .metrics import throttle_rejections
+
+# Seconds between syncs of the local counters with the shared cache
+DEFAULT_SYNC_INTERVAL = 1.0
+
+# Clients tracked in process memory; the least recently seen are dropped
+MAX_LOCAL_CLIENTS = 10000
+
+class WindowCounters:
+    """
+    Process-local sliding-window state, synced with the shared cache.
+    
+    Per throttle key it holds the window number, the shared counts of the
+    current and previous window as of the last sync, the requests admitted
+    here since then (pending) and the time of that sync.
+    """
+    def __init__(self, max_clients=MAX_LOCAL_CLIENTS):
+        self._lock = threading.Lock()
+        self._max_clients = max_clients
+        self._entries = OrderedDict()
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def hit(self, cache, key, limit, duration, now, sync_interval):
+        """
+        Count one request against the limit if the sliding window allows it.
+        
+        Returns:
+            tuple: (allowed, current window count, previous window count,
+                elapsed fraction of the current window)
+        """
+        window, offset = divmod(now, duration)
+        window, fraction = int(window), offset / duration
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['window'] == window and now - entry['synced_at'] < sync_interval:
+                # Fast path: admitted from the local state without a cache operation.
+                # Rejections are always confirmed against the shared counts below.
+                result = self._decide(entry, limit, fraction)
+                if result[0]:
+                    self._entries.move_to_end(key)
+                    return result
+            flush = self._take_pending(entry)
+        
+        current, previous = self._sync(cache, key, window, duration, flush)
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            # Requests other threads admitted for this window during the sync
+            pending = entry['pending'] if entry is not None and entry['window'] == window else 0
+            entry = {'window': window, 'current': current, 'previous': previous, 'pending': pending,
+                     'synced_at': now, 'duration': duration}
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            evicted = None
+            if len(self._entries) > self._max_clients:
+                # The evicted client's admitted requests still count against it
+                evicted_key, evicted_entry = self._entries.popitem(last=False)
+                evicted = (evicted_key, evicted_entry['duration'], self._take_pending(evicted_entry))
+            result = self._decide(entry, limit, fraction)
+            flush = self._take_pending(entry) if sync_interval <= 0 else None
+        
+        if flush is not None:
+            self._add(cache, f'{key}:{flush[0]}', flush[1], duration)
+        if evicted is not None and evicted[2] is not None:
+            evicted_key, evicted_duration, (evicted_window, amount) = evicted
+            self._add(cache, f'{evicted_key}:{evicted_window}', amount, evicted_duration)
+        return result
+    
+    def _decide(self, entry, limit, fraction):
+        current = entry['current'] + entry['pending']
+        previous = entry['previous']
+        allowed = previous * (1 - fraction) + current < limit
+        if allowed:
+            entry['pending'] += 1
+            current += 1
+        return allowed, current, previous, fraction
+    
+    def _take_pending(self, entry):
+        if entry is None or not entry['pending']:
+            return None
+        flush = (entry['window'], entry['pending'])
+        entry['pending'] = 0
+        return flush
+    
+    def _sync(self, cache, key, window, duration, flush):
+        if flush is not None:
+            self._add(cache, f'{key}:{flush[0]}', flush[1], duration)
+        counts = cache.get_many([f'{key}:{window}', f'{key}:{window - 1}'])
+        return counts.get(f'{key}:{window}', 0), counts.get(f'{key}:{window - 1}', 0)
+    
+    def _add(self, cache, window_key, amount, duration):
+        # Counters outlive their window by one more, while they are the "previous" one
+        try:
+            return cache.incr(window_key, amount)
+        except ValueError:
+            if cache.add(window_key, amount, duration * 2):
+                return amount
+            try:
+                return cache.incr(window_key, amount)
+            except ValueError:
+                # Backends that store nothing (DummyCache)
+                return 0
+
+window_counters = WindowCounters()
+
+class SlidingWindowThrottleMixin:
+    """
+    Replace SimpleRateThrottle's timestamp list with sliding-window counters.
+    Rates, scopes and cache keys (get_cache_key) are unchanged.
+    """
+    counters = window_counters
+    
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        
+        self.now = self.timer()
+        sync_interval = getattr(settings, 'BOOKING_THROTTLE_SYNC_INTERVAL', DEFAULT_SYNC_INTERVAL)
+        allowed, self.current, self.previous, self.fraction = self.counters.hit(
+            self.cache, self.key, self.num_requests, self.duration, self.now, sync_interval
+        )
+        return allowed or self.throttle_failure()
+    
+    def wait(self):
+        """
+        Seconds until the weighted count drops below the limit again.
+        """
+        limit, duration = self.num_requests, self.duration
+        if self.current < limit:
+            # The previous window's weight must shrink below limit - current
+            needed = 1 - (limit - self.current) / self.previous if self.previous else self.fraction
+            return max(needed - self.fraction, 0) * duration
+        # Wait for the next window, where this one becomes the previous
+        remaining = (1 - self.fraction) * duration
+        return remaining + max(1 - limit / self.current, 0) * duration
+
+class RecordedThrottleMixin:
+    """
+    Count rejected requests per throttle scope in the /metrics endpoint.
+    """
+    def throttle_failure(self):
+        throttle_rejections.inc(scope=self.scope)
+        return super().throttle_failure()
 
-class BookingUserRateThrottle(UserRateThrottle):
+class BookingUserRateThrottle(RecordedThrottleMixin, SlidingWindowThrottleMixin, UserRateThrottle):
     """
     Rate limiting for authenticated users making booking requests.
     Limits users to 30 booking requests per hour to prevent abuse.
@@ -8,7 +187,7 @@ class BookingUserRateThrottle(UserRateThrottle):
     rate = '30/hour'
     scope = 'booking_user'
 
-class BookingAnonRateThrottle(AnonRateThrottle):
+class BookingAnonRateThrottle(RecordedThrottleMixin, SlidingWindowThrottleMixin, AnonRateThrottle):
     """
     Rate limiting for anonymous users making booking requests.
     Limits anonymous users to 10 booking requests per hour to prevent abuse.
@@ -16,7 +195,7 @@ class BookingAnonRateThrottle(AnonRateThrottle):
     rate = '10/hour'
     scope = 'booking_anon'
 
-class SearchUserRateThrottle(UserRateThrottle):
+class SearchUserRateThrottle(RecordedThrottleMixin, SlidingWindowThrottleMixin, UserRateThrottle):
     """
     Rate limiting for authenticated users making search requests.
     Limits users to 100 search requests per hour.
@@ -24,7 +203,7 @@ class SearchUserRateThrottle(UserRateThrottle):
     rate = '100/hour'
     scope = 'search_user'
 
-class SearchAnonRateThrottle(AnonRateThrottle):
+class SearchAnonRateThrottle(RecordedThrottleMixin, SlidingWindowThrottleMixin, AnonRateThrottle):
     """
     Rate limiting for anonymous users making search requests.
     Limits anonymous users to 50 search requests per hour.
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import HotelViewSet, RoomViewSet, BookingViewSet, HomePageView, HotelRoomsView
+from .views import HotelViewSet, RoomViewSet, BookingViewSet, HomePageView, HotelRoomsView, ExportView
 
 router = DefaultRouter()
 router.register(r'hotels', HotelViewSet)
@@ -10,5 +10,6 @@ router.register(r'bookings', BookingViewSet)
 urlpatterns = [
     path('', HomePageView.as_view(), name='home'),
     path('hotel/<uuid:hotel_id>/rooms/', HotelRoomsView.as_view(), name='hotel_rooms'),
+    path('api/export/<str:resource>/', ExportView.as_view(), name='export'),
     path('api/', include(router.urls)),
 ]
\ No newline at end of file
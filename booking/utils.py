@@ -1,153 +1,184 @@
 import random
-import uuid
-from datetime import datetime, timedelta
+from datetime import timedelta
+from django.db import connection, transaction
 from django.utils import timezone
-from .models import Hotel, Room, Booking, ROOM_TYPES
+from . import datagen
+from .cache import invalidate_hotel_cache
+from .models import City, Hotel, Room, Booking, RoomNight
+from .inventory import occupy_many, stay_nights
+from .text_search import hotels_changed
 
-def generate_mock_data(num_hotels=1000000, rooms_per_hotel=3):
+# Tables written by generate_mock_data, in foreign key order
+GENERATED_TABLES = (
+    ('hotels', Hotel, datagen.HOTEL_COLUMNS),
+    ('rooms', Room, datagen.ROOM_COLUMNS),
+    ('bookings', Booking, datagen.BOOKING_COLUMNS),
+    ('nights', RoomNight, datagen.NIGHT_COLUMNS),
+)
+
+def _insert_rows(cursor, model, columns, rows):
+    """
+    Insert row tuples with multi-row INSERT ... VALUES statements, as many
+    rows per statement as the backend's parameter limit allows.
+    
+    `cursor` is a raw DB-API cursor: Django's cursor wrapper rewrites and,
+    with DEBUG on, logs every statement, which costs more than the insert.
+    """
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    fields = [model._meta.get_field(column) for column in columns]
+    per_statement = connection.ops.bulk_batch_size(fields, rows)
+    prefix = 'INSERT INTO {} ({}) VALUES '.format(
+        quote(model._meta.db_table), ', '.join(quote(field.column) for field in fields)
+    )
+    marker = '?' if connection.Database.paramstyle == 'qmark' else '%s'
+    placeholder = '({})'.format(', '.join([marker] * len(fields)))
+    full_sql = prefix + ', '.join([placeholder] * per_statement)
+    for offset in range(0, len(rows), per_statement):
+        batch = rows[offset:offset + per_statement]
+        sql = full_sql if len(batch) == per_statement else prefix + ', '.join([placeholder] * len(batch))
+        cursor.execute(sql, [value for row in batch for value in row])
+
+def generate_mock_data(num_hotels=1000000, rooms_per_hotel=3, seed=None, profile=None, workers=1, start=0):
     """
     Generate mock data for testing the hotel booking system with large datasets.
     
+    Rows come from booking.datagen, so the same seed always produces the same
+    hotels, rooms and bookings. Room numbers are unique per hotel, bookings
+    never overlap and their room nights are written alongside them.
+    
     Args:
         num_hotels (int): Number of hotels to generate
         rooms_per_hotel (int): Number of rooms per hotel
-    """
-    # List of cities for random generation
-    us_cities = [
-        "New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia",
-        "San Antonio", "San Diego", "Dallas", "San Jose", "Austin", "Jacksonville",
-        "Fort Worth", "Columbus", "San Francisco", "Charlotte", "Indianapolis",
-        "Seattle", "Denver", "Washington", "Boston", "El Paso", "Nashville",
-        "Detroit", "Portland", "Memphis", "Oklahoma City", "Las Vegas", "Louisville",
-        "Baltimore", "Milwaukee", "Albuquerque", "Tucson", "Fresno", "Sacramento",
-        "Mesa", "Kansas City", "Atlanta", "Long Beach", "Colorado Springs", "Raleigh",
-        "Miami", "Omaha", "Minneapolis", "Tulsa", "Cleveland", "Wichita", "Arlington",
-        "New Orleans", "Bakersfield", "Tampa", "Honolulu", "Aurora", "Anaheim",
-        "Santa Ana", "St. Louis", "Riverside", "Corpus Christi", "Lexington",
-        "Pittsburgh", "Anchorage", "Stockton", "Cincinnati", "St. Paul", "Toledo",
-        "Greensboro", "Newark", "Plano", "Henderson", "Lincoln", "Buffalo", "Jersey City",
-        "Chula Vista", "Fort Wayne", "Orlando", "St. Petersburg", "Chandler", "Laredo",
-        "Norfolk", "Durham", "Madison", "Lubbock", "Irvine", "Winston-Salem", "Glendale",
-        "Garland", "Hialeah", "Reno", "Chesapeake", "Gilbert", "Baton Rouge", "Irving",
-        "Scottsdale", "North Las Vegas", "Fremont", "Boise City", "Richmond", "San Bernardino"
-    ]
-    
-    # List of Indian cities
-    indian_cities = [
-        "Mumbai", "Delhi", "Bangalore", "Hyderabad", "Chennai", "Kolkata", 
-        "Ahmedabad", "Pune", "Jaipur", "Lucknow", "Kanpur", "Nagpur", 
-        "Indore", "Thane", "Bhopal", "Visakhapatnam", "Patna", "Vadodara", 
-        "Ghaziabad", "Ludhiana", "Agra", "Nashik", "Faridabad", "Meerut", 
-        "Rajkot", "Varanasi", "Srinagar", "Aurangabad", "Dhanbad", "Amritsar", 
-        "Navi Mumbai", "Allahabad", "Ranchi", "Howrah", "Coimbatore", "Jabalpur", 
-        "Gwalior", "Vijayawada", "Jodhpur", "Madurai", "Raipur", "Kota", 
-        "Chandigarh", "Guwahati", "Solapur", "Hubli-Dharwad", "Mysore"
-    ]
-    
-    # Combine US and Indian cities
-    cities = us_cities + indian_cities
-    
-    # List of hotel name prefixes and suffixes for random generation
-    hotel_prefixes = [
-        "Grand", "Royal", "Imperial", "Luxury", "Elite", "Premium", "Comfort", "Cozy",
-        "Pleasant", "Tranquil", "Serene", "Majestic", "Regal", "Elegant", "Exquisite",
-        "Splendid", "Deluxe", "Superior", "Prime", "Select", "Choice", "Quality",
-        "Prestige", "Exclusive", "Distinguished", "Eminent", "Prominent", "Renowned",
-        "Famous", "Celebrated", "Esteemed", "Respected", "Admired", "Valued", "Treasured"
-    ]
+        seed (int): Dataset seed (random if not given; printed for reuse)
+        profile (str): Booking density profile from datagen.DENSITY_PROFILES,
+            or None to generate no bookings
+        workers (int): Processes building rows in parallel
+        start (int): Hotels already generated with this seed, to extend an
+            existing dataset instead of repeating it
     
-    hotel_suffixes = [
-        "Hotel", "Inn", "Suites", "Lodge", "Resort", "Retreat", "Hideaway", "Haven",
-        "Sanctuary", "Oasis", "Paradise", "Palace", "Mansion", "Castle", "Tower",
-        "Plaza", "Court", "Pavilion", "Residency", "Quarters", "Accommodations",
-        "Lodging", "Dwelling", "Abode", "Habitat", "Domicile", "Establishment",
-        "Complex", "Compound", "Enclave", "Estate", "Manor", "Villa", "Chateau", "Cottage"
-    ]
+    Returns:
+        dict: Number of rows written per table
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    density = datagen.DENSITY_PROFILES[profile] if profile else None
+    print(f"Generating {num_hotels} hotels with {rooms_per_hotel} rooms each (seed {seed})...")
     
-    print(f"Generating {num_hotels} hotels with {rooms_per_hotel} rooms each...")
+    # Raw inserts bypass Hotel.save, so resolve the normalized cities up front
+    city_ids = {city: City.objects.for_name(city).id for city in datagen.CITIES}
+    timestamp = connection.ops.adapt_datetimefield_value(timezone.now())
     
-    # Batch creation for better performance
-    batch_size = 1000
-    hotels_created = 0
-    
-    while hotels_created < num_hotels:
-        # Determine batch size for this iteration
-        current_batch_size = min(batch_size, num_hotels - hotels_created)
-        
-        # Create hotels in batch
-        hotels_batch = []
-        for _ in range(current_batch_size):
-            prefix = random.choice(hotel_prefixes)
-            suffix = random.choice(hotel_suffixes)
-            city = random.choice(cities)
-            hotel = Hotel(
-                name=f"{prefix} {city} {suffix}",
-                city=city,
-                address=f"{random.randint(100, 9999)} Main St, {city}",
-                description=f"A {prefix.lower()} hotel in {city}"
-            )
-            hotels_batch.append(hotel)
-        
-        # Bulk create hotels
-        created_hotels = Hotel.objects.bulk_create(hotels_batch)
-        
-        # Create rooms for each hotel in batch
-        rooms_batch = []
-        for hotel in created_hotels:
-            for i in range(rooms_per_hotel):
-                room_type = random.choice([t[0] for t in ROOM_TYPES])
-                price = random.randint(50, 500)
-                rooms_batch.append(Room(
-                    hotel=hotel,
-                    room_number=f"{random.randint(1, 9)}{random.randint(0, 9)}{random.randint(0, 9)}",
-                    room_type=room_type,
-                    price=price,
-                    is_available=random.choice([True, True, True, False]),  # 75% available
-                    capacity=random.randint(1, 4)
-                ))
-        
-        # Bulk create rooms
-        Room.objects.bulk_create(rooms_batch)
-        
-        hotels_created += current_batch_size
-        print(f"Created {hotels_created}/{num_hotels} hotels")
+    chunks = datagen.generate_rows(
+        num_hotels, seed, rooms_per_hotel=rooms_per_hotel, profile=density, city_ids=city_ids,
+        start_date=timezone.now().date(), timestamp=timestamp, start=start, workers=workers
+    )
+    written = {name: 0 for name, _, _ in GENERATED_TABLES}
+    for rows in chunks:
+        with transaction.atomic():
+            cursor = connection.connection.cursor()
+            try:
+                for name, model, columns in GENERATED_TABLES:
+                    _insert_rows(cursor, model, columns, rows[name])
+                    written[name] += len(rows[name])
+            finally:
+                cursor.close()
+        print(f"Created {written['hotels']}/{num_hotels} hotels")
     
+    # Raw inserts send no signals: retire cached searches and every process's n-gram index once
+    invalidate_hotel_cache()
+    transaction.on_commit(hotels_changed)
     print("Mock data generation complete!")
+    return written
+
+def _sample_room_ids(count, rng):
+    """
+    Pick `count` distinct room ids uniformly by streaming the primary key
+    index once, instead of sorting the whole table with ORDER BY RANDOM().
+    """
+    if count <= 0:
+        return []
+    total = Room.objects.count()
+    positions = sorted(rng.sample(range(total), min(count, total)))
+    picked = []
+    ids = Room.objects.order_by('id').values_list('id', flat=True)
+    for position, room_id in enumerate(ids.iterator(chunk_size=5000)):
+        if position == positions[len(picked)]:
+            picked.append(room_id)
+            if len(picked) == len(positions):
+                break
+    return picked
 
-def generate_test_bookings(num_bookings=100):
+def _taken_nights(room_ids, batch_size=500):
+    """
+    Nights already held by active bookings of the given rooms, per room id.
+    """
+    taken = {}
+    room_ids = list(room_ids)
+    for start in range(0, len(room_ids), batch_size):
+        batch = room_ids[start:start + batch_size]
+        nights = RoomNight.objects.filter(room_id__in=batch).values_list('room_id', 'night')
+        for room_id, night in nights.iterator(chunk_size=5000):
+            taken.setdefault(room_id, set()).add(night)
+    return taken
+
+def generate_test_bookings(num_bookings=100, seed=None):
     """
     Generate test bookings for existing rooms.
     
+    Bookings are spread over randomly sampled rooms; when there are more
+    bookings than rooms, later stays on a room start after its previous one.
+    Active stays are also moved past nights the room's existing bookings
+    (e.g. from a density profile) hold, so active bookings never overlap.
+    
     Args:
         num_bookings (int): Number of bookings to generate
+        seed (int): Seed for reproducible bookings
     """
-    # Get random rooms
-    rooms = list(Room.objects.all().order_by('?')[:num_bookings])
+    if num_bookings <= 0:
+        print("Created 0 test bookings")
+        return
+    
+    rng = random.Random(seed)
+    room_ids = _sample_room_ids(num_bookings, rng)
     
-    if not rooms:
+    if not room_ids:
         print("No rooms available for booking generation")
         return
     
     bookings = []
     today = timezone.now().date()
+    next_free = {}
+    taken = _taken_nights(set(room_ids))
     
     for i in range(num_bookings):
-        # Generate random dates within the next 90 days
-        start_offset = random.randint(1, 60)
-        duration = random.randint(1, 10)
+        room_id = room_ids[i % len(room_ids)]
+        # Generate random dates within the next 90 days, after the room's previous stay
+        start_offset = rng.randint(1, 60)
+        duration = rng.randint(1, 10)
         
-        check_in_date = today + timedelta(days=start_offset)
+        check_in_date = max(today + timedelta(days=start_offset), next_free.get(room_id, today))
         check_out_date = check_in_date + timedelta(days=duration)
+        is_cancelled = rng.random() < 0.1  # 10% chance of cancellation
+        if not is_cancelled:
+            room_taken = taken.get(room_id, ())
+            while any(night in room_taken for night in stay_nights(check_in_date, check_out_date)):
+                check_in_date += timedelta(days=1)
+                check_out_date += timedelta(days=1)
+            next_free[room_id] = check_out_date
         
         booking = Booking(
-            room=rooms[i % len(rooms)],
+            room_id=room_id,
             guest_name=f"Guest {i+1}",
             guest_email=f"guest{i+1}@example.com",
             check_in_date=check_in_date,
             check_out_date=check_out_date,
-            is_cancelled=random.random() < 0.1  # 10% chance of cancellation
+            is_cancelled=is_cancelled
         )
         bookings.append(booking)
     
     Booking.objects.bulk_create(bookings)
-    print(f"Created {len(bookings)} test bookings")
\ No newline at end of file
+    # bulk_create bypasses Booking.save, so materialize the nights explicitly
+    occupy_many(bookings)
+    print(f"Created {len(bookings)} test bookings")
@@ -1,15 +1,110 @@
-from django.db import transaction
+import time
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.views.generic import TemplateView
 from rest_framework import viewsets, status, filters
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.views import APIView
 from .models import Hotel, Room, Booking
-from .serializers import HotelSerializer, RoomSerializer, BookingSerializer
+from .availability import hotel_room_availability
+from .text_search import filter_hotels
+from .exports import FORMATS, RESOURCES, astream_export, stream_export
+from .metrics import booking_create_duration
+from .pagination import KeysetPagination
+from .services import BookingConflict, create_bookings
+from .serializers import (HotelSerializer, HotelOfferSerializer, RoomSerializer, RoomAvailabilitySerializer,
+                          BookingSerializer, BulkBookingSerializer, BulkBookingItemSerializer)
 from .throttling import (BookingUserRateThrottle, BookingAnonRateThrottle,
                         SearchUserRateThrottle, SearchAnonRateThrottle)
 
 
+# Actions that only serialize rows and can use eager-loading projections
+READ_ACTIONS = ('list', 'retrieve')
+
+# Largest page of the ranked hotel search
+MAX_SEARCH_RESULTS = 100
+
+
+def parse_stay_dates(params):
+    """
+    Read check_in / check_out (YYYY-MM-DD) from query parameters.
+    Missing dates default to a one-night stay starting today.
+    
+    Args:
+        params (QueryDict): Request query parameters
+    
+    Returns:
+        tuple: (check_in, check_out) dates
+    
+    Raises:
+        ValueError: If a date is malformed or check-out is not after check-in
+    """
+    check_in = params.get('check_in')
+    check_out = params.get('check_out')
+    check_in_date = parse_date(check_in) if check_in else timezone.localdate()
+    if check_in_date is None:
+        raise ValueError("check_in must be a date in YYYY-MM-DD format")
+    check_out_date = parse_date(check_out) if check_out else check_in_date + timedelta(days=1)
+    if check_out_date is None:
+        raise ValueError("check_out must be a date in YYYY-MM-DD format")
+    if check_out_date <= check_in_date:
+        raise ValueError("check_out must be after check_in")
+    return check_in_date, check_out_date
+
+
+def parse_search_filters(params):
+    """
+    Read the ranked search filters from query parameters.
+    
+    Args:
+        params (QueryDict): Request query parameters
+    
+    Returns:
+        dict: room_type, min_capacity, min_price, max_price, sort, limit and
+            offset keyword arguments for search_hotels_ranked
+    
+    Raises:
+        ValueError: If a number is malformed or out of range
+    """
+    def number(name, parse, minimum=0):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            value = parse(value)
+            # Decimal accepts NaN and Infinity, which no price compares with
+            if isinstance(value, Decimal) and not value.is_finite():
+                raise InvalidOperation
+        except (ValueError, InvalidOperation):
+            raise ValueError(f"{name} must be a number")
+        if value < minimum:
+            raise ValueError(f"{name} must be at least {minimum}")
+        return value
+    
+    filters = {
+        'room_type': params.get('room_type') or None,
+        'min_capacity': number('min_capacity', int, 1),
+        'min_price': number('min_price', Decimal),
+        'max_price': number('max_price', Decimal),
+        'sort': params.get('sort') or 'price',
+        'limit': min(number('limit', int, 1) or 20, MAX_SEARCH_RESULTS),
+        'offset': number('offset', int) or 0,
+    }
+    if filters['min_price'] is not None and filters['max_price'] is not None \
+            and filters['min_price'] > filters['max_price']:
+        raise ValueError("min_price must not be above max_price")
+    return filters
+
+
 class HomePageView(TemplateView):
     template_name = 'booking/index.html'
     
@@ -25,14 +120,23 @@ class HotelRoomsView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         hotel_id = kwargs.get('hotel_id')
+        try:
+            check_in_date, check_out_date = parse_stay_dates(self.request.GET)
+        except ValueError:
+            check_in_date, check_out_date = parse_stay_dates({})
         try:
             hotel = Hotel.objects.get(id=hotel_id)
-            rooms = Room.objects.filter(hotel=hotel, is_available=True)
+            rooms = hotel_room_availability(
+                hotel.id, check_in_date, check_out_date,
+                queryset=Room.objects.filter(is_available=True)
+            )
             context['hotel'] = hotel
             context['rooms'] = rooms
         except Hotel.DoesNotExist:
             context['hotel'] = None
             context['rooms'] = []
+        context['check_in_date'] = check_in_date
+        context['check_out_date'] = check_out_date
         return context
 
 class HotelViewSet(viewsets.ModelViewSet):
@@ -52,32 +156,87 @@ class HotelViewSet(viewsets.ModelViewSet):
         check_in_date = self.request.query_params.get('check_in_date', None)
         check_out_date = self.request.query_params.get('check_out_date', None)
         
-        # If unfilled_only is requested, use the optimized search function
+        # If unfilled_only is requested, use the optimized (cached) search function
+        # for the requested cursor window and load the full rows of that page
         if unfilled_only and check_in_date and check_out_date:
-            return search_hotels_optimized(
+            after, before = None, None
+            if self.action == 'list' and isinstance(self.paginator, KeysetPagination):
+                after, before = self.paginator.get_keyset_bounds(self.request)
+                limit = self.paginator.get_page_size(self.request) + 1
+            else:
+                limit = 100
+            rows = search_hotels_optimized(
                 city=city,
                 name=name,
                 unfilled_only=True,
                 check_in_date=check_in_date,
-                check_out_date=check_out_date
+                check_out_date=check_out_date,
+                limit=limit,
+                after=after,
+                before=before
             )
+            return Hotel.objects.filter(id__in=[row.id for row in rows]).order_by('id')
         
-        # Otherwise, use the default queryset
-        queryset = Hotel.objects.all()
-        
-        if city:
-            queryset = queryset.filter(city__icontains=city)
-        if name:
-            queryset = queryset.filter(name__icontains=name)
-            
-        return queryset
+        # Otherwise, use the default queryset with trigram-backed text filters
+        return filter_hotels(Hotel.objects.all(), city=city, name=name)
     
     @action(detail=True, methods=['get'])
     def rooms(self, request, pk=None):
         hotel = self.get_object()
-        rooms = Room.objects.filter(hotel=hotel)
+        rooms = RoomSerializer.setup_eager_loading(Room.objects.filter(hotel=hotel))
         serializer = RoomSerializer(rooms, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Hotels with free rooms for ?check_in=&check_out=, with the cheapest
+        price, number of free rooms and largest capacity of each. Filters:
+        city, name, room_type, min_capacity, min_price, max_price. Order:
+        sort=price|-price|availability|capacity. Paged by limit and offset.
+        """
+        from .search import search_hotels_ranked
+        
+        try:
+            check_in_date, check_out_date = parse_stay_dates(request.query_params)
+            filters = parse_search_filters(request.query_params)
+            rows = search_hotels_ranked(
+                check_in_date, check_out_date,
+                city=request.query_params.get('city') or None,
+                name=request.query_params.get('name') or None,
+                **filters
+            )
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'check_in': check_in_date,
+            'check_out': check_out_date,
+            'sort': filters['sort'],
+            'results': HotelOfferSerializer(rows, many=True).data,
+        })
+    
+    @action(detail=True, methods=['get'])
+    def availability(self, request, pk=None):
+        """
+        Every room of the hotel with its status for ?check_in=&check_out=.
+        """
+        try:
+            check_in_date, check_out_date = parse_stay_dates(request.query_params)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        hotel = self.get_object()
+        rooms = hotel_room_availability(
+            hotel.id, check_in_date, check_out_date,
+            queryset=RoomAvailabilitySerializer.setup_eager_loading(Room.objects.all())
+        )
+        return Response({
+            'hotel': hotel.id,
+            'check_in': check_in_date,
+            'check_out': check_out_date,
+            'rooms': RoomAvailabilitySerializer(rooms, many=True).data,
+        })
 
 class RoomViewSet(viewsets.ModelViewSet):
     queryset = Room.objects.all()
@@ -97,7 +256,12 @@ class RoomViewSet(viewsets.ModelViewSet):
         if room_type:
             queryset = queryset.filter(room_type=room_type)
         if is_available:
-            queryset = queryset.filter(is_available=is_available.lower() == 'true')
+            # __in keeps the flag seekable in room_hotel_type_open_idx; SQLite tests a bare `= True` per row
+            queryset = queryset.filter(is_available__in=[is_available.lower() == 'true'])
+        
+        # Read paths load the hotel eagerly; writes keep full rows so save() stores every field
+        if self.action in READ_ACTIONS:
+            queryset = self.get_serializer_class().setup_eager_loading(queryset)
             
         return queryset
 
@@ -106,44 +270,100 @@ class BookingViewSet(viewsets.ModelViewSet):
     serializer_class = BookingSerializer
     throttle_classes = [BookingUserRateThrottle, BookingAnonRateThrottle]
     
-    @transaction.atomic
-    def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        room_id = self.request.query_params.get('room', None)
+        
+        if room_id:
+            queryset = queryset.filter(room_id=room_id)
         
-        # Get room and check if it's available
-        room_id = serializer.validated_data.get('room').id
-        check_in_date = serializer.validated_data.get('check_in_date')
-        check_out_date = serializer.validated_data.get('check_out_date')
+        # Read paths load the room and hotel eagerly; writes keep full rows
+        if self.action in READ_ACTIONS:
+            queryset = self.get_serializer_class().setup_eager_loading(queryset)
         
-        # Use select_for_update to lock the room record during the transaction
+        return queryset
+    
+    def create(self, request, *args, **kwargs):
+        # Latency and outcome of every booking request for /metrics
+        started = time.perf_counter()
+        outcome = 'error'
         try:
-            room = Room.objects.select_for_update().get(id=room_id)
-            
-            # Check for overlapping bookings
-            overlapping_bookings = Booking.objects.filter(
-                room=room,
-                is_cancelled=False,
-                check_in_date__lt=check_out_date,
-                check_out_date__gt=check_in_date
-            )
-            
-            if overlapping_bookings.exists():
-                return Response(
-                    {"error": "This room is already booked for the selected dates"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Save the booking
-            self.perform_create(serializer)
-            headers = self.get_success_headers(serializer.data)
-            return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
-            
-        except Room.DoesNotExist:
-            return Response(
-                {"error": "Room not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
+            response = super().create(request, *args, **kwargs)
+            outcome = 'success'
+            return response
+        except BookingConflict:
+            outcome = 'overlap_rejected'
+            raise
+        except ValidationError as exc:
+            codes = exc.get_codes()
+            room_codes = codes.get('room', []) if isinstance(codes, dict) else []
+            outcome = 'room_not_found' if 'does_not_exist' in room_codes else 'invalid'
+            raise
+        except DjangoValidationError:
+            outcome = 'invalid'
+            raise
+        finally:
+            booking_create_duration.observe(time.perf_counter() - started, outcome=outcome)
+    
+    def handle_exception(self, exc):
+        # Overlaps are detected by the booking engine when the booking is written
+        if isinstance(exc, BookingConflict):
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if isinstance(exc, DjangoValidationError):
+            return Response({"error": exc.messages}, status=status.HTTP_400_BAD_REQUEST)
+        return super().handle_exception(exc)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def bulk(self, request):
+        """
+        Book many stays in one request.
+        
+        Body: {"mode": "atomic" | "best_effort", "bookings": [{room, guest_name,
+        guest_email, check_in_date, check_out_date}, ...]}. Returns one result
+        per item; atomic requests create nothing unless every item succeeds.
+        
+        Restricted to authenticated users: the booking throttles count a
+        request, not its items, so anonymous clients could otherwise book
+        MAX_BULK_SIZE stays per request past the anonymous booking rate.
+        """
+        payload = BulkBookingSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        atomic = payload.validated_data['mode'] == 'atomic'
+        
+        # Field-level validation per item; the service handles rooms and overlaps
+        results = [None] * len(payload.validated_data['bookings'])
+        items, positions = [], []
+        for position, data in enumerate(payload.validated_data['bookings']):
+            item = BulkBookingItemSerializer(data=data)
+            if item.is_valid():
+                fields = dict(item.validated_data)
+                fields['room_id'] = fields.pop('room')
+                items.append(fields)
+                positions.append(position)
+            else:
+                results[position] = {'index': position, 'status': 'invalid', 'errors': item.errors}
+        
+        if atomic and len(items) < len(results):
+            outcomes = [('rolled_back', None)] * len(items)
+        else:
+            outcomes = create_bookings(items, atomic=atomic)
+        for position, (outcome, value) in zip(positions, outcomes):
+            result = {'index': position, 'status': outcome}
+            if outcome == 'created':
+                result['id'] = value.id
+            elif value is not None:
+                result['errors'] = [value]
+            results[position] = result
+        
+        created = sum(1 for result in results if result['status'] == 'created')
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif atomic:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_207_MULTI_STATUS
+        return Response({'mode': payload.validated_data['mode'], 'created': created, 'results': results},
+                        status=response_status)
     
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -152,3 +372,43 @@ class BookingViewSet(viewsets.ModelViewSet):
         booking.save()
         serializer = self.get_serializer(booking)
         return Response(serializer.data)
+
+class ExportView(APIView):
+    """
+    Stream a full export: GET /api/export/<hotels|rooms|bookings>/
+    ?output=ndjson|csv&city=&date_from=&date_to=
+    
+    Exports include guest details, so they are restricted to staff users.
+    """
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request, resource):
+        output = request.query_params.get('output', 'ndjson')
+        if resource not in RESOURCES:
+            return Response({"error": f"Unknown export '{resource}'"}, status=status.HTTP_404_NOT_FOUND)
+        if output not in FORMATS:
+            return Response({"error": f"output must be one of {', '.join(FORMATS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        dates = {}
+        for param in ('date_from', 'date_to'):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    # None if malformed, ValueError if well-formed but impossible (2025-02-30)
+                    dates[param] = parse_date(value)
+                except ValueError:
+                    dates[param] = None
+                if dates[param] is None:
+                    return Response({"error": f"{param} must be a date in YYYY-MM-DD format"},
+                                    status=status.HTTP_400_BAD_REQUEST)
+        
+        # Under ASGI a sync iterator would be buffered whole before it is sent
+        stream = astream_export if isinstance(request._request, ASGIRequest) else stream_export
+        response = StreamingHttpResponse(
+            stream(resource, output, city=request.query_params.get('city'), **dates),
+            content_type=FORMATS[output]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{output}"'
+        return response
+
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hotel_booking.settings")
+# Serve the read endpoints from the async views (see booking.async_views)
+os.environ.setdefault("BOOKING_ASYNC_VIEWS", "true")
 
 application = get_asgi_application()
@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
+from urllib.parse import urlparse
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,7 +45,7 @@ INSTALLED_APPS = [
 
 # Django REST Framework settings
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'booking.pagination.KeysetPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_THROTTLE_CLASSES': [
         'rest_framework.throttling.AnonRateThrottle',
@@ -60,6 +62,7 @@ REST_FRAMEWORK = {
 }
 
 MIDDLEWARE = [
+    "booking.instrumentation.QueryInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -101,6 +104,32 @@ DATABASES = {
 }
 
 
+# Cache
+# The default cache holds the search cache (the L2 tier behind a per-process
+# L1, see HOTEL_SEARCH_CACHE_L1_SIZE), its invalidation generations, the
+# single-flight and city-registry locks and the throttle counters. Those rely
+# on atomic add() and incr(). BOOKING_CACHE_URL picks the backend:
+#   unset or locmem://     per-process memory; limits, locks and invalidation
+#                          are then per worker
+#   redis://host:port/db   Redis, or any server speaking its protocol (needs
+#                          the redis package); required for any guarantee
+#                          across workers
+# Tests replace it with a private in-memory cache (booking.test_functions.TEST_CACHES).
+
+def _cache_config(url):
+    parsed = urlparse(url)
+    if parsed.scheme == 'locmem':
+        return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    if parsed.scheme in ('redis', 'rediss', 'unix'):
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    raise ValueError(f'Unsupported BOOKING_CACHE_URL: {url}')
+
+BOOKING_CACHE_URL = os.environ.get('BOOKING_CACHE_URL', 'locmem://')
+
+CACHES = {
+    'default': _cache_config(BOOKING_CACHE_URL),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -141,3 +170,54 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Hotel search cache
+# Entries are served fresh for SOFT_TIMEOUT seconds, then served stale while one
+# worker refreshes them, and dropped after TIMEOUT seconds. On a miss one worker
+# recomputes while the others wait up to LOCK_WAIT seconds for its result.
+HOTEL_SEARCH_CACHE_TIMEOUT = 60 * 15
+HOTEL_SEARCH_CACHE_SOFT_TIMEOUT = 60 * 10
+HOTEL_SEARCH_CACHE_LOCK_TIMEOUT = 30
+HOTEL_SEARCH_CACHE_LOCK_WAIT = 2.0
+HOTEL_SEARCH_CACHE_BACKGROUND_REFRESH = True
+# Entries kept in each worker's in-memory L1 in front of the shared cache (0
+# disables it). L1 entries are checked against the shared invalidation
+# generations on every lookup, so writes in any worker still retire them.
+HOTEL_SEARCH_CACHE_L1_SIZE = 256
+
+# Hotel text search
+# 'auto' picks pg_trgm indexes on PostgreSQL, the FTS5 trigram table on SQLite
+# and the in-process n-gram index elsewhere. Set to 'icontains' to disable.
+HOTEL_TEXT_SEARCH_BACKEND = 'auto'
+
+# Async read endpoints
+# When enabled, hotel search, room listing and availability GETs are served by
+# async views (booking.async_views). hotel_booking.asgi turns this on; WSGI
+# deployments keep the synchronous DRF viewsets.
+BOOKING_ASYNC_VIEWS = os.environ.get('BOOKING_ASYNC_VIEWS', 'false').lower() in ('1', 'true', 'yes')
+
+# Request instrumentation
+# When enabled, every response carries a Server-Timing header with its query
+# count, database time and search cache hits, and is logged as one JSON line
+# on the 'booking.instrumentation' logger. Requests slower than
+# SLOW_REQUEST_MS are logged as warnings with their full query list. When
+# disabled the middleware removes itself at startup.
+BOOKING_INSTRUMENTATION_ENABLED = os.environ.get('BOOKING_INSTRUMENTATION', 'false').lower() in ('1', 'true', 'yes')
+BOOKING_SLOW_REQUEST_MS = 500
+
+# Metrics
+# /metrics exports search, booking, throttle and database metrics in the
+# Prometheus text format. Under a multi-process server (gunicorn) set
+# BOOKING_METRICS_DIR to a directory shared by the workers and cleared on
+# deploy; each worker writes its samples there and /metrics merges them.
+# Unset, only the serving process's metrics are exported.
+BOOKING_METRICS_DIR = os.environ.get('BOOKING_METRICS_DIR') or None
+
+# Throttling
+# The booking and search throttles count requests per process and sync the
+# counts with the shared cache every BOOKING_THROTTLE_SYNC_INTERVAL seconds
+# (and before rejecting a request). With N workers on Redis a client may get
+# up to one interval's worth of extra requests per worker; 0 syncs every
+# request. On the default locmem cache every worker counts on its own.
+BOOKING_THROTTLE_SYNC_INTERVAL = float(os.environ.get('BOOKING_THROTTLE_SYNC_INTERVAL', '1.0'))
@@ -15,10 +15,14 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
+from booking.metrics import metrics_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path('', include('booking.urls')),
+    path("metrics", metrics_view, name="metrics"),
+    # ASGI mode serves the read endpoints from async views
+    path('', include('booking.async_urls' if settings.BOOKING_ASYNC_VIEWS else 'booking.urls')),
 ]